@@ -0,0 +1,104 @@
+import os
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True)
+class Settings:
+    """
+    Application settings, read from `ELIB_*` environment variables.
+
+    Attributes:
+        storage_backend (str): Storage engine: "memory" or "sqlite".
+        sqlite_path (str): Database file used by the "sqlite" backend.
+        data_dir (str | None): Directory holding the write-ahead log and
+            snapshots of the "memory" backend. Persistence is disabled when
+            unset.
+        wal_fsync_interval (float): Seconds a group commit of the write-ahead
+            log waits for more mutations to join it. Every mutation is fsynced
+            before it is acknowledged either way.
+        wal_fsync_batch (int): Number of buffered mutations that starts a
+            group commit before the interval elapses.
+        snapshot_every (int): Number of logged mutations after which a new
+            snapshot is taken and older log segments are discarded.
+        fast_json (bool): Serialize responses straight from the stored models,
+            skipping the re-validation against each route's response_model.
+        profiling (bool): Install the request profiler at startup. It can
+            also be turned on and off at runtime through `/debug/profile`,
+            and costs nothing while off.
+        profile_sample_rate (float): Fraction of requests profiled at startup.
+        admin_token (str | None): Token the `/debug` endpoints require in an
+            `X-Admin-Token` header. They are refused to everyone when unset.
+        cache (tuple[str, ...]): Collections whose repositories cache the
+            entities they read by ID: "books" and/or "users".
+        cache_size (int): Maximum number of entities cached per repository.
+        cache_ttl (float): Seconds an entity stays cached. 0 keeps it until
+            it is evicted or changed, which the "sqlite" backend rejects.
+        loan_period_days (int): Days a book may be kept; sets the due date
+            of every new loan.
+        overdue_sweep_interval (float): Seconds between sweeps flagging the
+            loans that became overdue.
+        max_active_loans (int): Books a user may hold at once. 0 removes the
+            limit.
+    """
+
+    storage_backend: str = "memory"
+    sqlite_path: str = "e-lib.db"
+    data_dir: str | None = None
+    wal_fsync_interval: float = 0.01
+    wal_fsync_batch: int = 512
+    snapshot_every: int = 100_000
+    fast_json: bool = False
+    profiling: bool = False
+    profile_sample_rate: float = 0.0
+    admin_token: str | None = None
+    cache: tuple[str, ...] = ()
+    cache_size: int = 10_000
+    cache_ttl: float = 0.0
+    loan_period_days: int = 14
+    overdue_sweep_interval: float = 60.0
+    max_active_loans: int = 10
+
+    @classmethod
+    def from_env(cls) -> "Settings":
+        """
+        Builds the settings from the environment.
+
+        Returns:
+            Settings: The settings, with defaults for unset variables.
+        """
+        env = os.environ
+        return cls(
+            storage_backend=env.get("ELIB_STORAGE_BACKEND", cls.storage_backend),
+            sqlite_path=env.get("ELIB_SQLITE_PATH", cls.sqlite_path),
+            data_dir=env.get("ELIB_DATA_DIR") or None,
+            wal_fsync_interval=float(
+                env.get("ELIB_WAL_FSYNC_INTERVAL", cls.wal_fsync_interval)
+            ),
+            wal_fsync_batch=int(env.get("ELIB_WAL_FSYNC_BATCH", cls.wal_fsync_batch)),
+            snapshot_every=int(env.get("ELIB_SNAPSHOT_EVERY", cls.snapshot_every)),
+            fast_json=env.get("ELIB_FAST_JSON", "").lower() in ("1", "true", "yes"),
+            profiling=env.get("ELIB_PROFILING", "").lower() in ("1", "true", "yes"),
+            profile_sample_rate=float(
+                env.get("ELIB_PROFILE_SAMPLE_RATE", cls.profile_sample_rate)
+            ),
+            admin_token=env.get("ELIB_ADMIN_TOKEN") or None,
+            cache=tuple(
+                name.strip()
+                for name in env.get("ELIB_CACHE", "").split(",")
+                if name.strip()
+            ),
+            cache_size=int(env.get("ELIB_CACHE_SIZE", cls.cache_size)),
+            cache_ttl=float(env.get("ELIB_CACHE_TTL", cls.cache_ttl)),
+            loan_period_days=int(
+                env.get("ELIB_LOAN_PERIOD_DAYS", cls.loan_period_days)
+            ),
+            overdue_sweep_interval=float(
+                env.get("ELIB_OVERDUE_SWEEP_INTERVAL", cls.overdue_sweep_interval)
+            ),
+            max_active_loans=int(
+                env.get("ELIB_MAX_ACTIVE_LOANS", cls.max_active_loans)
+            ),
+        )
+
+
+settings = Settings.from_env()
@@ -0,0 +1,256 @@
+import asyncio
+import json
+import threading
+from collections import deque
+
+from app.repositories.mutations import Mutation
+
+# Collections whose changes are published; users are left out on purpose,
+# as their email addresses must not reach every subscriber
+PUBLISHED_COLLECTIONS = ("books", "borrow_records", "reservations")
+
+# Events kept for subscribers resuming with `Last-Event-ID`
+HISTORY_SIZE = 10_000
+
+# Events buffered per subscriber before it is dropped as too slow
+SUBSCRIBER_BUFFER = 1_000
+
+# Seconds between reads of a shared change log
+FOLLOW_INTERVAL = 0.05
+
+
+class Event:
+    """
+    A published change, numbered in publication order.
+
+    Attributes:
+        seq (int): Sequence number, increasing by one per event.
+        op (str): The repository operation, e.g. "borrow_book".
+        data (str): The changes, serialized as JSON.
+    """
+
+    __slots__ = ("seq", "op", "data")
+
+    def __init__(self, seq: int, op: str, data: str):
+        self.seq = seq
+        self.op = op
+        self.data = data
+
+    def encode(self) -> str:
+        """
+        Formats the event as a server-sent event.
+        """
+        return f"id: {self.seq}\nevent: {self.op}\ndata: {self.data}\n\n"
+
+
+class Subscription:
+    """
+    Events waiting to be sent to one subscriber.
+
+    Events are queued from publishing threads onto the subscriber's event
+    loop. When the subscriber falls `SUBSCRIBER_BUFFER` events behind, the
+    backlog is discarded and the subscription is marked as dropped; the
+    client reconnects and resumes from the history instead of slowing down
+    writers or growing memory without bound.
+
+    Attributes:
+        backlog (list[Event]): Past events to send first, when resuming.
+        dropped (bool): Whether the subscriber fell too far behind.
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, backlog: list[Event]):
+        self.loop = loop
+        self.backlog = backlog
+        self.dropped = False
+        self.queue = asyncio.Queue(SUBSCRIBER_BUFFER)
+
+    def deliver(self, event: Event | None):
+        """
+        Queues an event; runs on the subscriber's event loop.
+        """
+        if self.dropped:
+            return
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.dropped = True
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            # Wakes up the stream so it can tell the client
+            self.queue.put_nowait(None)
+
+
+class EventHub:
+    """
+    Fans out the mutations made through the repositories to subscribers.
+
+    Registered as a listener of the storage backend, the hub numbers every
+    mutation touching a published collection and hands it to each
+    subscriber's event loop. Publishing never waits for subscribers.
+
+    When several processes share an SQLite database, the hub of each one
+    writes to the database's change log instead, which numbers the changes
+    of every process, and `follow` delivers the log's new entries.
+
+    Attributes:
+        seq (int): Sequence number of the latest event.
+        history (deque[Event]): The latest events, oldest first.
+        log (SqliteStore | None): The shared change log, if any.
+    """
+
+    def __init__(self, history_size: int = HISTORY_SIZE):
+        self.seq = 0
+        self.history = deque(maxlen=history_size)
+        self.log = None
+        self._subscriptions = set()
+        self._lock = threading.Lock()
+        # Serializes reads of the change log, which are made outside _lock
+        # so that subscribing never waits for a query
+        self._catch_up_lock = threading.Lock()
+
+    def publish(self, mutation: Mutation):
+        """
+        Publishes the changes of a mutation; a storage backend listener.
+
+        Args:
+            mutation (Mutation): The mutation made through a repository.
+        """
+        puts = [
+            {"collection": collection, "entity": entity.model_dump(mode="json")}
+            for collection, entity in mutation.puts
+            if collection in PUBLISHED_COLLECTIONS
+        ]
+        deletes = [
+            {"collection": collection, "id": entity_id}
+            for collection, entity_id in mutation.deletes
+            if collection in PUBLISHED_COLLECTIONS
+        ]
+        if not puts and not deletes:
+            return
+        changes = {"puts": puts, "deletes": deletes}
+        log = self.log
+        if log is not None:
+            log.log_change(mutation.op, json.dumps(changes))
+            return
+        with self._lock:
+            self._add(self.seq + 1, mutation.op, changes)
+
+    def share(self, log):
+        """
+        Publishes through a change log shared with other processes.
+
+        The history is reloaded from the log; call `follow` to keep
+        delivering its new entries.
+
+        Args:
+            log (SqliteStore): The store holding the change log.
+        """
+        with self._lock:
+            self.log = log
+            self.seq = 0
+            self.history.clear()
+        self.catch_up()
+
+    def unshare(self):
+        """
+        Goes back to numbering the mutations of this process alone.
+        """
+        with self._lock:
+            self.log = None
+
+    def catch_up(self):
+        """
+        Delivers the entries added to the shared change log since the last
+        call.
+        """
+        batch_size = self.history.maxlen or HISTORY_SIZE
+        with self._catch_up_lock:
+            while (log := self.log) is not None:
+                entries = log.changes_since(self.seq, batch_size)
+                with self._lock:
+                    if self.log is not log:
+                        return
+                    for seq, op, data in entries:
+                        if seq > self.seq:
+                            self._add(seq, op, json.loads(data))
+                if len(entries) < batch_size:
+                    return
+
+    async def follow(self, interval: float = FOLLOW_INTERVAL):
+        """
+        Delivers the entries of the shared change log as they are added,
+        until cancelled.
+
+        Args:
+            interval (float): Seconds between reads of the log.
+        """
+        while True:
+            await asyncio.to_thread(self.catch_up)
+            await asyncio.sleep(interval)
+
+    async def subscribe(self, last_seq: int | None = None) -> Subscription:
+        """
+        Starts receiving events on the running event loop.
+
+        With a shared change log, the log is read first in a worker thread,
+        so the event loop never waits for the query.
+
+        Args:
+            last_seq (int | None): Sequence number of the last event the
+                client received, to resume after it.
+
+        Returns:
+            Subscription: The subscription. Its backlog holds the events
+                missed since `last_seq`; if some are no longer in the
+                history, it starts with a "reset" event instead, telling the
+                client to reload its state.
+        """
+        loop = asyncio.get_running_loop()
+        if self.log is not None:
+            # The client may have received its last event from a process
+            # that logged it after this one's latest read
+            await asyncio.to_thread(self.catch_up)
+        with self._lock:
+            backlog = []
+            if last_seq is not None and last_seq != self.seq:
+                oldest = self.history[0].seq if self.history else self.seq + 1
+                if last_seq > self.seq or last_seq < oldest - 1:
+                    backlog.append(Event(self.seq, "reset", "{}"))
+                else:
+                    backlog.extend(e for e in self.history if e.seq > last_seq)
+            subscription = Subscription(loop, backlog)
+            self._subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        """
+        Stops sending events to a subscription.
+        """
+        with self._lock:
+            self._subscriptions.discard(subscription)
+
+    @property
+    def subscribers(self) -> int:
+        """
+        Number of active subscriptions.
+        """
+        return len(self._subscriptions)
+
+    def _add(self, seq: int, op: str, changes: dict):
+        # Called under _lock, so every loop receives events in order
+        self.seq = seq
+        event = Event(seq, op, json.dumps({"seq": seq, **changes}))
+        self.history.append(event)
+        for subscription in self._subscriptions:
+            _call_soon(subscription, event)
+
+
+def _call_soon(subscription: Subscription, event: Event):
+    try:
+        subscription.loop.call_soon_threadsafe(subscription.deliver, event)
+    except RuntimeError:
+        # The subscriber's event loop has been closed
+        pass
+
+
+event_hub = EventHub()
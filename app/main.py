@@ -1,15 +1,145 @@
+import asyncio
+from contextlib import asynccontextmanager, suppress
+from datetime import timedelta
+
 from fastapi import FastAPI
+from fastapi.responses import JSONResponse
+
+from app.config import settings
+from app.events import event_hub
+from app.metrics import MetricsMiddleware, request_metrics
+from app.profiling import ProfilingMiddleware, profiler
+from app.repositories import (
+    book_repository,
+    borrow_repository,
+    data_store,
+    overdue_sweeper,
+    use_store,
+    user_repository,
+)
+from app.repositories.cache import disable_cache, enable_cache
+from app.repositories.reservation import (
+    SHARED_STORE_POLL_INTERVAL,
+    reservation_waiters,
+)
+from app.repositories.sqlite import SqliteStore
+from app.repositories.wal import WriteAheadLog
+from app.routes import (
+    books,
+    borrow,
+    debug,
+    events,
+    health_check,
+    metrics,
+    reservations,
+    stats,
+    users,
+)
+from app.routes.responses import FastJSONResponse
+
+
+@asynccontextmanager
+async def lifespan(_app: FastAPI):
+    """
+    Sets up the configured storage backend on startup and closes it on
+    shutdown.
+
+    The "sqlite" backend replaces the in-memory store. As the database may be
+    shared with other workers, the change feed follows its change log and
+    reservation waiters check for reservations settled elsewhere. The
+    "memory" backend is restored from disk when a data directory is
+    configured, and every logged mutation is made durable on shutdown.
+    Repositories listed in `ELIB_CACHE` cache the entities they read by ID;
+    on the shared "sqlite" backend, entries must expire after
+    `ELIB_CACHE_TTL`. A background task flags the loans that become overdue.
+    """
+    cached = [
+        repository
+        for repository in (book_repository, user_repository)
+        if repository.collection in settings.cache
+    ]
+    unknown = set(settings.cache) - {repository.collection for repository in cached}
+    if unknown:
+        raise ValueError(f"Unknown cached collections: {', '.join(sorted(unknown))}")
+    if cached and settings.storage_backend == "sqlite" and settings.cache_ttl <= 0:
+        # Caches only see the writes of their own worker
+        raise ValueError(
+            "ELIB_CACHE on the sqlite backend needs a positive ELIB_CACHE_TTL"
+        )
+    write_ahead_log = None
+    store = None
+    follower = None
+    if settings.storage_backend == "sqlite":
+        store = SqliteStore(settings.sqlite_path)
+        event_hub.share(store)
+        follower = asyncio.create_task(event_hub.follow())
+        reservation_waiters.poll_interval = SHARED_STORE_POLL_INTERVAL
+        store.listeners.append(event_hub.publish)
+        use_store(store)
+    elif settings.storage_backend != "memory":
+        raise ValueError(f"Unknown storage backend: {settings.storage_backend}")
+    elif settings.data_dir:
+        write_ahead_log = WriteAheadLog(
+            data_store,
+            settings.data_dir,
+            fsync_interval=settings.wal_fsync_interval,
+            fsync_batch=settings.wal_fsync_batch,
+            snapshot_every=settings.snapshot_every,
+        )
+        write_ahead_log.open()
+    for repository in cached:
+        enable_cache(repository, settings.cache_size, settings.cache_ttl or None)
+    borrow_repository.loan_period = timedelta(days=settings.loan_period_days)
+    book_repository.loan_period = borrow_repository.loan_period
+    borrow_repository.max_active_loans = settings.max_active_loans or None
+    sweeper = asyncio.create_task(overdue_sweeper.run(settings.overdue_sweep_interval))
+    yield
+    sweeper.cancel()
+    with suppress(asyncio.CancelledError):
+        await sweeper
+    overdue_sweeper.swept_through = None
+    for repository in cached:
+        disable_cache(repository)
+    if follower:
+        follower.cancel()
+        with suppress(asyncio.CancelledError):
+            await follower
+    if write_ahead_log:
+        write_ahead_log.close()
+    if store:
+        event_hub.unshare()
+        reservation_waiters.poll_interval = None
+        use_store(data_store)
+        store.close()
 
-from app.routes import books, borrow, health_check, users
 
 # Initialize FastAPI app
 app = FastAPI(
     title="E-Library API System",
     description="API for managing an online library system",
+    lifespan=lifespan,
+    default_response_class=FastJSONResponse if settings.fast_json else JSONResponse,
 )
 
+# Publish changes made to the in-memory store; an SQLite store subscribes
+# in the lifespan
+data_store.listeners.append(event_hub.publish)
+
+app.add_middleware(MetricsMiddleware, metrics=request_metrics)
+# Always in place so profiling can be turned on at runtime; requests pass
+# straight through while the profiler is disabled
+app.add_middleware(ProfilingMiddleware, profiler=profiler)
+profiler.sample_rate = settings.profile_sample_rate
+if settings.profiling:
+    profiler.install()
+
 # Include routers
 app.include_router(health_check.router)
 app.include_router(users.router)
 app.include_router(books.router)
 app.include_router(borrow.router)
+app.include_router(reservations.router)
+app.include_router(events.router)
+app.include_router(stats.router)
+app.include_router(metrics.router)
+app.include_router(debug.router)
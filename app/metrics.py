@@ -0,0 +1,236 @@
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+
+# Upper bounds, in seconds, of the request latency histogram buckets
+LATENCY_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+# Route label of requests that matched no route
+UNMATCHED_ROUTE = "<unmatched>"
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LABEL_ESCAPES = str.maketrans({"\\": "\\\\", '"': '\\"', "\n": "\\n"})
+
+
+class RequestMetrics:
+    """
+    Per-route request counters and latency histograms.
+
+    Every thread records into its own shard, so the hot path takes no lock
+    and shares no cache lines with other threads. Shards are merged only
+    when the metrics are scraped.
+
+    Each shard maps a (method, route, status) key to a list holding one
+    counter per latency bucket, then the +Inf bucket, then the latency sum.
+    """
+
+    def __init__(self, buckets: tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self._local = threading.local()
+        self._shards: list[dict] = []
+        self._shards_lock = threading.Lock()
+
+    def observe(self, method: str, route: str, status: int, duration: float):
+        """
+        Records one request.
+
+        Args:
+            method (str): The HTTP method.
+            route (str): The route path template, e.g. "/books/{book_id}".
+            status (int): The response status code.
+            duration (float): Seconds taken to respond.
+        """
+        try:
+            shard = self._local.shard
+        except AttributeError:
+            shard = self._local.shard = {}
+            with self._shards_lock:
+                self._shards.append(shard)
+        key = (method, route, status)
+        series = shard.get(key)
+        if series is None:
+            series = shard[key] = [0] * (len(self.buckets) + 2)
+        series[bisect_left(self.buckets, duration)] += 1
+        series[-1] += duration
+
+    def collect(self) -> dict[tuple[str, str, int], list]:
+        """
+        Merges the shards of all threads.
+
+        Returns:
+            dict[tuple[str, str, int], list]: Per-bucket counts (not yet
+                cumulative) and the latency sum, keyed like the shards.
+        """
+        with self._shards_lock:
+            shards = list(self._shards)
+        merged = defaultdict(lambda: [0] * (len(self.buckets) + 2))
+        for shard in shards:
+            # dict.copy is atomic, so a thread adding a key cannot break this
+            for key, series in shard.copy().items():
+                total = merged[key]
+                for index, value in enumerate(series):
+                    total[index] += value
+        return merged
+
+    def reset(self):
+        """
+        Forgets every recorded request.
+        """
+        with self._shards_lock:
+            for shard in self._shards:
+                shard.clear()
+
+    def render(self) -> list[str]:
+        """
+        Renders the request counters and histograms in the Prometheus text
+        format.
+
+        Returns:
+            list[str]: The exposition lines.
+        """
+        merged = self.collect()
+        lines = [
+            "# HELP elib_http_requests_total Total HTTP requests.",
+            "# TYPE elib_http_requests_total counter",
+        ]
+        histograms = defaultdict(lambda: [0] * (len(self.buckets) + 2))
+        for (method, route, status), series in sorted(merged.items()):
+            count = sum(series[:-1])
+            lines.append(
+                "elib_http_requests_total"
+                f"{labels(method=method, route=route, status=status)} {count}"
+            )
+            histogram = histograms[method, route]
+            for index, value in enumerate(series):
+                histogram[index] += value
+        lines += [
+            "# HELP elib_http_request_duration_seconds HTTP request latency.",
+            "# TYPE elib_http_request_duration_seconds histogram",
+        ]
+        bounds = [*map(str, self.buckets), "+Inf"]
+        for (method, route), series in sorted(histograms.items()):
+            cumulative = 0
+            for bound, value in zip(bounds, series[:-1], strict=True):
+                cumulative += value
+                lines.append(
+                    "elib_http_request_duration_seconds_bucket"
+                    f"{labels(method=method, route=route, le=bound)} {cumulative}"
+                )
+            route_labels = labels(method=method, route=route)
+            lines.append(
+                f"elib_http_request_duration_seconds_sum{route_labels} {series[-1]}"
+            )
+            lines.append(
+                f"elib_http_request_duration_seconds_count{route_labels} {cumulative}"
+            )
+        return lines
+
+
+def labels(**values) -> str:
+    """
+    Formats Prometheus labels, escaping their values.
+    """
+    pairs = (
+        f'{name}="{str(value).translate(LABEL_ESCAPES)}"'
+        for name, value in values.items()
+    )
+    return "{" + ",".join(pairs) + "}"
+
+
+def gauge(name: str, help_text: str, samples: list[tuple[dict, float]]) -> list[str]:
+    """
+    Renders a gauge in the Prometheus text format.
+
+    Args:
+        name (str): The metric name.
+        help_text (str): The metric description.
+        samples (list[tuple[dict, float]]): Label values and value of each
+            sample.
+
+    Returns:
+        list[str]: The exposition lines.
+    """
+    return _series(name, help_text, "gauge", samples)
+
+
+def counter(name: str, help_text: str, samples: list[tuple[dict, float]]) -> list[str]:
+    """
+    Renders a counter in the Prometheus text format.
+
+    Args:
+        name (str): The metric name, ending in "_total".
+        help_text (str): The metric description.
+        samples (list[tuple[dict, float]]): Label values and value of each
+            sample.
+
+    Returns:
+        list[str]: The exposition lines.
+    """
+    return _series(name, help_text, "counter", samples)
+
+
+def _series(
+    name: str, help_text: str, kind: str, samples: list[tuple[dict, float]]
+) -> list[str]:
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+    for sample_labels, value in samples:
+        suffix = labels(**sample_labels) if sample_labels else ""
+        lines.append(f"{name}{suffix} {value}")
+    return lines
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording every HTTP request into `RequestMetrics`.
+
+    Requests are labelled with the path template of the route that handled
+    them, so "/books/1" and "/books/2" share one series.
+    """
+
+    def __init__(self, app, metrics: RequestMetrics):
+        self.app = app
+        self.metrics = metrics
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        status = 500
+        start = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            self.metrics.observe(
+                scope["method"],
+                route.path if route is not None else UNMATCHED_ROUTE,
+                status,
+                time.perf_counter() - start,
+            )
+
+
+request_metrics = RequestMetrics()
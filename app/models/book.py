@@ -1,4 +1,4 @@
-from pydantic import BaseModel, ConfigDict, Field
+from pydantic import BaseModel, ConfigDict, Field, field_validator
 
 
 class BookBase(BaseModel):
@@ -28,6 +28,8 @@ class BookUpdate(BaseModel):
     """
     Model for updating an existing Book.
 
+    Fields left out are unchanged; they cannot be set to null.
+
     Attributes:
         title (str | None): New title for the book.
         author (str | None): New author for the book.
@@ -40,6 +42,16 @@ class BookUpdate(BaseModel):
 
     model_config = ConfigDict(from_attributes=True)
 
+    @field_validator("title", "author")
+    @classmethod
+    def reject_null(cls, value: str | None) -> str:
+        """
+        Rejects explicit nulls; fields left out are left unchanged instead.
+        """
+        if value is None:
+            raise ValueError("may be omitted but not null")
+        return value
+
 
 class Book(BookBase):
     """
@@ -48,9 +60,24 @@ class Book(BookBase):
     Attributes:
         id (int): Unique identifier for the book.
         is_available (bool): Indicates if the book is available for borrowing.
+        version (int): Incremented on every change; the book's ETag.
     """
 
     id: int
     is_available: bool = True
+    version: int = 1
 
     model_config = ConfigDict(from_attributes=True)
+
+
+class PopularBook(BaseModel):
+    """
+    A book ranked by recent popularity.
+
+    Attributes:
+        book (Book): The book.
+        loans (int): Times the book was borrowed within the window.
+    """
+
+    book: Book
+    loans: int
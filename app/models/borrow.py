@@ -34,10 +34,78 @@ class BorrowRecord(BorrowRecordBase):
         id (int): Unique identifier for the borrow record.
         borrow_date (date): Date when the book was borrowed.
         return_date (date | None): Date when the book was returned.
+        due_date (date | None): Date by which the book must be returned;
+            None for loans made before due dates were tracked.
+        is_overdue (bool): Whether the loan was still open after its due
+            date, as flagged by the overdue sweeper.
+        version (int): Incremented on every change.
     """
 
     id: int
     borrow_date: date
     return_date: date | None = None
+    due_date: date | None = None
+    is_overdue: bool = False
+    version: int = 1
 
     model_config = ConfigDict(from_attributes=True)
+
+
+class BorrowBatchCreate(BaseModel):
+    """
+    Model for borrowing several books in one request.
+
+    Attributes:
+        items (list[BorrowRecordCreate]): The (user_id, book_id) pairs to lend.
+        atomic (bool): If True, nothing is lent unless every item succeeds.
+    """
+
+    items: list[BorrowRecordCreate] = Field(..., min_length=1, max_length=1000)
+    atomic: bool = False
+
+
+class ReturnBatch(BaseModel):
+    """
+    Model for returning several books in one request.
+
+    Attributes:
+        borrow_ids (list[int]): IDs of the borrow records to close.
+        atomic (bool): If True, nothing is returned unless every item succeeds.
+    """
+
+    borrow_ids: list[int] = Field(
+        ..., min_length=1, max_length=1000, json_schema_extra={"example": [1, 2]}
+    )
+    atomic: bool = False
+
+
+class BorrowBatchItemResult(BaseModel):
+    """
+    Outcome of one item of a batch borrow or return.
+
+    Attributes:
+        index (int): Position of the item in the request.
+        status_code (int): The status the single-item endpoint would return.
+        detail (str | None): Why the item was not applied, if it failed.
+        record (BorrowRecord | None): The borrow record, if the item succeeded.
+    """
+
+    index: int
+    status_code: int
+    detail: str | None = None
+    record: BorrowRecord | None = None
+
+
+class BorrowBatchResult(BaseModel):
+    """
+    Outcome of a batch borrow or return.
+
+    Attributes:
+        succeeded (int): Number of items applied.
+        failed (int): Number of items not applied.
+        items (list[BorrowBatchItemResult]): Per-item outcomes, in request order.
+    """
+
+    succeeded: int
+    failed: int
+    items: list[BorrowBatchItemResult]
@@ -0,0 +1,33 @@
+from typing import Any
+
+from pydantic import BaseModel, Field
+
+
+class BulkItemResult(BaseModel):
+    """
+    Outcome of one item of a bulk request.
+
+    Attributes:
+        index (int): Position of the item in the request.
+        id (int | None): ID of the created entity, if the item succeeded.
+        errors (list[dict] | None): Validation errors, if the item failed.
+    """
+
+    index: int
+    id: int | None = None
+    errors: list[dict[str, Any]] | None = None
+
+
+class BulkResult(BaseModel):
+    """
+    Outcome of a bulk request.
+
+    Attributes:
+        created (int): Number of entities created.
+        failed (int): Number of items rejected.
+        items (list[BulkItemResult]): Per-item outcomes, in request order.
+    """
+
+    created: int = Field(..., json_schema_extra={"example": 2})
+    failed: int = Field(..., json_schema_extra={"example": 0})
+    items: list[BulkItemResult]
@@ -0,0 +1,32 @@
+from pydantic import BaseModel, Field
+
+
+class ProfileSettings(BaseModel):
+    """
+    Runtime settings of the request profiler.
+
+    Attributes:
+        enabled (bool): Whether the profiler is installed. Requests are not
+            profiled while it is off.
+        sample_rate (float): Fraction of requests profiled without an
+            `X-Profile` header. 0 profiles only requests carrying the header,
+            1 profiles every request.
+    """
+
+    enabled: bool = Field(..., json_schema_extra={"example": True})
+    sample_rate: float = Field(..., ge=0, le=1, json_schema_extra={"example": 0.01})
+
+
+class ProfileSettingsUpdate(BaseModel):
+    """
+    Model for changing the runtime settings of the request profiler.
+
+    Attributes:
+        enabled (bool | None): Turns the profiler on or off.
+        sample_rate (float | None): New fraction of requests profiled.
+    """
+
+    enabled: bool | None = Field(None, json_schema_extra={"example": True})
+    sample_rate: float | None = Field(
+        None, ge=0, le=1, json_schema_extra={"example": 0.01}
+    )
@@ -0,0 +1,50 @@
+from datetime import date
+from enum import StrEnum
+
+from pydantic import BaseModel, ConfigDict, Field
+
+
+class ReservationStatus(StrEnum):
+    """
+    Lifecycle of a reservation.
+    """
+
+    WAITING = "waiting"
+    FULFILLED = "fulfilled"
+    CANCELLED = "cancelled"
+
+
+class ReservationCreate(BaseModel):
+    """
+    Model for joining the waitlist of an unavailable book.
+
+    Attributes:
+        user_id (int): ID of the user waiting for the book.
+        book_id (int): ID of the book.
+    """
+
+    user_id: int = Field(..., json_schema_extra={"example": 1})
+    book_id: int = Field(..., json_schema_extra={"example": 1})
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class Reservation(ReservationCreate):
+    """
+    Model representing a Reservation in the system.
+
+    Attributes:
+        id (int): Unique identifier for the reservation.
+        reserved_date (date): Date when the user joined the waitlist.
+        status (ReservationStatus): Whether the user is still waiting, got
+            the book or left the waitlist.
+        borrow_id (int | None): ID of the borrow record created when the
+            book was handed to the user.
+    """
+
+    id: int
+    reserved_date: date
+    status: ReservationStatus = ReservationStatus.WAITING
+    borrow_id: int | None = None
+
+    model_config = ConfigDict(from_attributes=True)
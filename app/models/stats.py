@@ -0,0 +1,56 @@
+from datetime import date
+
+from pydantic import BaseModel
+
+
+class DailyLoans(BaseModel):
+    """
+    Number of loans made on one day.
+
+    Attributes:
+        date (date): The day.
+        loans (int): Books borrowed that day.
+    """
+
+    date: date
+    loans: int
+
+
+class BookLoans(BaseModel):
+    """
+    Number of times a book was borrowed.
+
+    Attributes:
+        book_id (int): ID of the book.
+        loans (int): Times the book was borrowed.
+    """
+
+    book_id: int
+    loans: int
+
+
+class UserLoans(BaseModel):
+    """
+    Number of books a user borrowed.
+
+    Attributes:
+        user_id (int): ID of the user.
+        loans (int): Books the user borrowed.
+    """
+
+    user_id: int
+    loans: int
+
+
+class LoanDuration(BaseModel):
+    """
+    How long returned books were out.
+
+    Attributes:
+        returned_loans (int): Number of loans returned so far.
+        mean_days (float | None): Mean loan duration in days, None until a
+            book is returned.
+    """
+
+    returned_loans: int
+    mean_days: float | None
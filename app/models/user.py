@@ -1,4 +1,4 @@
-from pydantic import BaseModel, ConfigDict, EmailStr, Field
+from pydantic import BaseModel, ConfigDict, EmailStr, Field, field_validator
 
 
 class UserBase(BaseModel):
@@ -28,6 +28,8 @@ class UserUpdate(BaseModel):
     """
     Model for updating an existing User.
 
+    Fields left out are unchanged; they cannot be set to null.
+
     Attributes:
         name (str | None): New name for the user.
         email (EmailStr | None): New email address for the user.
@@ -40,6 +42,16 @@ class UserUpdate(BaseModel):
 
     model_config = ConfigDict(from_attributes=True)
 
+    @field_validator("name", "email")
+    @classmethod
+    def reject_null(cls, value: str | None) -> str:
+        """
+        Rejects explicit nulls; fields left out are left unchanged instead.
+        """
+        if value is None:
+            raise ValueError("may be omitted but not null")
+        return value
+
 
 class User(UserBase):
     """
@@ -48,9 +60,11 @@ class User(UserBase):
     Attributes:
         id (int): Unique identifier for the user.
         is_active (bool): Indicates if the user account is active.
+        version (int): Incremented on every change; the user's ETag.
     """
 
     id: int
     is_active: bool = True
+    version: int = 1
 
     model_config = ConfigDict(from_attributes=True)
@@ -0,0 +1,317 @@
+import functools
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar
+
+from app.metrics import UNMATCHED_ROUTE
+from app.repositories import BookRepository, BorrowRepository, UserRepository
+
+# Request header asking for the request to be profiled
+PROFILE_HEADER = b"x-profile"
+
+# Repository classes whose public methods are timed and sampled
+PROFILED_CLASSES = (UserRepository, BookRepository, BorrowRepository)
+
+# Seconds between two stack samples of threads inside repository calls
+SAMPLE_INTERVAL = 0.001
+
+
+class RequestProfile:
+    """
+    Timings collected while serving one profiled request.
+
+    Attributes:
+        calls (dict[str, list]): Call count, total and maximum seconds of each
+            repository method, keyed by its qualified name.
+    """
+
+    __slots__ = ("calls",)
+
+    def __init__(self):
+        self.calls = {}
+
+    def record(self, name: str, duration: float):
+        """
+        Records one repository call.
+        """
+        stats = self.calls.get(name)
+        if stats is None:
+            self.calls[name] = [1, duration, duration]
+        else:
+            stats[0] += 1
+            stats[1] += duration
+            stats[2] = max(stats[2], duration)
+
+
+_current_profile: ContextVar[RequestProfile | None] = ContextVar(
+    "current_profile", default=None
+)
+
+
+class Profiler:
+    """
+    Collects timings and stack samples of profiled requests.
+
+    A request is profiled when it carries an `X-Profile: 1` header, or at
+    random with probability `sample_rate`. For such requests the route
+    handler and every public `*Repository` method it calls are timed, and a
+    background thread samples the stacks of threads inside those repository
+    calls. Everything is aggregated in memory until `dump` is called.
+
+    Nothing is installed until `install` is called, and `ProfilingMiddleware`
+    checks `enabled` first, so a disabled profiler costs nothing. It can be
+    installed and uninstalled at runtime. Once installed, requests that are
+    not profiled only pay for a context variable lookup per repository call.
+
+    Attributes:
+        sample_rate (float): Fraction of requests profiled without the header.
+        sample_interval (float): Seconds between stack samples.
+    """
+
+    def __init__(self, sample_interval: float = SAMPLE_INTERVAL):
+        self.sample_rate = 0.0
+        self.sample_interval = sample_interval
+        self._originals = {}
+        self._lock = threading.Lock()
+        # Serializes install and uninstall, which may race at runtime
+        self._install_lock = threading.Lock()
+        self._routes = {}
+        self._stacks = Counter()
+        # Thread ID -> frame of the outermost profiled repository call
+        self._active_calls = {}
+        self._wakeup = threading.Event()
+        self._sampler = None
+
+    @property
+    def enabled(self) -> bool:
+        """
+        Whether the profiler is installed, with the repository hooks in place.
+        """
+        return bool(self._originals)
+
+    def install(self):
+        """
+        Hooks every public method of the profiled repository classes and
+        starts the stack sampler, unless already installed.
+        """
+        with self._install_lock:
+            if self.enabled:
+                return
+            for cls in PROFILED_CLASSES:
+                for name, method in list(vars(cls).items()):
+                    if callable(method) and not name.startswith("_"):
+                        self._originals[cls, name] = method
+                        setattr(cls, name, self._hook(method))
+            self._sampler = threading.Thread(
+                target=self._sample_loop, name="profiler-sampler", daemon=True
+            )
+            self._sampler.start()
+
+    def uninstall(self):
+        """
+        Restores the original repository methods and stops the sampler.
+
+        The collected data is kept until the next `dump` with `reset`.
+        """
+        with self._install_lock:
+            for (cls, name), method in self._originals.items():
+                setattr(cls, name, method)
+            self._originals.clear()
+            if self._sampler is not None:
+                sampler, self._sampler = self._sampler, None
+                self._wakeup.set()
+                sampler.join()
+
+    def should_profile(self, headers: list[tuple[bytes, bytes]]) -> bool:
+        """
+        Decides whether a request is profiled.
+
+        Args:
+            headers (list[tuple[bytes, bytes]]): The raw ASGI request headers.
+
+        Returns:
+            bool: True for requests asking for it or picked by sampling.
+        """
+        for name, value in headers:
+            if name == PROFILE_HEADER:
+                return value not in (b"0", b"false")
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def record(self, route: str, duration: float, profile: RequestProfile):
+        """
+        Merges a finished request into the aggregated results.
+
+        Args:
+            route (str): "<method> <route template>" of the request.
+            duration (float): Seconds taken to serve the request.
+            profile (RequestProfile): Repository calls made by the request.
+        """
+        with self._lock:
+            stats = self._routes.get(route)
+            if stats is None:
+                stats = self._routes[route] = {"request": [0, 0.0, 0.0], "calls": {}}
+            _merge(stats["request"], [1, duration, duration])
+            for name, call in profile.calls.items():
+                _merge(stats["calls"].setdefault(name, [0, 0.0, 0.0]), call)
+
+    def dump(self, reset: bool = False) -> dict:
+        """
+        Returns the aggregated results.
+
+        The aggregates are copied under a short lock and formatted outside
+        it, so requests being recorded are never held up by a dump.
+
+        Args:
+            reset (bool): Whether to start over after the dump.
+
+        Returns:
+            dict: Per-route request and repository call timings in
+                milliseconds, slowest first, and the sampled stacks in folded
+                format with their sample counts.
+        """
+        with self._lock:
+            if reset:
+                routes, self._routes = self._routes, {}
+                stacks, self._stacks = self._stacks, Counter()
+            else:
+                routes = {
+                    route: {
+                        "request": list(stats["request"]),
+                        "calls": {n: list(c) for n, c in stats["calls"].items()},
+                    }
+                    for route, stats in self._routes.items()
+                }
+                stacks = self._stacks.copy()
+        return {
+            "enabled": self.enabled,
+            "sample_rate": self.sample_rate,
+            "routes": {
+                route: {
+                    "requests": stats["request"][0],
+                    **_timings(stats["request"]),
+                    "calls": {
+                        name: {"calls": call[0], **_timings(call)}
+                        for name, call in sorted(
+                            stats["calls"].items(), key=lambda item: -item[1][1]
+                        )
+                    },
+                }
+                for route, stats in sorted(
+                    routes.items(), key=lambda item: -item[1]["request"][1]
+                )
+            },
+            "stacks": dict(stacks.most_common()),
+        }
+
+    def _hook(self, method):
+        """
+        Wraps a repository method to time it within profiled requests.
+        """
+        name = method.__qualname__
+        active_calls = self._active_calls
+        wakeup = self._wakeup
+
+        @functools.wraps(method)
+        def hooked(*args, **kwargs):
+            profile = _current_profile.get()
+            if profile is None:
+                return method(*args, **kwargs)
+            thread_id = threading.get_ident()
+            outermost = thread_id not in active_calls
+            if outermost:
+                active_calls[thread_id] = sys._getframe()
+                wakeup.set()
+            start = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                profile.record(name, time.perf_counter() - start)
+                if outermost:
+                    del active_calls[thread_id]
+
+        return hooked
+
+    def _sample_loop(self):
+        """
+        Samples the stacks of threads inside profiled repository calls until
+        the profiler is uninstalled.
+        """
+        me = threading.current_thread()
+        while self._sampler is me:
+            if not self._active_calls:
+                self._wakeup.wait()
+                self._wakeup.clear()
+                continue
+            frames = sys._current_frames()
+            samples = []
+            for thread_id, anchor in list(self._active_calls.items()):
+                frame = frames.get(thread_id)
+                stack = []
+                while frame is not None and frame is not anchor:
+                    stack.append(frame.f_code.co_qualname)
+                    frame = frame.f_back
+                if frame is anchor and stack:
+                    samples.append(";".join(reversed(stack)))
+            del frames
+            if samples:
+                with self._lock:
+                    self._stacks.update(samples)
+            time.sleep(self.sample_interval)
+
+
+def _merge(total: list, stats: list):
+    """
+    Adds call count, total and maximum seconds into a running total.
+    """
+    total[0] += stats[0]
+    total[1] += stats[1]
+    total[2] = max(total[2], stats[2])
+
+
+def _timings(stats: list) -> dict:
+    """
+    Formats call statistics in milliseconds.
+    """
+    return {
+        "total_ms": stats[1] * 1e3,
+        "mean_ms": stats[1] / stats[0] * 1e3 if stats[0] else 0.0,
+        "max_ms": stats[2] * 1e3,
+    }
+
+
+class ProfilingMiddleware:
+    """
+    ASGI middleware selecting the requests to profile and timing them.
+
+    Requests pass straight through while the profiler is disabled.
+    """
+
+    def __init__(self, app, profiler: Profiler):
+        self.app = app
+        self.profiler = profiler
+
+    async def __call__(self, scope, receive, send):
+        if (
+            scope["type"] != "http"
+            or not self.profiler.enabled
+            or not self.profiler.should_profile(scope["headers"])
+        ):
+            await self.app(scope, receive, send)
+            return
+        profile = RequestProfile()
+        token = _current_profile.set(profile)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            duration = time.perf_counter() - start
+            _current_profile.reset(token)
+            route = scope.get("route")
+            path = route.path if route is not None else UNMATCHED_ROUTE
+            self.profiler.record(f"{scope['method']} {path}", duration, profile)
+
+
+profiler = Profiler()
@@ -1,30 +1,12 @@
+from .aio import AsyncBookRepository, AsyncBorrowRepository, AsyncUserRepository
+from .backend import StorageBackend
 from .book import BookRepository
 from .borrow import BorrowRepository
+from .memory import DataStore
+from .overdue import OverdueSweeper
+from .reservation import ReservationRepository
 from .user import UserRepository
 
-
-class DataStore:
-    """
-    In-memory data store for the application.
-
-    Attributes:
-        users (dict): Stores User entities.
-        books (dict): Stores Book entities.
-        borrow_records (dict): Stores BorrowRecord entities.
-        user_id_seq (int): Sequence counter for user IDs.
-        book_id_seq (int): Sequence counter for book IDs.
-        borrow_id_seq (int): Sequence counter for borrow record IDs.
-    """
-
-    def __init__(self):
-        self.users = {}
-        self.books = {}
-        self.borrow_records = {}
-        self.user_id_seq = 1
-        self.book_id_seq = 1
-        self.borrow_id_seq = 1
-
-
 # Initialize the in-memory data store
 data_store = DataStore()
 
@@ -32,3 +14,36 @@ data_store = DataStore()
 user_repository = UserRepository(data_store)
 book_repository = BookRepository(data_store)
 borrow_repository = BorrowRepository(data_store)
+reservation_repository = ReservationRepository(data_store)
+
+# Flags overdue loans; started by the application lifespan
+overdue_sweeper = OverdueSweeper(borrow_repository)
+
+# Async counterparts for the async routes; they follow `use_store` through
+# the repositories they wrap
+async_user_repository = AsyncUserRepository(user_repository)
+async_book_repository = AsyncBookRepository(book_repository)
+async_borrow_repository = AsyncBorrowRepository(borrow_repository)
+
+
+def use_store(store: StorageBackend):
+    """
+    Points the shared repositories at another storage backend.
+
+    Enabled caches are emptied and follow the new backend's mutations.
+
+    Args:
+        store (StorageBackend): The backend to use from now on.
+    """
+    global data_store
+    data_store = store
+    for repository in (
+        user_repository,
+        book_repository,
+        borrow_repository,
+        reservation_repository,
+    ):
+        repository.data_store = store
+        cache = getattr(repository, "cache", None)
+        if cache is not None:
+            cache.attach(store)
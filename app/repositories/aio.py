@@ -0,0 +1,144 @@
+import functools
+from collections.abc import Callable
+
+from starlette.concurrency import run_in_threadpool
+
+from .book import BookRepository
+from .borrow import BorrowRepository
+from .locks import LockContendedError, no_wait
+from .user import UserRepository
+
+
+def _awaitable(
+    method: Callable, lock_free: bool = False, try_inline: bool = False
+) -> Callable:
+    """
+    Turns a repository method into a coroutine method of its async counterpart.
+
+    Args:
+        method (Callable): The method, taken from the repository class.
+        lock_free (bool): Whether the method only reads the store without
+            taking any lock, so it can run on the event loop.
+        try_inline (bool): Whether the method may first be tried on the
+            event loop without waiting for its entity locks. It must take
+            all of them before changing anything.
+
+    Returns:
+        Callable: A coroutine method calling `method` on the wrapped
+            repository, with the same name, signature and docstring.
+    """
+    name = method.__name__
+
+    @functools.wraps(method)
+    async def call(self, *args, **kwargs):
+        repository = self.repository
+        bound = getattr(repository, name)
+        inline = (
+            not repository.data_store.blocking
+            # Cached reads take the cache's lock
+            and getattr(repository, "cache", None) is None
+        )
+        if inline and lock_free:
+            return bound(*args, **kwargs)
+        if inline and try_inline:
+            try:
+                with no_wait():
+                    return bound(*args, **kwargs)
+            except LockContendedError:
+                # Another thread holds a lock; wait for it off the loop
+                pass
+        return await run_in_threadpool(bound, *args, **kwargs)
+
+    return call
+
+
+class AsyncRepository:
+    """
+    Base of the asyncio counterparts of the repositories.
+
+    Operations on a non-blocking store, like the in-memory `DataStore`, take
+    a few microseconds, which is less than the hop to a worker thread, so
+    they run right on the event loop when they cannot wait. Reads that take
+    no lock always do. Single-entity writes are tried on the loop with their
+    entity locks taken without waiting; when another thread holds one (a
+    bulk import holds email locks, the overdue sweeper holds book locks for
+    a whole batch), the write runs in the threadpool instead and waits
+    there. Bulk writes, searches, statistics and every operation on a
+    blocking store, like SQLite or a memory store with a write-ahead log,
+    run in the threadpool and are awaited, leaving the event loop free.
+
+    Attributes:
+        repository: The synchronous repository doing the work.
+    """
+
+    def __init__(self, repository):
+        """
+        Wraps a synchronous repository.
+
+        Args:
+            repository: The repository; its current `data_store` is used.
+        """
+        self.repository = repository
+
+
+class AsyncUserRepository(AsyncRepository):
+    """
+    Asyncio counterpart of `UserRepository`.
+    """
+
+    create_user = _awaitable(UserRepository.create_user, try_inline=True)
+    get_user = _awaitable(UserRepository.get_user, lock_free=True)
+    get_user_by_email = _awaitable(UserRepository.get_user_by_email, lock_free=True)
+    list_users = _awaitable(UserRepository.list_users, lock_free=True)
+    update_user = _awaitable(UserRepository.update_user, try_inline=True)
+    delete_user = _awaitable(UserRepository.delete_user, try_inline=True)
+    deactivate_user = _awaitable(UserRepository.deactivate_user, try_inline=True)
+
+
+class AsyncBookRepository(AsyncRepository):
+    """
+    Asyncio counterpart of `BookRepository`.
+    """
+
+    create_book = _awaitable(BookRepository.create_book, try_inline=True)
+    get_book = _awaitable(BookRepository.get_book, lock_free=True)
+    list_books = _awaitable(BookRepository.list_books, lock_free=True)
+    search_books = _awaitable(BookRepository.search_books)
+    get_popular_books = _awaitable(BookRepository.get_popular_books)
+    update_book = _awaitable(BookRepository.update_book, try_inline=True)
+    delete_book = _awaitable(BookRepository.delete_book, try_inline=True)
+    mark_book_unavailable = _awaitable(
+        BookRepository.mark_book_unavailable, try_inline=True
+    )
+    mark_book_available = _awaitable(
+        BookRepository.mark_book_available, try_inline=True
+    )
+
+
+class AsyncBorrowRepository(AsyncRepository):
+    """
+    Asyncio counterpart of `BorrowRepository`.
+    """
+
+    borrow_book = _awaitable(BorrowRepository.borrow_book, try_inline=True)
+    return_book = _awaitable(BorrowRepository.return_book, try_inline=True)
+    borrow_books = _awaitable(BorrowRepository.borrow_books)
+    return_books = _awaitable(BorrowRepository.return_books)
+    list_borrow_records = _awaitable(
+        BorrowRepository.list_borrow_records, lock_free=True
+    )
+    get_borrow_records_by_user = _awaitable(
+        BorrowRepository.get_borrow_records_by_user, lock_free=True
+    )
+    count_active_loans = _awaitable(BorrowRepository.count_active_loans, lock_free=True)
+    get_active_borrow_records_by_user = _awaitable(
+        BorrowRepository.get_active_borrow_records_by_user, lock_free=True
+    )
+    get_active_borrow_record = _awaitable(
+        BorrowRepository.get_active_borrow_record, lock_free=True
+    )
+    get_overdue_borrow_records = _awaitable(BorrowRepository.get_overdue_borrow_records)
+    get_loans_per_day = _awaitable(BorrowRepository.get_loans_per_day)
+    get_most_borrowed_books = _awaitable(BorrowRepository.get_most_borrowed_books)
+    get_top_borrowers = _awaitable(BorrowRepository.get_top_borrowers)
+    get_loan_duration = _awaitable(BorrowRepository.get_loan_duration)
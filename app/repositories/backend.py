@@ -0,0 +1,462 @@
+from abc import ABC, abstractmethod
+from collections.abc import Callable, Iterator
+from contextlib import AbstractContextManager
+from datetime import date
+
+from pydantic import BaseModel
+
+from .mutations import Mutation
+
+
+def normalize_email(email: str) -> str:
+    """
+    Returns the key under which an email address is unique.
+
+    Email addresses are compared case-insensitively.
+
+    Args:
+        email (str): The email address.
+
+    Returns:
+        str: The case-folded address.
+    """
+    return email.casefold()
+
+
+class VersionMismatchError(Exception):
+    """
+    Raised when an entity was changed since the version an update expects.
+
+    Attributes:
+        version (int): The entity's current version.
+    """
+
+    def __init__(self, version: int):
+        super().__init__(version)
+        self.version = version
+
+
+class StorageBackend(ABC):
+    """
+    Storage engine behind the repositories.
+
+    Entities are grouped in collections named after the DataStore attributes:
+    "users", "books", "borrow_records" and "reservations". Backends store and return
+    validated Pydantic models; the business rules stay in the repositories.
+
+    Attributes:
+        listeners (list): Callables notified of every Mutation made through
+            the repositories, e.g. the write-ahead log.
+        blocking (bool): Whether operations may wait on I/O, so that async
+            callers must run them off the event loop.
+    """
+
+    blocking = False
+
+    def __init__(self):
+        self.listeners = []
+
+    def publish(self, op: str, puts=(), deletes=()):
+        """
+        Notifies the listeners of a mutation.
+
+        Repositories call this while still holding the locks of the entities
+        they changed, so listeners observe mutations of an entity in order.
+
+        Args:
+            op (str): Name of the repository operation.
+            puts (Iterable): (collection, entity) pairs created or changed.
+            deletes (Iterable): (collection, entity ID) pairs deleted.
+        """
+        if not self.listeners:
+            return
+        mutation = Mutation(op, tuple(puts), tuple(deletes))
+        for listener in self.listeners:
+            listener(mutation)
+
+    def after_write(self, callback: Callable[[], None]):
+        """
+        Runs a callback once the writes made so far are visible to readers on
+        other threads.
+
+        Listeners are notified before a transactional backend commits; they
+        use this for effects that must not be observed earlier, such as
+        invalidating a cache. Writes to this store are visible at once, so
+        the callback runs right away.
+
+        Args:
+            callback (Callable[[], None]): The function to run.
+        """
+        callback()
+
+    def apply(self, mutation: Mutation):
+        """
+        Applies a mutation to the store without notifying listeners.
+
+        Used to replay logged mutations. Entities are stored as given, indexes
+        are updated and the ID sequences are moved past every stored ID.
+
+        Args:
+            mutation (Mutation): The mutation to apply.
+        """
+        for collection, entity in mutation.puts:
+            self.put(collection, entity)
+            self.advance_sequence(collection, entity.id)
+        for collection, entity_id in mutation.deletes:
+            self.delete(collection, entity_id)
+
+    def put_many(self, collection: str, entities: list):
+        """
+        Inserts or replaces several entities of one collection at once.
+
+        Args:
+            collection (str): The collection to store the entities in.
+            entities (list): The entities, keyed by their `id`.
+        """
+        for entity in entities:
+            self.put(collection, entity)
+
+    def close(self):
+        """
+        Releases the resources held by the backend.
+        """
+        self.listeners.clear()
+
+    @abstractmethod
+    def reset(self):
+        """
+        Deletes all entities and restarts the ID sequences.
+        """
+
+    @abstractmethod
+    def next_id(self, sequence: str) -> int:
+        """
+        Atomically takes the next value from an ID sequence.
+
+        Args:
+            sequence (str): The sequence name: "user", "book" or "borrow".
+
+        Returns:
+            int: The reserved ID.
+        """
+
+    @abstractmethod
+    def reserve_ids(self, sequence: str, count: int) -> range:
+        """
+        Atomically takes a contiguous block of values from an ID sequence.
+
+        Args:
+            sequence (str): The sequence name: "user", "book" or "borrow".
+            count (int): Number of IDs to reserve.
+
+        Returns:
+            range: The reserved IDs.
+        """
+
+    @abstractmethod
+    def advance_sequence(self, collection: str, entity_id: int):
+        """
+        Moves a collection's ID sequence past an existing ID.
+
+        Args:
+            collection (str): The collection the ID belongs to.
+            entity_id (int): An ID already in use.
+        """
+
+    @abstractmethod
+    def get(self, collection: str, entity_id: int) -> BaseModel | None:
+        """
+        Retrieves an entity by ID.
+
+        Args:
+            collection (str): The collection to look in.
+            entity_id (int): The ID of the entity.
+
+        Returns:
+            BaseModel | None: The entity if found, else None.
+        """
+
+    @abstractmethod
+    def put(self, collection: str, entity: BaseModel):
+        """
+        Inserts or replaces an entity and updates the indexes over it.
+
+        Args:
+            collection (str): The collection to store the entity in.
+            entity (BaseModel): The entity, keyed by its `id`.
+        """
+
+    @abstractmethod
+    def delete(self, collection: str, entity_id: int) -> bool:
+        """
+        Deletes an entity.
+
+        Args:
+            collection (str): The collection to delete from.
+            entity_id (int): The ID of the entity.
+
+        Returns:
+            bool: True if the entity existed, False otherwise.
+        """
+
+    @abstractmethod
+    def scan(self, collection: str, after: int = 0, **filters) -> Iterator:
+        """
+        Iterates over the entities of a collection in ID order.
+
+        Args:
+            collection (str): The collection to iterate over.
+            after (int): Only entities with a greater ID are returned.
+            **filters: Field values the entities must have. `is_returned`
+                filters borrow records on whether `return_date` is set, and
+                `borrowed_from`/`borrowed_to` on an inclusive `borrow_date`
+                range. None values are ignored.
+
+        Yields:
+            BaseModel: The matching entities.
+        """
+
+    @abstractmethod
+    def page(self, collection: str, after: int, limit: int, **filters) -> list:
+        """
+        Retrieves one page of `scan` results.
+
+        Args:
+            collection (str): The collection to read.
+            after (int): Only entities with a greater ID are returned.
+            limit (int): Maximum number of entities to return.
+            **filters: Same as for `scan`.
+
+        Returns:
+            list: Up to `limit` matching entities, in ID order.
+        """
+
+    @abstractmethod
+    def count(self, collection: str, **filters) -> int:
+        """
+        Counts the entities of a collection.
+
+        Args:
+            collection (str): The collection to count.
+            **filters: Same as for `scan`.
+
+        Returns:
+            int: The number of matching entities.
+        """
+
+    @abstractmethod
+    def find_borrow_records_by_user(self, user_id: int) -> list:
+        """
+        Retrieves the borrow records of a user.
+
+        Args:
+            user_id (int): ID of the user.
+
+        Returns:
+            list[BorrowRecord]: The user's borrow records, in ID order.
+        """
+
+    @abstractmethod
+    def find_active_borrow_record(self, user_id: int, book_id: int) -> BaseModel | None:
+        """
+        Retrieves the unreturned borrow record of a user for a book.
+
+        Args:
+            user_id (int): ID of the user.
+            book_id (int): ID of the book.
+
+        Returns:
+            BorrowRecord | None: The active borrow record if exists, else None.
+        """
+
+    @abstractmethod
+    def count_active_loans(self, user_id: int) -> int:
+        """
+        Counts the borrow records of a user that have not been returned.
+
+        Args:
+            user_id (int): ID of the user.
+
+        Returns:
+            int: The number of books the user currently holds.
+        """
+
+    @abstractmethod
+    def find_active_borrow_records_by_user(self, user_id: int) -> list:
+        """
+        Retrieves the borrow records of a user that have not been returned.
+
+        Args:
+            user_id (int): ID of the user.
+
+        Returns:
+            list: The user's open loans, in ID order.
+        """
+
+    @abstractmethod
+    def find_due_borrow_records(
+        self, before: date, since: date | None = None, limit: int | None = None
+    ) -> list:
+        """
+        Retrieves the unreturned borrow records due within a range of days.
+
+        Args:
+            before (date): Only records due before this day.
+            since (date | None): Only records due on or after this day, if set.
+            limit (int | None): Maximum number of records to return, if set.
+
+        Returns:
+            list: The matching borrow records, earliest due first, then in
+                ID order. Records without a due date never match.
+        """
+
+    @abstractmethod
+    def find_user_by_email(self, email: str) -> BaseModel | None:
+        """
+        Looks up a user by email address, ignoring case.
+
+        Args:
+            email (str): The email address.
+
+        Returns:
+            User | None: The user registered with that address, if any.
+        """
+
+    @abstractmethod
+    def find_waiting_reservations(self, book_id: int, limit: int | None = None) -> list:
+        """
+        Retrieves the waitlist of a book.
+
+        Args:
+            book_id (int): ID of the book.
+            limit (int | None): Maximum number of reservations to return, if
+                set; 1 peeks at the head of the waitlist.
+
+        Returns:
+            list[Reservation]: The book's reservations still waiting, in ID
+                order, which is the order users joined the waitlist.
+        """
+
+    @abstractmethod
+    def find_waiting_reservation(self, book_id: int, user_id: int) -> BaseModel | None:
+        """
+        Retrieves the reservation a user is waiting on for a book.
+
+        Args:
+            book_id (int): ID of the book.
+            user_id (int): ID of the user.
+
+        Returns:
+            Reservation | None: The user's waiting reservation, if any.
+        """
+
+    @abstractmethod
+    def search_books(self, query: str, limit: int) -> list:
+        """
+        Searches books by title and author.
+
+        Args:
+            query (str): Free-text query; the last word may be a prefix.
+            limit (int): Maximum number of books to return.
+
+        Returns:
+            list[Book]: The books matching every word, best match first.
+        """
+
+    @abstractmethod
+    def loans_per_day(
+        self, start: date | None = None, end: date | None = None
+    ) -> list[tuple[date, int]]:
+        """
+        Counts the loans made each day.
+
+        Args:
+            start (date | None): First day to report, if any.
+            end (date | None): Last day to report, if any.
+
+        Returns:
+            list[tuple[date, int]]: Days with at least one loan and their
+                loan counts, in date order.
+        """
+
+    @abstractmethod
+    def most_borrowed(self, field: str, limit: int) -> list[tuple[int, int]]:
+        """
+        Ranks books or users by the number of loans they were part of.
+
+        Args:
+            field (str): "book_id" to rank books, "user_id" to rank users.
+            limit (int): Maximum number of entries to return.
+
+        Returns:
+            list[tuple[int, int]]: (ID, loans) pairs, most loans first, ties
+                broken by ascending ID.
+        """
+
+    @abstractmethod
+    def popular_books(
+        self, window_days: int, limit: int, today: date
+    ) -> list[tuple[int, int]]:
+        """
+        Ranks books by the number of times they were borrowed recently.
+
+        Args:
+            window_days (int): Number of days, ending today, to rank over,
+                from 1 to `MAX_WINDOW_DAYS`.
+            limit (int): Maximum number of books to return.
+            today (date): Last day of the window.
+
+        Returns:
+            list[tuple[int, int]]: (book ID, loans) pairs, most loans first,
+                ties broken by ascending book ID.
+
+        Raises:
+            ValueError: If the window is out of range.
+        """
+
+    @abstractmethod
+    def loan_duration(self) -> tuple[int, float | None]:
+        """
+        Measures how long returned books were out.
+
+        Returns:
+            tuple[int, float | None]: The number of returned loans and their
+                mean duration in days, None when nothing was returned.
+        """
+
+    @abstractmethod
+    def lock_users(self, *user_ids: int) -> AbstractContextManager:
+        """
+        Serializes mutations of the given users.
+
+        Args:
+            *user_ids (int): IDs of the users about to change.
+
+        Returns:
+            AbstractContextManager: Holds the locks while entered.
+        """
+
+    @abstractmethod
+    def lock_emails(self, *emails: str) -> AbstractContextManager:
+        """
+        Serializes the registration of the given email addresses, so that
+        checking an address is free and claiming it happen atomically.
+
+        Args:
+            *emails (str): Email addresses about to be claimed.
+
+        Returns:
+            AbstractContextManager: Holds the locks while entered.
+        """
+
+    @abstractmethod
+    def lock_books(self, *book_ids: int) -> AbstractContextManager:
+        """
+        Serializes mutations, borrows and returns of the given books.
+
+        Args:
+            *book_ids (int): IDs of the books about to change.
+
+        Returns:
+            AbstractContextManager: Holds the locks while entered.
+        """
@@ -1,19 +1,40 @@
-from app.models.book import Book, BookCreate, BookUpdate
+from collections.abc import Collection
+from datetime import date, timedelta
+
+from app.models.book import Book, BookCreate, BookUpdate, PopularBook
+from app.models.reservation import ReservationStatus
+
+from .backend import VersionMismatchError
+from .borrow import LOAN_PERIOD_DAYS
+from .cache import read_through
+from .reservation import hand_off, reservation_waiters, settled_reservations
 
 
 class BookRepository:
     """
     Repository for managing Book entities.
+
+    Writes read the book they change straight from the store, under its
+    lock, never from the cache, which may lag behind a concurrent write.
+
+    Attributes:
+        cache (EntityCache | None): Cache serving `get_book`, if enabled.
+        loan_period (timedelta): How long the loan lasts when a book marked
+            available goes straight to the first user on its waitlist.
     """
 
+    collection = "books"
+
     def __init__(self, data_store):
         """
         Initializes the BookRepository with a data store.
 
         Args:
-            data_store (dict): In-memory data store for books.
+            data_store (StorageBackend): Storage backend holding the books.
         """
         self.data_store = data_store
+        self.cache = None
+        self.loan_period = timedelta(days=LOAN_PERIOD_DAYS)
 
     def create_book(self, book_create: BookCreate) -> Book:
         """
@@ -25,11 +46,37 @@ class BookRepository:
         Returns:
             Book: The created book with a unique ID.
         """
-        book = Book(id=self.data_store.book_id_seq, **book_create.model_dump())
-        self.data_store.books[self.data_store.book_id_seq] = book
-        self.data_store.book_id_seq += 1
+        book = Book(id=self.data_store.next_id("book"), **book_create.model_dump())
+        self.data_store.put("books", book)
+        self.data_store.publish("create_book", puts=[("books", book)])
         return book
 
+    def create_books(self, book_creates: list[BookCreate]) -> list[Book]:
+        """
+        Creates several books at once.
+
+        The IDs are reserved as one contiguous block and the books are stored
+        in a single backend call.
+
+        Args:
+            book_creates (list[BookCreate]): Validated data for each new book.
+
+        Returns:
+            list[Book]: The created books, in input order.
+        """
+        ids = self.data_store.reserve_ids("book", len(book_creates))
+        # The input is already validated, so skip validating it a second time
+        books = [
+            Book.model_construct(id=book_id, **book_create.model_dump())
+            for book_id, book_create in zip(ids, book_creates, strict=True)
+        ]
+        self.data_store.put_many("books", books)
+        self.data_store.publish(
+            "create_books", puts=[("books", book) for book in books]
+        )
+        return books
+
+    @read_through
     def get_book(self, book_id: int) -> Book | None:
         """
         Retrieves a book by ID.
@@ -40,42 +87,126 @@ class BookRepository:
         Returns:
             Book | None: The book if found, else None.
         """
-        return self.data_store.books.get(book_id)
+        return self.data_store.get("books", book_id)
+
+    def list_books(
+        self, after: int = 0, limit: int = 100, is_available: bool | None = None
+    ) -> list[Book]:
+        """
+        Retrieves a page of books in ID order.
+
+        Args:
+            after (int): Only books with a greater ID are returned.
+            limit (int): Maximum number of books to return.
+            is_available (bool | None): If set, only books with this availability.
+
+        Returns:
+            list[Book]: Up to `limit` books.
+        """
+        return self.data_store.page("books", after, limit, is_available=is_available)
 
-    def update_book(self, book_id: int, book_update: BookUpdate) -> Book | None:
+    def search_books(self, query: str, limit: int = 20) -> list[Book]:
+        """
+        Searches books by title and author.
+
+        Args:
+            query (str): Free-text query; the last word may be a prefix.
+            limit (int): Maximum number of books to return.
+
+        Returns:
+            list[Book]: The matching books, best match first.
+        """
+        return self.data_store.search_books(query, limit)
+
+    def get_popular_books(
+        self, window_days: int = 7, limit: int = 20
+    ) -> list[PopularBook]:
+        """
+        Ranks books by the number of times they were borrowed recently.
+
+        Args:
+            window_days (int): Number of days, ending today, to rank over.
+            limit (int): Maximum number of books to return.
+
+        Returns:
+            list[PopularBook]: The most borrowed books that still exist, most
+                loans first.
+
+        Raises:
+            ValueError: If the window is out of range.
+        """
+        ranking = self.data_store.popular_books(window_days, limit, date.today())
+        popular = []
+        for book_id, loans in ranking:
+            book = self.data_store.get("books", book_id)
+            if book is not None:
+                popular.append(PopularBook(book=book, loans=loans))
+        return popular
+
+    def update_book(
+        self,
+        book_id: int,
+        book_update: BookUpdate,
+        versions: Collection[int] | None = None,
+    ) -> Book | None:
         """
         Updates an existing book's information.
 
         Args:
             book_id (int): The ID of the book to update.
             book_update (BookUpdate): The new data for the book.
+            versions (Collection[int] | None): If set, the book is only
+                updated while its version is one of these.
 
         Returns:
             Book | None: The updated book if found, else None.
+
+        Raises:
+            VersionMismatchError: The book's version is not in `versions`.
         """
-        book = self.get_book(book_id)
-        if book:
-            updated_data = book.model_copy(
-                update=book_update.model_dump(exclude_unset=True)
-            )
-            self.data_store.books[book_id] = updated_data
-            return updated_data
+        with self.data_store.lock_books(book_id):
+            book = self.data_store.get("books", book_id)
+            if book and versions is not None and book.version not in versions:
+                raise VersionMismatchError(book.version)
+            if book:
+                updated_data = book.model_copy(
+                    update={
+                        **book_update.model_dump(exclude_unset=True),
+                        "version": book.version + 1,
+                    }
+                )
+                self.data_store.put("books", updated_data)
+                self.data_store.publish("update_book", puts=[("books", updated_data)])
+                return updated_data
         return None
 
     def delete_book(self, book_id: int) -> bool:
         """
         Deletes a book from the data store.
 
+        Reservations still waiting for the book are cancelled.
+
         Args:
             book_id (int): The ID of the book to delete.
 
         Returns:
             bool: True if deletion was successful, False otherwise.
         """
-        if book_id in self.data_store.books:
-            del self.data_store.books[book_id]
-            return True
-        return False
+        with self.data_store.lock_books(book_id):
+            waitlist = self.data_store.find_waiting_reservations(book_id)
+            deleted = self.data_store.delete("books", book_id)
+            if deleted:
+                for reservation in waitlist:
+                    reservation.status = ReservationStatus.CANCELLED
+                    self.data_store.put("reservations", reservation)
+                self.data_store.publish(
+                    "delete_book",
+                    puts=[("reservations", reservation) for reservation in waitlist],
+                    deletes=[("books", book_id)],
+                )
+        if deleted:
+            reservation_waiters.notify(reservation.id for reservation in waitlist)
+        return deleted
 
     def mark_book_unavailable(self, book_id: int) -> Book | None:
         """
@@ -87,16 +218,20 @@ class BookRepository:
         Returns:
             Book | None: The updated book if found and available, else None.
         """
-        book = self.get_book(book_id)
-        if book and book.is_available:
-            book.is_available = False
-            self.data_store.books[book_id] = book
-            return book
+        with self.data_store.lock_books(book_id):
+            book = self.data_store.get("books", book_id)
+            if book and book.is_available:
+                book.is_available = False
+                book.version += 1
+                self.data_store.put("books", book)
+                self.data_store.publish("mark_book_unavailable", puts=[("books", book)])
+                return book
         return None
 
     def mark_book_available(self, book_id: int) -> Book | None:
         """
-        Marks a book as available.
+        Marks a book as available, or lends it straight to the first user on
+        its waitlist.
 
         Args:
             book_id (int): The ID of the book to mark as available.
@@ -104,9 +239,13 @@ class BookRepository:
         Returns:
             Book | None: The updated book if found and unavailable, else None.
         """
-        book = self.get_book(book_id)
-        if book and not book.is_available:
-            book.is_available = True
-            self.data_store.books[book_id] = book
-            return book
-        return None
+        with self.data_store.lock_books(book_id):
+            book = self.data_store.get("books", book_id)
+            if book and not book.is_available:
+                puts = hand_off(self.data_store, book, date.today(), self.loan_period)
+                self.data_store.publish("mark_book_available", puts=puts)
+            else:
+                book = None
+        if book:
+            reservation_waiters.notify(settled_reservations(puts))
+        return book
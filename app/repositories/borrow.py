@@ -1,11 +1,64 @@
-from datetime import date
+from collections.abc import Iterator
+from datetime import date, timedelta
+from enum import StrEnum
 
 from app.models.borrow import BorrowRecord
+from app.models.stats import BookLoans, DailyLoans, LoanDuration, UserLoans
+
+from .reservation import hand_off, reservation_waiters, settled_reservations
+
+# Days a book may be kept unless configured otherwise
+LOAN_PERIOD_DAYS = 14
+
+# Books a user may hold at once unless configured otherwise
+MAX_ACTIVE_LOANS = 10
+
+# Overdue loans flagged per transaction by `flag_overdue_loans`
+OVERDUE_FLAG_BATCH = 500
+
+
+class BorrowError(StrEnum):
+    """
+    Reasons a borrow or return in a batch was not applied.
+    """
+
+    USER_NOT_FOUND = "User not found"
+    USER_INACTIVE = "User is inactive"
+    ALREADY_BORROWED = "Book already borrowed by the user"
+    BOOK_NOT_FOUND = "Book not found"
+    BOOK_UNAVAILABLE = "Book is not available for borrowing"
+    LOAN_LIMIT_REACHED = "User has reached the maximum number of loans"
+    CANNOT_RETURN = "Cannot return book. Check if borrow record exists and book is not already returned."
+    DUPLICATE = "Item appears more than once in the batch"
+    BATCH_ABORTED = "Not applied because another item in the batch failed"
+
+
+class LoanLimitError(Exception):
+    """
+    Raised when a user already holds as many books as they may.
+
+    Attributes:
+        limit (int): The maximum number of active loans per user.
+    """
+
+    def __init__(self, limit: int):
+        super().__init__(limit)
+        self.limit = limit
 
 
 class BorrowRepository:
     """
     Repository for managing BorrowRecord entities.
+
+    Borrows lock the user as well as the book, so concurrent borrows by one
+    user cannot together exceed `max_active_loans`.
+
+    Attributes:
+        loan_period (timedelta): How long a book may be kept; sets the due
+            date of every new loan.
+        max_active_loans (int | None): Books a user may hold at once, or
+            None for no limit. Loans handed over from a waitlist are exempt,
+            as the reservation was already accepted.
     """
 
     def __init__(self, data_store):
@@ -13,9 +66,11 @@ class BorrowRepository:
         Initializes the BorrowRepository with a data store.
 
         Args:
-            data_store (dict): In-memory data store for borrow records.
+            data_store (StorageBackend): Storage backend holding the borrow records.
         """
         self.data_store = data_store
+        self.loan_period = timedelta(days=LOAN_PERIOD_DAYS)
+        self.max_active_loans = MAX_ACTIVE_LOANS
 
     def borrow_book(self, user_id: int, book_id: int) -> BorrowRecord | None:
         """
@@ -27,26 +82,38 @@ class BorrowRepository:
 
         Returns:
             BorrowRecord | None: The created borrow record if successful, else None.
+
+        Raises:
+            LoanLimitError: The user already holds `max_active_loans` books.
         """
-        user = self.data_store.users.get(user_id)
-        book = self.data_store.books.get(book_id)
-        if user and user.is_active and book and book.is_available:
-            borrow_record = BorrowRecord(
-                id=self.data_store.borrow_id_seq,
-                user_id=user_id,
-                book_id=book_id,
-                borrow_date=date.today(),
-            )
-            self.data_store.borrow_records[self.data_store.borrow_id_seq] = (
-                borrow_record
-            )
-            self.data_store.borrow_id_seq += 1
+        lock_user = self.data_store.lock_users(user_id)
+        with lock_user, self.data_store.lock_books(book_id):
+            user = self.data_store.get("users", user_id)
+            book = self.data_store.get("books", book_id)
+            if user and user.is_active and book and book.is_available:
+                limit = self.max_active_loans
+                if limit is not None and self.count_active_loans(user_id) >= limit:
+                    raise LoanLimitError(limit)
+                today = date.today()
+                borrow_record = BorrowRecord(
+                    id=self.data_store.next_id("borrow"),
+                    user_id=user_id,
+                    book_id=book_id,
+                    borrow_date=today,
+                    due_date=today + self.loan_period,
+                )
+                self.data_store.put("borrow_records", borrow_record)
 
-            # Update book availability
-            book.is_available = False
-            self.data_store.books[book_id] = book
+                # Update book availability
+                book.is_available = False
+                book.version += 1
+                self.data_store.put("books", book)
 
-            return borrow_record
+                self.data_store.publish(
+                    "borrow_book",
+                    puts=[("borrow_records", borrow_record), ("books", book)],
+                )
+                return borrow_record
         return None
 
     def return_book(self, borrow_id: int) -> BorrowRecord | None:
@@ -59,20 +126,216 @@ class BorrowRepository:
         Returns:
             BorrowRecord | None: The updated borrow record if successful, else None.
         """
-        record = self.data_store.borrow_records.get(borrow_id)
-        if record and record.return_date is None:
-            record.return_date = date.today()
-            self.data_store.borrow_records[borrow_id] = record
+        record = self.data_store.get("borrow_records", borrow_id)
+        if record is None:
+            return None
+        with self.data_store.lock_books(record.book_id):
+            # Re-read under the lock, the record may have been returned since
+            record = self.data_store.get("borrow_records", borrow_id)
+            if record.return_date is None:
+                record.return_date = date.today()
+                record.version += 1
+                self.data_store.put("borrow_records", record)
 
-            # Update book availability
-            book = self.data_store.books.get(record.book_id)
-            if book:
-                book.is_available = True
-                self.data_store.books[book.id] = book
+                # Update book availability, or lend it to the next user waiting
+                puts = [("borrow_records", record)]
+                book = self.data_store.get("books", record.book_id)
+                if book:
+                    puts += hand_off(
+                        self.data_store, book, record.return_date, self.loan_period
+                    )
 
-            return record
+                self.data_store.publish("return_book", puts=puts)
+                reservation_waiters.notify(settled_reservations(puts))
+                return record
         return None
 
+    def borrow_books(
+        self, pairs: list[tuple[int, int]], atomic: bool = False
+    ) -> list[BorrowRecord | BorrowError]:
+        """
+        Lends several books in one operation.
+
+        Every user and book in the batch is locked up front, in ascending ID
+        order, and each distinct user is looked up once. With `atomic`,
+        nothing is applied unless every item succeeds.
+
+        Args:
+            pairs (list[tuple[int, int]]): (user ID, book ID) pairs to lend.
+            atomic (bool): Whether the batch must apply all or nothing.
+
+        Returns:
+            list[BorrowRecord | BorrowError]: For each pair, in order, the new
+                borrow record or the reason it was not applied.
+        """
+        user_ids = {user_id for user_id, _ in pairs}
+        lock_users = self.data_store.lock_users(*user_ids)
+        with lock_users, self.data_store.lock_books(*{b for _, b in pairs}):
+            users = {
+                user_id: self.data_store.get("users", user_id) for user_id in user_ids
+            }
+            limit = self.max_active_loans
+            loans = {
+                user_id: self.count_active_loans(user_id)
+                for user_id in user_ids
+                if limit is not None
+            }
+            outcomes = []
+            lent = {}
+            for user_id, book_id in pairs:
+                user = users[user_id]
+                if user is None:
+                    outcomes.append(BorrowError.USER_NOT_FOUND)
+                elif not user.is_active:
+                    outcomes.append(BorrowError.USER_INACTIVE)
+                elif limit is not None and loans[user_id] >= limit:
+                    outcomes.append(BorrowError.LOAN_LIMIT_REACHED)
+                elif self.data_store.find_active_borrow_record(user_id, book_id):
+                    outcomes.append(BorrowError.ALREADY_BORROWED)
+                elif book_id in lent:
+                    outcomes.append(BorrowError.DUPLICATE)
+                else:
+                    book = self.data_store.get("books", book_id)
+                    if book is None:
+                        outcomes.append(BorrowError.BOOK_NOT_FOUND)
+                    elif not book.is_available:
+                        outcomes.append(BorrowError.BOOK_UNAVAILABLE)
+                    else:
+                        outcomes.append((user_id, book_id))
+                        lent[book_id] = book
+                        if limit is not None:
+                            loans[user_id] += 1
+            if not lent or (atomic and len(lent) < len(pairs)):
+                return _abort(outcomes)
+
+            ids = iter(self.data_store.reserve_ids("borrow", len(lent)))
+            today = date.today()
+            for index, outcome in enumerate(outcomes):
+                if isinstance(outcome, tuple):
+                    user_id, book_id = outcome
+                    outcomes[index] = BorrowRecord(
+                        id=next(ids),
+                        user_id=user_id,
+                        book_id=book_id,
+                        borrow_date=today,
+                        due_date=today + self.loan_period,
+                    )
+            records = [o for o in outcomes if isinstance(o, BorrowRecord)]
+            books = list(lent.values())
+            for book in books:
+                book.is_available = False
+                book.version += 1
+            self.data_store.put_many("borrow_records", records)
+            self.data_store.put_many("books", books)
+            self.data_store.publish(
+                "borrow_books",
+                puts=[
+                    *(("borrow_records", record) for record in records),
+                    *(("books", book) for book in books),
+                ],
+            )
+            return outcomes
+
+    def return_books(
+        self, borrow_ids: list[int], atomic: bool = False
+    ) -> list[BorrowRecord | BorrowError]:
+        """
+        Returns several borrowed books in one operation.
+
+        Every affected book is locked up front, in ascending ID order. With
+        `atomic`, nothing is applied unless every item succeeds.
+
+        Args:
+            borrow_ids (list[int]): IDs of the borrow records to close.
+            atomic (bool): Whether the batch must apply all or nothing.
+
+        Returns:
+            list[BorrowRecord | BorrowError]: For each ID, in order, the
+                updated borrow record or the reason it was not applied.
+        """
+        candidates = (self.data_store.get("borrow_records", i) for i in borrow_ids)
+        book_ids = {record.book_id for record in candidates if record is not None}
+        with self.data_store.lock_books(*book_ids):
+            outcomes = []
+            returned = {}
+            for borrow_id in borrow_ids:
+                # Re-read under the locks, records may have been returned since
+                record = self.data_store.get("borrow_records", borrow_id)
+                if borrow_id in returned:
+                    outcomes.append(BorrowError.DUPLICATE)
+                elif record is None or record.return_date is not None:
+                    outcomes.append(BorrowError.CANNOT_RETURN)
+                else:
+                    outcomes.append(record)
+                    returned[borrow_id] = record
+            if not returned or (atomic and len(returned) < len(borrow_ids)):
+                return _abort(outcomes)
+
+            today = date.today()
+            records = list(returned.values())
+            for record in records:
+                record.return_date = today
+                record.version += 1
+            self.data_store.put_many("borrow_records", records)
+            puts = [("borrow_records", record) for record in records]
+            for record in records:
+                book = self.data_store.get("books", record.book_id)
+                if book:
+                    puts += hand_off(self.data_store, book, today, self.loan_period)
+            self.data_store.publish("return_books", puts=puts)
+            reservation_waiters.notify(settled_reservations(puts))
+            return outcomes
+
+    def get_overdue_borrow_records(self, limit: int = 100) -> list[BorrowRecord]:
+        """
+        Retrieves the loans still open after their due date.
+
+        Args:
+            limit (int): Maximum number of records to return.
+
+        Returns:
+            list[BorrowRecord]: The overdue loans, longest overdue first.
+        """
+        return self.data_store.find_due_borrow_records(date.today(), limit=limit)
+
+    def flag_overdue_loans(
+        self, today: date, since: date | None = None
+    ) -> list[BorrowRecord]:
+        """
+        Flags the open loans that are past their due date.
+
+        Loans are flagged in batches of `OVERDUE_FLAG_BATCH`, each under the
+        locks of its books, so borrows and returns are held up only briefly.
+
+        Args:
+            today (date): The current day; loans due before it are overdue.
+            since (date | None): Only loans due on or after this day, if set.
+
+        Returns:
+            list[BorrowRecord]: The loans flagged by this call.
+        """
+        due = self.data_store.find_due_borrow_records(today, since)
+        flagged = []
+        for start in range(0, len(due), OVERDUE_FLAG_BATCH):
+            batch = due[start : start + OVERDUE_FLAG_BATCH]
+            with self.data_store.lock_books(*{record.book_id for record in batch}):
+                records = []
+                for record in batch:
+                    # Re-read under the locks, the loan may have been returned
+                    record = self.data_store.get("borrow_records", record.id)
+                    if record.return_date is None and not record.is_overdue:
+                        record.is_overdue = True
+                        record.version += 1
+                        records.append(record)
+                if records:
+                    self.data_store.put_many("borrow_records", records)
+                    self.data_store.publish(
+                        "flag_overdue_loans",
+                        puts=[("borrow_records", record) for record in records],
+                    )
+                    flagged += records
+        return flagged
+
     def get_all_borrow_records(self) -> list[BorrowRecord]:
         """
         Retrieves all borrow records.
@@ -80,7 +343,46 @@ class BorrowRepository:
         Returns:
             List[BorrowRecord]: A list of all borrow records.
         """
-        return list(self.data_store.borrow_records.values())
+        return list(self.data_store.scan("borrow_records"))
+
+    def iter_borrow_records(
+        self, borrowed_from: date | None = None, borrowed_to: date | None = None
+    ) -> Iterator[BorrowRecord]:
+        """
+        Lazily iterates over borrow records in ID order.
+
+        Records are read from the backend as the iterator advances, so the
+        whole history is never held in memory at once.
+
+        Args:
+            borrowed_from (date | None): Only records borrowed on or after this date.
+            borrowed_to (date | None): Only records borrowed on or before this date.
+
+        Returns:
+            Iterator[BorrowRecord]: The matching borrow records.
+        """
+        return self.data_store.scan(
+            "borrow_records", borrowed_from=borrowed_from, borrowed_to=borrowed_to
+        )
+
+    def list_borrow_records(
+        self, after: int = 0, limit: int = 100, is_returned: bool | None = None
+    ) -> list[BorrowRecord]:
+        """
+        Retrieves a page of borrow records in ID order.
+
+        Args:
+            after (int): Only records with a greater ID are returned.
+            limit (int): Maximum number of records to return.
+            is_returned (bool | None): If set, only records that have (True) or
+                have not (False) been returned.
+
+        Returns:
+            list[BorrowRecord]: Up to `limit` borrow records.
+        """
+        return self.data_store.page(
+            "borrow_records", after, limit, is_returned=is_returned
+        )
 
     def get_borrow_records_by_user(self, user_id: int) -> list[BorrowRecord]:
         """
@@ -92,11 +394,32 @@ class BorrowRepository:
         Returns:
             List[BorrowRecord]: A list of borrow records for the user.
         """
-        return [
-            record
-            for record in self.data_store.borrow_records.values()
-            if record.user_id == user_id
-        ]
+        return self.data_store.find_borrow_records_by_user(user_id)
+
+    def count_active_loans(self, user_id: int) -> int:
+        """
+        Counts the books a user currently holds.
+
+        Args:
+            user_id (int): ID of the user.
+
+        Returns:
+            int: The number of the user's unreturned borrow records.
+        """
+        return self.data_store.count_active_loans(user_id)
+
+    def get_active_borrow_records_by_user(self, user_id: int) -> list[BorrowRecord]:
+        """
+        Retrieves the books a user currently holds.
+
+        Args:
+            user_id (int): ID of the user.
+
+        Returns:
+            list[BorrowRecord]: The user's unreturned borrow records, in ID
+                order.
+        """
+        return self.data_store.find_active_borrow_records_by_user(user_id)
 
     def get_active_borrow_record(
         self, user_id: int, book_id: int
@@ -111,11 +434,72 @@ class BorrowRepository:
         Returns:
             BorrowRecord | None: The active borrow record if exists, else None.
         """
-        for record in self.data_store.borrow_records.values():
-            if (
-                record.user_id == user_id
-                and record.book_id == book_id
-                and record.return_date is None
-            ):
-                return record
-        return None
+        return self.data_store.find_active_borrow_record(user_id, book_id)
+
+    def get_loans_per_day(
+        self, start: date | None = None, end: date | None = None
+    ) -> list[DailyLoans]:
+        """
+        Counts the loans made each day.
+
+        Args:
+            start (date | None): First day to report, if any.
+            end (date | None): Last day to report, if any.
+
+        Returns:
+            list[DailyLoans]: Days with at least one loan, in date order.
+        """
+        return [
+            DailyLoans(date=day, loans=loans)
+            for day, loans in self.data_store.loans_per_day(start, end)
+        ]
+
+    def get_most_borrowed_books(self, limit: int = 10) -> list[BookLoans]:
+        """
+        Ranks books by the number of times they were borrowed.
+
+        Args:
+            limit (int): Maximum number of books to return.
+
+        Returns:
+            list[BookLoans]: The most borrowed books, most loans first.
+        """
+        return [
+            BookLoans(book_id=book_id, loans=loans)
+            for book_id, loans in self.data_store.most_borrowed("book_id", limit)
+        ]
+
+    def get_top_borrowers(self, limit: int = 10) -> list[UserLoans]:
+        """
+        Ranks users by the number of books they borrowed.
+
+        Args:
+            limit (int): Maximum number of users to return.
+
+        Returns:
+            list[UserLoans]: The heaviest borrowers, most loans first.
+        """
+        return [
+            UserLoans(user_id=user_id, loans=loans)
+            for user_id, loans in self.data_store.most_borrowed("user_id", limit)
+        ]
+
+    def get_loan_duration(self) -> LoanDuration:
+        """
+        Measures how long returned books were out.
+
+        Returns:
+            LoanDuration: The number of returned loans and their mean duration.
+        """
+        returned, mean_days = self.data_store.loan_duration()
+        return LoanDuration(returned_loans=returned, mean_days=mean_days)
+
+
+def _abort(outcomes: list) -> list:
+    """
+    Marks the items of a batch that is not applied as aborted.
+    """
+    return [
+        outcome if isinstance(outcome, BorrowError) else BorrowError.BATCH_ABORTED
+        for outcome in outcomes
+    ]
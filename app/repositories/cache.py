@@ -0,0 +1,235 @@
+import functools
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable, Iterable
+
+from .mutations import Mutation
+
+# Entities kept per cache unless configured otherwise
+DEFAULT_CAPACITY = 10_000
+
+
+class EntityCache:
+    """
+    Bounded LRU cache of the entities of one collection, read through on a
+    miss and invalidated by every write made through the repositories.
+
+    The cache listens to the mutations published by its store and drops the
+    entities they change once the change is visible to other readers. A miss
+    that was loading an entity while it was invalidated does not cache what
+    it loaded, which may already be stale, so concurrent writes never leave
+    an old version behind.
+
+    Entities are copied in and out, so callers may change what they get.
+    Only writes made by this process are seen: when processes share a store,
+    set a `ttl` to bound how stale an entry can get.
+
+    Attributes:
+        collection (str): The cached collection, e.g. "books".
+        capacity (int): Maximum number of cached entities.
+        ttl (float | None): Seconds an entity stays cached, or None to keep
+            it until it is evicted or invalidated.
+        hits (int): Lookups answered from the cache.
+        misses (int): Lookups that went to the store.
+        evictions (int): Entities dropped to make room for others.
+        invalidations (int): Cached entities dropped because they changed.
+    """
+
+    def __init__(
+        self,
+        collection: str,
+        capacity: int = DEFAULT_CAPACITY,
+        ttl: float | None = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        Initializes an empty cache.
+
+        Args:
+            collection (str): The cached collection.
+            capacity (int): Maximum number of cached entities.
+            ttl (float | None): Seconds an entity stays cached, or None.
+            clock (Callable[[], float]): Source of the current time, in
+                seconds.
+
+        Raises:
+            ValueError: If the capacity or the TTL is not positive.
+        """
+        if capacity < 1:
+            raise ValueError("Cache capacity must be at least 1")
+        if ttl is not None and ttl <= 0:
+            raise ValueError("Cache TTL must be positive")
+        self.collection = collection
+        self.capacity = capacity
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._clock = clock
+        # Maps entity IDs to (entity, expiry time or None), least recent first
+        self._entries = OrderedDict()
+        # Maps entity IDs to a token of the load in flight; invalidating an
+        # entity withdraws its token, and a load whose token was withdrawn
+        # does not cache its result
+        self._loads = {}
+        self._lock = threading.Lock()
+        self._store = None
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, entity_id: int, load: Callable[[int], object]):
+        """
+        Returns an entity from the cache, loading and caching it on a miss.
+
+        Args:
+            entity_id (int): ID of the entity.
+            load (Callable[[int], BaseModel | None]): Reads the entity from
+                the store.
+
+        Returns:
+            BaseModel | None: A copy of the entity, or None if not found.
+        """
+        now = self._clock()
+        with self._lock:
+            entry = self._entries.get(entity_id)
+            if entry is not None:
+                entity, expires = entry
+                if expires is None or now < expires:
+                    self._entries.move_to_end(entity_id)
+                    self.hits += 1
+                    return entity.model_copy()
+                del self._entries[entity_id]
+            self.misses += 1
+            token = self._loads[entity_id] = object()
+        entity = load(entity_id)
+        with self._lock:
+            if self._loads.get(entity_id) is not token:
+                return entity
+            del self._loads[entity_id]
+            if entity is not None:
+                expires = None if self.ttl is None else now + self.ttl
+                self._entries[entity_id] = (entity.model_copy(), expires)
+                if len(self._entries) > self.capacity:
+                    self._entries.popitem(last=False)
+                    self.evictions += 1
+        return entity
+
+    def invalidate(self, entity_ids: Iterable[int]):
+        """
+        Drops entities from the cache, and keeps loads in flight from
+        caching them.
+
+        Args:
+            entity_ids (Iterable[int]): IDs of the changed entities.
+        """
+        with self._lock:
+            for entity_id in entity_ids:
+                self._loads.pop(entity_id, None)
+                if self._entries.pop(entity_id, None) is not None:
+                    self.invalidations += 1
+
+    def clear(self):
+        """
+        Drops every cached entity.
+        """
+        with self._lock:
+            self._entries.clear()
+            self._loads.clear()
+
+    def attach(self, store):
+        """
+        Starts following the mutations of a store, forgetting any entity
+        cached from the previous one.
+
+        Args:
+            store (StorageBackend): The store the cached entities are read
+                from.
+        """
+        self.detach()
+        self.clear()
+        store.listeners.append(self._on_mutation)
+        self._store = store
+
+    def detach(self):
+        """
+        Stops following the mutations of the store.
+        """
+        store, self._store = self._store, None
+        if store is not None and self._on_mutation in store.listeners:
+            store.listeners.remove(self._on_mutation)
+
+    def _on_mutation(self, mutation: Mutation):
+        entity_ids = [
+            entity.id
+            for collection, entity in mutation.puts
+            if collection == self.collection
+        ]
+        entity_ids += [
+            entity_id
+            for collection, entity_id in mutation.deletes
+            if collection == self.collection
+        ]
+        if entity_ids and self._store is not None:
+            # Invalidating before the change is visible would let a
+            # concurrent miss load and cache the old entity again
+            self._store.after_write(functools.partial(self.invalidate, entity_ids))
+
+
+def read_through(method: Callable) -> Callable:
+    """
+    Serves a repository's get-by-ID method from the repository's `cache`,
+    when one is enabled.
+
+    Args:
+        method (Callable): The method, taking the entity ID.
+
+    Returns:
+        Callable: The method, reading through the cache.
+    """
+
+    @functools.wraps(method)
+    def get(self, entity_id: int):
+        cache = self.cache
+        if cache is None:
+            return method(self, entity_id)
+        return cache.get(entity_id, functools.partial(method, self))
+
+    return get
+
+
+def enable_cache(
+    repository, capacity: int = DEFAULT_CAPACITY, ttl: float | None = None
+) -> EntityCache:
+    """
+    Caches the entities a repository reads by ID, replacing any previous
+    cache.
+
+    Args:
+        repository (BookRepository | UserRepository): The repository.
+        capacity (int): Maximum number of cached entities.
+        ttl (float | None): Seconds an entity stays cached, or None.
+
+    Returns:
+        EntityCache: The repository's new cache.
+    """
+    disable_cache(repository)
+    cache = EntityCache(repository.collection, capacity, ttl)
+    cache.attach(repository.data_store)
+    repository.cache = cache
+    return cache
+
+
+def disable_cache(repository):
+    """
+    Turns off the cache of a repository, if any; reads go to the store again.
+
+    Args:
+        repository (BookRepository | UserRepository): The repository.
+    """
+    cache, repository.cache = repository.cache, None
+    if cache is not None:
+        cache.detach()
+        cache.clear()
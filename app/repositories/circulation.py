@@ -0,0 +1,190 @@
+import heapq
+import threading
+from bisect import bisect_left, insort
+from collections import Counter
+from datetime import date
+
+
+class RankedCounter:
+    """
+    Counts occurrences of keys and ranks the keys by count.
+
+    Counts only ever grow by one, so keys are grouped in one bucket per
+    count: an increment moves a key to the next bucket. The counts that have
+    a bucket are kept in a sorted list, so the top keys are read from the
+    highest buckets down, visiting only buckets that hold keys and without
+    sorting every key.
+
+    With a `capacity`, at most that many keys are tracked, using the
+    Space-Saving algorithm: a new key replaces one with the lowest count and
+    inherits that count. Counts then overestimate by at most the lowest
+    count, and any key occurring more often than that is guaranteed to be
+    tracked.
+
+    Attributes:
+        counts (dict): Maps each key to its count.
+        buckets (dict): Maps each count to the set of keys having it.
+        levels (list): The counts having a bucket, in ascending order.
+        capacity (int | None): Maximum number of keys tracked, if bounded.
+    """
+
+    def __init__(self, capacity: int | None = None):
+        """
+        Initializes an empty counter.
+
+        Args:
+            capacity (int | None): Maximum number of keys to track.
+        """
+        self.counts = {}
+        self.buckets = {}
+        self.levels = []
+        self.capacity = capacity
+
+    def increment(self, key: int):
+        """
+        Adds one occurrence of a key.
+
+        Args:
+            key (int): The key.
+        """
+        count = self.counts.pop(key, 0)
+        if count:
+            self._unbucket(key, count)
+        elif self.capacity is not None and len(self.counts) >= self.capacity:
+            count = self.levels[0]
+            evicted = next(iter(self.buckets[count]))
+            del self.counts[evicted]
+            self._unbucket(evicted, count)
+        count += 1
+        self.counts[key] = count
+        bucket = self.buckets.get(count)
+        if bucket is None:
+            bucket = self.buckets[count] = set()
+            insort(self.levels, count)
+        bucket.add(key)
+
+    def top(self, limit: int) -> list[tuple[int, int]]:
+        """
+        Returns the most frequent keys.
+
+        Args:
+            limit (int): Maximum number of keys to return.
+
+        Returns:
+            list[tuple[int, int]]: (key, count) pairs, highest count first,
+                ties broken by ascending key.
+        """
+        ranked = []
+        for count in reversed(self.levels):
+            if len(ranked) >= limit:
+                break
+            keys = heapq.nsmallest(limit - len(ranked), self.buckets[count])
+            ranked.extend((key, count) for key in keys)
+        return ranked
+
+    def _unbucket(self, key: int, count: int):
+        bucket = self.buckets[count]
+        bucket.discard(key)
+        if not bucket:
+            del self.buckets[count]
+            del self.levels[bisect_left(self.levels, count)]
+
+
+class CirculationStats:
+    """
+    Running aggregates of the borrow history.
+
+    Updated as borrow records are stored, so circulation reports are
+    answered without walking the history.
+
+    Attributes:
+        loans_per_day (Counter): Maps borrow date ordinals to loans made that day.
+        loans_per_book (RankedCounter): Loans made of each book.
+        loans_per_user (RankedCounter): Loans made by each user.
+        returned_loans (int): Number of loans returned.
+        loan_days (int): Total days returned loans were out for.
+    """
+
+    def __init__(self):
+        """
+        Initializes empty aggregates.
+        """
+        self.loans_per_day = Counter()
+        self.loans_per_book = RankedCounter()
+        self.loans_per_user = RankedCounter()
+        self.returned_loans = 0
+        self.loan_days = 0
+        self._lock = threading.Lock()
+
+    def add_loan(self, record):
+        """
+        Counts a new borrow record, and its return if it is already returned.
+
+        Args:
+            record (BorrowRecord): The new borrow record.
+        """
+        with self._lock:
+            self.loans_per_day[record.borrow_date.toordinal()] += 1
+            self.loans_per_book.increment(record.book_id)
+            self.loans_per_user.increment(record.user_id)
+            if record.return_date is not None:
+                self._add_return(record)
+
+    def add_return(self, record):
+        """
+        Counts the return of a borrow record.
+
+        Args:
+            record (BorrowRecord): The borrow record that has been returned.
+        """
+        with self._lock:
+            self._add_return(record)
+
+    def daily(self, start: date | None, end: date | None) -> list[tuple[date, int]]:
+        """
+        Returns the number of loans made each day.
+
+        Args:
+            start (date | None): First day to report, if any.
+            end (date | None): Last day to report, if any.
+
+        Returns:
+            list[tuple[date, int]]: Days with at least one loan and their
+                loan counts, in date order.
+        """
+        first = start.toordinal() if start else 0
+        last = end.toordinal() if end else date.max.toordinal()
+        with self._lock:
+            days = list(self.loans_per_day.items())
+        return [
+            (date.fromordinal(day), loans)
+            for day, loans in sorted(days)
+            if first <= day <= last
+        ]
+
+    def top(self, field: str, limit: int) -> list[tuple[int, int]]:
+        """
+        Returns the most borrowed books or the heaviest borrowers.
+
+        Args:
+            field (str): "book_id" or "user_id".
+            limit (int): Maximum number of entries to return.
+
+        Returns:
+            list[tuple[int, int]]: (ID, loans) pairs, most loans first.
+        """
+        rankings = {"book_id": self.loans_per_book, "user_id": self.loans_per_user}
+        with self._lock:
+            return rankings[field].top(limit)
+
+    def loan_duration(self) -> tuple[int, float | None]:
+        """
+        Returns the number of returned loans and their mean duration in days.
+        """
+        with self._lock:
+            returned, days = self.returned_loans, self.loan_days
+        return returned, days / returned if returned else None
+
+    def _add_return(self, record):
+        self.returned_loans += 1
+        self.loan_days += (record.return_date - record.borrow_date).days
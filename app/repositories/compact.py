@@ -0,0 +1,192 @@
+import threading
+from array import array
+from collections.abc import Callable, Iterator, MutableMapping
+from datetime import date
+from operator import attrgetter
+
+from pydantic import BaseModel
+
+from app.models.borrow import BorrowRecord
+
+
+def model_builder(model: type[BaseModel]) -> Callable[[dict], BaseModel]:
+    """
+    Returns a function building trusted instances of a model from field values.
+
+    The values were validated when the entity was first stored, so they are
+    not validated again. This does what `model_construct` does, minus its
+    per-field default and alias handling, which makes it several times faster
+    (and much faster than validating an `EmailStr` again).
+
+    Args:
+        model (type[BaseModel]): The model to build.
+
+    Returns:
+        Callable[[dict], BaseModel]: Builds an instance from a dict holding
+            every field, in declaration order.
+    """
+    fields = frozenset(model.model_fields)
+    new = model.__new__
+    set_attribute = object.__setattr__
+
+    def build(values: dict) -> BaseModel:
+        entity = new(model)
+        set_attribute(entity, "__dict__", values)
+        set_attribute(entity, "__pydantic_fields_set__", set(fields))
+        set_attribute(entity, "__pydantic_extra__", None)
+        set_attribute(entity, "__pydantic_private__", None)
+        return entity
+
+    return build
+
+
+class RowTable(MutableMapping):
+    """
+    Entities of one collection stored as plain tuples, keyed by ID.
+
+    A tuple of field values takes a fraction of the memory of a Pydantic
+    instance with its `__dict__` and bookkeeping. Models are built on read
+    and taken apart on write, so the table behaves like a dict of models.
+    """
+
+    def __init__(self, model: type[BaseModel]):
+        """
+        Initializes an empty table.
+
+        Args:
+            model (type[BaseModel]): The entity model.
+        """
+        self.names = tuple(model.model_fields)
+        self._rows = {}
+        self._encode = attrgetter(*self.names)
+        self._build = model_builder(model)
+
+    def get(self, entity_id: int, default=None):
+        row = self._rows.get(entity_id)
+        if row is None:
+            return default
+        return self._build(dict(zip(self.names, row, strict=True)))
+
+    def __getitem__(self, entity_id: int):
+        return self._build(dict(zip(self.names, self._rows[entity_id], strict=True)))
+
+    def __setitem__(self, entity_id: int, entity):
+        self._rows[entity_id] = self._encode(entity)
+
+    def __delitem__(self, entity_id: int):
+        del self._rows[entity_id]
+
+    def __contains__(self, entity_id) -> bool:
+        return entity_id in self._rows
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(list(self._rows))
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+
+class BorrowRecordTable(MutableMapping):
+    """
+    Borrow records stored column by column in typed arrays.
+
+    A record's ID is its position in the columns plus one: IDs come from a
+    dense sequence, so no ID column is needed. User and book IDs are kept
+    in `array('q')`, dates as ordinals in `array('i')`, with 0 standing for
+    a missing return or due date, overdue flags in a `bytearray` and
+    versions in `array('I')`. A record thus costs 34 bytes instead of a
+    Pydantic instance of several hundred.
+
+    Writes are serialized by a lock, and a record is flagged present only
+    once all its columns are written, so lock-free readers never see a
+    partly written record.
+    """
+
+    def __init__(self):
+        """
+        Initializes an empty table.
+        """
+        self.present = bytearray()
+        self.user_ids = array("q")
+        self.book_ids = array("q")
+        self.borrow_dates = array("i")
+        self.return_dates = array("i")
+        self.due_dates = array("i")
+        self.overdue = bytearray()
+        self.versions = array("I")
+        self._count = 0
+        self._lock = threading.Lock()
+        self._build = model_builder(BorrowRecord)
+
+    def get(self, record_id: int, default=None):
+        position = record_id - 1
+        if not 0 <= position < len(self.present) or not self.present[position]:
+            return default
+        return_date = self.return_dates[position]
+        due_date = self.due_dates[position]
+        return self._build(
+            {
+                "user_id": self.user_ids[position],
+                "book_id": self.book_ids[position],
+                "id": record_id,
+                "borrow_date": date.fromordinal(self.borrow_dates[position]),
+                "return_date": date.fromordinal(return_date) if return_date else None,
+                "due_date": date.fromordinal(due_date) if due_date else None,
+                "is_overdue": bool(self.overdue[position]),
+                "version": self.versions[position],
+            }
+        )
+
+    def __getitem__(self, record_id: int):
+        record = self.get(record_id)
+        if record is None:
+            raise KeyError(record_id)
+        return record
+
+    def __setitem__(self, record_id: int, record):
+        position = record_id - 1
+        if position < 0:
+            raise KeyError(record_id)
+        with self._lock:
+            missing = position + 1 - len(self.present)
+            if missing > 0:
+                for column in (self.user_ids, self.book_ids):
+                    column.extend(array("q", bytes(8 * missing)))
+                for column in (self.borrow_dates, self.return_dates, self.due_dates):
+                    column.extend(array("i", bytes(4 * missing)))
+                self.versions.extend(array("I", bytes(4 * missing)))
+                self.overdue.extend(bytes(missing))
+                self.present.extend(bytes(missing))
+            self.user_ids[position] = record.user_id
+            self.book_ids[position] = record.book_id
+            self.borrow_dates[position] = record.borrow_date.toordinal()
+            self.return_dates[position] = (
+                record.return_date.toordinal() if record.return_date else 0
+            )
+            self.due_dates[position] = (
+                record.due_date.toordinal() if record.due_date else 0
+            )
+            self.overdue[position] = record.is_overdue
+            self.versions[position] = record.version
+            if not self.present[position]:
+                self.present[position] = 1
+                self._count += 1
+
+    def __delitem__(self, record_id: int):
+        position = record_id - 1
+        with self._lock:
+            if not 0 <= position < len(self.present) or not self.present[position]:
+                raise KeyError(record_id)
+            self.present[position] = 0
+            self._count -= 1
+
+    def __contains__(self, record_id) -> bool:
+        position = record_id - 1
+        return 0 <= position < len(self.present) and bool(self.present[position])
+
+    def __iter__(self) -> Iterator[int]:
+        present = bytes(self.present)
+        return (position + 1 for position, flag in enumerate(present) if flag)
+
+    def __len__(self) -> int:
+        return self._count
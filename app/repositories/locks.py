@@ -0,0 +1,99 @@
+import threading
+from contextlib import ExitStack, contextmanager
+
+# Per-thread flag set by `no_wait`
+_no_wait = threading.local()
+
+
+class LockContendedError(Exception):
+    """
+    Raised by `LockTable.hold` under `no_wait` when a lock is held elsewhere.
+
+    Attributes:
+        key: The key whose lock was taken.
+    """
+
+    def __init__(self, key):
+        super().__init__(key)
+        self.key = key
+
+
+@contextmanager
+def no_wait():
+    """
+    Makes `LockTable.hold` raise `LockContendedError` on this thread, instead
+    of waiting, when a lock is held by another thread.
+
+    Locks already taken by the same `hold` are released before it raises.
+    """
+    previous = getattr(_no_wait, "active", False)
+    _no_wait.active = True
+    try:
+        yield
+    finally:
+        _no_wait.active = previous
+
+
+class LockTable:
+    """
+    Table of locks, one per key.
+
+    Locking per key (for example per book ID) lets unrelated operations run in
+    parallel while operations on the same entity are serialized.
+
+    Locks are reference counted: one is created when a key is first locked and
+    dropped once nobody holds or waits for it, so the table stays as small as
+    the set of keys in use and a waiter never blocks on a lock that has since
+    been replaced.
+    """
+
+    def __init__(self):
+        """
+        Initializes an empty lock table.
+        """
+        # Maps each key in use to [lock, references]
+        self._locks = {}
+        self._guard = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._locks)
+
+    @contextmanager
+    def hold(self, *keys):
+        """
+        Acquires the locks for the given keys in ascending key order.
+
+        Acquiring in a deterministic order prevents deadlocks between callers
+        that need several locks at once.
+
+        Args:
+            *keys: The keys to lock. Duplicates are locked once.
+
+        Raises:
+            LockContendedError: Under `no_wait`, if a lock is held by another
+                thread.
+        """
+        wait = not getattr(_no_wait, "active", False)
+        with ExitStack() as stack:
+            for key in sorted(set(keys)):
+                lock = self._reference(key)
+                stack.callback(self._release_reference, key)
+                if not lock.acquire(blocking=wait):
+                    raise LockContendedError(key)
+                stack.callback(lock.release)
+            yield
+
+    def _reference(self, key) -> threading.RLock:
+        with self._guard:
+            entry = self._locks.get(key)
+            if entry is None:
+                entry = self._locks[key] = [threading.RLock(), 0]
+            entry[1] += 1
+            return entry[0]
+
+    def _release_reference(self, key):
+        with self._guard:
+            entry = self._locks[key]
+            entry[1] -= 1
+            if not entry[1]:
+                del self._locks[key]
@@ -0,0 +1,448 @@
+import threading
+from array import array
+from collections import deque
+from datetime import date
+from itertools import islice
+
+from app.models.book import Book
+from app.models.reservation import Reservation, ReservationStatus
+from app.models.user import User
+
+from .backend import StorageBackend, normalize_email
+from .circulation import CirculationStats
+from .compact import BorrowRecordTable, RowTable
+from .locks import LockTable
+from .mutations import COLLECTION_SEQUENCES
+from .overdue import DueDateIndex
+from .pagination import IdIndex, paginate, paginate_index
+from .popularity import PopularityTracker
+from .search import InvertedIndex
+
+# Email addresses share this many locks, so the lock table stays bounded
+EMAIL_LOCK_STRIPES = 1024
+
+# The flag of each collection whose values are indexed, so that pages
+# filtered on it only visit the matching entities
+FLAG_FILTERS = {
+    "users": "is_active",
+    "books": "is_available",
+    "borrow_records": "is_returned",
+}
+
+# Filters accepted by `scan` and `page` that do not compare a field for equality
+SPECIAL_FILTERS = {
+    "is_returned": lambda record, value: (record.return_date is not None) is value,
+    "borrowed_from": lambda record, value: record.borrow_date >= value,
+    "borrowed_to": lambda record, value: record.borrow_date <= value,
+}
+
+
+class DataStore(StorageBackend):
+    """
+    In-memory data store for the application.
+
+    Entities are kept in compact tables rather than as Pydantic instances:
+    users and books as tuples, borrow records as typed array columns. Models
+    are built when read and taken apart when stored, so an entity changed
+    after being read must be put back to be saved.
+
+    Attributes:
+        users (RowTable): Stores User entities.
+        books (RowTable): Stores Book entities.
+        borrow_records (BorrowRecordTable): Stores BorrowRecord entities.
+        reservations (RowTable): Stores Reservation entities.
+        borrow_records_by_user (dict): Maps user IDs to an array of their
+            borrow record IDs.
+        borrow_records_by_book (dict): Maps book IDs to an array of their
+            borrow record IDs.
+        active_borrow_records (dict): Maps (user ID, book ID) pairs to the ID of
+            the borrow record that has not been returned yet.
+        active_loans_by_user (dict): Maps user IDs to their number of
+            unreturned borrow records; users without any are left out.
+        active_borrow_records_by_user (dict): Maps user IDs to the set of
+            their unreturned borrow record IDs; users without any are left
+            out.
+        due_dates (DueDateIndex): The unreturned borrow records, by due date.
+        flag_indexes (dict): Maps the collections of `FLAG_FILTERS` to an
+            IdIndex per value of their flag, e.g. the IDs of the books
+            available and of those lent out.
+        book_search_index (InvertedIndex): Full-text index over book titles
+            and authors.
+        users_by_email (dict): Maps normalized email addresses to user IDs.
+        waitlists (dict): Maps book IDs to a deque of the IDs of their
+            waiting reservations, first come first.
+        waiting_reservations (dict): Maps (book ID, user ID) pairs to the ID
+            of the user's waiting reservation for the book.
+        circulation (CirculationStats): Running aggregates of the borrow
+            history.
+        popularity (PopularityTracker): Loans per book over recent days.
+        user_id_seq (int): Sequence counter for user IDs.
+        book_id_seq (int): Sequence counter for book IDs.
+        borrow_id_seq (int): Sequence counter for borrow record IDs.
+        reservation_id_seq (int): Sequence counter for reservation IDs.
+        user_locks (LockTable): Per-user locks serializing user mutations.
+        book_locks (LockTable): Per-book locks serializing book mutations,
+            borrows and returns.
+        email_locks (LockTable): Striped locks serializing the registration
+            of email addresses.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.reset()
+
+    def reset(self):
+        """
+        Clears all entities and indexes and restarts the ID sequences.
+        """
+        self.users = RowTable(User)
+        self.books = RowTable(Book)
+        self.borrow_records = BorrowRecordTable()
+        self.reservations = RowTable(Reservation)
+        self.borrow_records_by_user = {}
+        self.borrow_records_by_book = {}
+        self.active_borrow_records = {}
+        self.active_loans_by_user = {}
+        self.active_borrow_records_by_user = {}
+        self.due_dates = DueDateIndex()
+        self.flag_indexes = {
+            collection: {True: IdIndex(), False: IdIndex()}
+            for collection in FLAG_FILTERS
+        }
+        self.book_search_index = InvertedIndex()
+        self.users_by_email = {}
+        self.waitlists = {}
+        self.waiting_reservations = {}
+        self.circulation = CirculationStats()
+        self.popularity = PopularityTracker()
+        self.user_id_seq = 1
+        self.book_id_seq = 1
+        self.borrow_id_seq = 1
+        self.reservation_id_seq = 1
+        self.user_locks = LockTable()
+        self.book_locks = LockTable()
+        self.email_locks = LockTable()
+        self._seq_lock = threading.Lock()
+        self._loans_lock = threading.Lock()
+
+    def next_id(self, sequence: str) -> int:
+        attribute = f"{sequence}_id_seq"
+        with self._seq_lock:
+            value = getattr(self, attribute)
+            setattr(self, attribute, value + 1)
+        return value
+
+    def reserve_ids(self, sequence: str, count: int) -> range:
+        attribute = f"{sequence}_id_seq"
+        with self._seq_lock:
+            first = getattr(self, attribute)
+            setattr(self, attribute, first + count)
+        return range(first, first + count)
+
+    def advance_sequence(self, collection: str, entity_id: int):
+        attribute = f"{COLLECTION_SEQUENCES[collection]}_id_seq"
+        with self._seq_lock:
+            if getattr(self, attribute) <= entity_id:
+                setattr(self, attribute, entity_id + 1)
+
+    def get(self, collection: str, entity_id: int):
+        return getattr(self, collection).get(entity_id)
+
+    def put(self, collection: str, entity):
+        if collection == "borrow_records":
+            if entity.id not in self.borrow_records:
+                self.add_borrow_record(entity)
+                return
+            self.borrow_records[entity.id] = entity
+            if entity.return_date is not None:
+                self.close_borrow_record(entity)
+            return
+        entities = getattr(self, collection)
+        previous = entities.get(entity.id)
+        # Index keys are worked out first, so an entity the indexes reject
+        # is not stored
+        if collection == "books" and (
+            previous is None
+            or (previous.title, previous.author) != (entity.title, entity.author)
+        ):
+            self.book_search_index.add(entity)
+        elif collection == "users":
+            email_key = normalize_email(entity.email)
+        entities[entity.id] = entity
+        if collection in FLAG_FILTERS:
+            self._index_flag(collection, previous, entity)
+        if collection == "users":
+            if previous is not None and previous.email != entity.email:
+                self._unindex_email(previous)
+            self.users_by_email[email_key] = entity.id
+        elif collection == "reservations":
+            waiting = entity.status == ReservationStatus.WAITING
+            was_waiting = (
+                previous is not None and previous.status == ReservationStatus.WAITING
+            )
+            if waiting and not was_waiting:
+                self.waitlists.setdefault(entity.book_id, deque()).append(entity.id)
+                self.waiting_reservations[entity.book_id, entity.user_id] = entity.id
+            elif was_waiting and not waiting:
+                self._unindex_reservation(previous)
+
+    def delete(self, collection: str, entity_id: int) -> bool:
+        entity = getattr(self, collection).pop(entity_id, None)
+        if entity is not None and collection in FLAG_FILTERS:
+            self._index_flag(collection, entity, None)
+        if collection == "books":
+            self.book_search_index.remove(entity_id)
+        elif collection == "users":
+            if entity is not None:
+                self._unindex_email(entity)
+        elif collection == "reservations":
+            if entity is not None and entity.status == ReservationStatus.WAITING:
+                self._unindex_reservation(entity)
+        return entity is not None
+
+    def scan(self, collection: str, after: int = 0, **filters):
+        entities = getattr(self, collection)
+        predicate = self._predicate(filters)
+        index = self._flag_index(collection, filters)
+        if index is not None:
+            candidates = index.iter_after(after)
+        else:
+            candidates = range(after + 1, self._last_id(collection) + 1)
+        for entity_id in candidates:
+            entity = entities.get(entity_id)
+            if entity is not None and (predicate is None or predicate(entity)):
+                yield entity
+
+    def page(self, collection: str, after: int, limit: int, **filters) -> list:
+        entities = getattr(self, collection)
+        predicate = self._predicate(filters)
+        index = self._flag_index(collection, filters)
+        if index is not None:
+            return paginate_index(entities, index, after, limit, predicate)
+        return paginate(entities, self._last_id(collection), after, limit, predicate)
+
+    def count(self, collection: str, **filters) -> int:
+        active = {field: value for field, value in filters.items() if value is not None}
+        if not active:
+            return len(getattr(self, collection))
+        if active.keys() == {FLAG_FILTERS.get(collection)}:
+            return len(self._flag_index(collection, active))
+        return sum(1 for _ in self.scan(collection, **filters))
+
+    def find_borrow_records_by_user(self, user_id: int) -> list:
+        record_ids = self.borrow_records_by_user.get(user_id, [])
+        return [self.borrow_records[record_id] for record_id in record_ids]
+
+    def find_active_borrow_record(self, user_id: int, book_id: int):
+        record_id = self.active_borrow_records.get((user_id, book_id))
+        if record_id is None:
+            return None
+        return self.borrow_records.get(record_id)
+
+    def count_active_loans(self, user_id: int) -> int:
+        return self.active_loans_by_user.get(user_id, 0)
+
+    def find_active_borrow_records_by_user(self, user_id: int) -> list:
+        with self._loans_lock:
+            record_ids = sorted(self.active_borrow_records_by_user.get(user_id, ()))
+        records = (self.borrow_records.get(record_id) for record_id in record_ids)
+        return [record for record in records if record is not None]
+
+    def find_due_borrow_records(
+        self, before: date, since: date | None = None, limit: int | None = None
+    ) -> list:
+        record_ids = self.due_dates.due(before, since, limit)
+        records = (self.borrow_records.get(record_id) for record_id in record_ids)
+        # A record may have been returned since its ID was read
+        return [r for r in records if r is not None and r.return_date is None]
+
+    def find_waiting_reservations(self, book_id: int, limit: int | None = None) -> list:
+        reservation_ids = list(islice(self.waitlists.get(book_id, ()), limit))
+        return [self.reservations[i] for i in reservation_ids]
+
+    def find_waiting_reservation(self, book_id: int, user_id: int):
+        reservation_id = self.waiting_reservations.get((book_id, user_id))
+        return None if reservation_id is None else self.reservations.get(reservation_id)
+
+    def find_user_by_email(self, email: str):
+        key = normalize_email(email)
+        user_id = self.users_by_email.get(key)
+        return None if user_id is None else self.users.get(user_id)
+
+    def search_books(self, query: str, limit: int) -> list:
+        book_ids = self.book_search_index.search(query, limit)
+        books = (self.books.get(book_id) for book_id in book_ids)
+        return [book for book in books if book is not None]
+
+    def loans_per_day(self, start: date | None = None, end: date | None = None) -> list:
+        return self.circulation.daily(start, end)
+
+    def most_borrowed(self, field: str, limit: int) -> list:
+        return self.circulation.top(field, limit)
+
+    def popular_books(self, window_days: int, limit: int, today: date) -> list:
+        return self.popularity.top(window_days, limit, today)
+
+    def loan_duration(self) -> tuple:
+        return self.circulation.loan_duration()
+
+    def lock_users(self, *user_ids: int):
+        return self.user_locks.hold(*user_ids)
+
+    def lock_emails(self, *emails: str):
+        return self.email_locks.hold(
+            *(hash(normalize_email(email)) % EMAIL_LOCK_STRIPES for email in emails)
+        )
+
+    def lock_books(self, *book_ids: int):
+        return self.book_locks.hold(*book_ids)
+
+    def add_borrow_record(self, record):
+        """
+        Stores a borrow record and adds it to the borrow indexes.
+
+        Args:
+            record (BorrowRecord): The borrow record to store.
+        """
+        self.borrow_records[record.id] = record
+        by_user = self.borrow_records_by_user
+        by_book = self.borrow_records_by_book
+        by_user.setdefault(record.user_id, array("q")).append(record.id)
+        by_book.setdefault(record.book_id, array("q")).append(record.id)
+        self._index_flag("borrow_records", None, record)
+        if record.return_date is None:
+            self.active_borrow_records[(record.user_id, record.book_id)] = record.id
+            self._count_loan(record, opened=True)
+            if record.due_date is not None:
+                self.due_dates.add(record.id, record.due_date)
+        self.circulation.add_loan(record)
+        self.popularity.add_loan(record.book_id, record.borrow_date)
+
+    def close_borrow_record(self, record):
+        """
+        Removes a returned borrow record from the active borrow, active loan
+        and due date indexes and counts its return.
+
+        Args:
+            record (BorrowRecord): The borrow record that has been returned.
+        """
+        key = (record.user_id, record.book_id)
+        if self.active_borrow_records.get(key) == record.id:
+            del self.active_borrow_records[key]
+            self.flag_indexes["borrow_records"][False].discard(record.id)
+            self.flag_indexes["borrow_records"][True].add(record.id)
+            self._count_loan(record, opened=False)
+            if record.due_date is not None:
+                self.due_dates.remove(record.id, record.due_date)
+            self.circulation.add_return(record)
+
+    def _index_flag(self, collection: str, previous, entity):
+        """
+        Moves an entity to the flag index of its new value.
+
+        Args:
+            collection (str): A collection of `FLAG_FILTERS`.
+            previous (BaseModel | None): The entity as stored before, if any.
+            entity (BaseModel | None): The entity as stored now, or None
+                once deleted.
+        """
+        old, new = self._flag(collection, previous), self._flag(collection, entity)
+        if old == new:
+            return
+        indexes = self.flag_indexes[collection]
+        if old is not None:
+            indexes[old].discard(previous.id)
+        if new is not None:
+            indexes[new].add(entity.id)
+
+    @staticmethod
+    def _flag(collection: str, entity) -> bool | None:
+        """
+        Returns the value of an entity's indexed flag, None for no entity.
+        """
+        if entity is None:
+            return None
+        if collection == "borrow_records":
+            return entity.return_date is not None
+        return getattr(entity, FLAG_FILTERS[collection])
+
+    def _flag_index(self, collection: str, filters: dict) -> IdIndex | None:
+        """
+        Returns the flag index matching `scan` filters, if any.
+        """
+        value = filters.get(FLAG_FILTERS.get(collection))
+        if value is None:
+            return None
+        return self.flag_indexes[collection][value]
+
+    def _count_loan(self, record, opened: bool):
+        """
+        Adds a borrow record to, or removes it from, its user's active loans.
+        """
+        user_id = record.user_id
+        with self._loans_lock:
+            loans = self.active_loans_by_user.get(user_id, 0) + (1 if opened else -1)
+            record_ids = self.active_borrow_records_by_user.setdefault(user_id, set())
+            if opened:
+                record_ids.add(record.id)
+            else:
+                record_ids.discard(record.id)
+            if loans:
+                self.active_loans_by_user[user_id] = loans
+            else:
+                del self.active_loans_by_user[user_id]
+                del self.active_borrow_records_by_user[user_id]
+
+    def _unindex_email(self, user):
+        """
+        Removes a user's email address from the email index.
+        """
+        key = normalize_email(user.email)
+        if self.users_by_email.get(key) == user.id:
+            del self.users_by_email[key]
+
+    def _unindex_reservation(self, reservation):
+        """
+        Removes a reservation from its book's waitlist.
+
+        Reservations are mostly settled at the head of the waitlist, which is
+        popped in constant time; only cancellations search the deque.
+        """
+        key = (reservation.book_id, reservation.user_id)
+        if self.waiting_reservations.get(key) != reservation.id:
+            return
+        del self.waiting_reservations[key]
+        waitlist = self.waitlists[reservation.book_id]
+        if waitlist[0] == reservation.id:
+            waitlist.popleft()
+        else:
+            waitlist.remove(reservation.id)
+        if not waitlist:
+            del self.waitlists[reservation.book_id]
+
+    def _last_id(self, collection: str) -> int:
+        return getattr(self, f"{COLLECTION_SEQUENCES[collection]}_id_seq") - 1
+
+    @staticmethod
+    def _predicate(filters: dict):
+        """
+        Builds a predicate matching entities against `scan` filters.
+        """
+        tests = []
+        for field, value in filters.items():
+            if value is None:
+                continue
+            special = SPECIAL_FILTERS.get(field)
+            if special:
+                tests.append(
+                    lambda entity, test=special, value=value: test(entity, value)
+                )
+            else:
+                tests.append(lambda entity, f=field, v=value: getattr(entity, f) == v)
+        if not tests:
+            return None
+
+        def predicate(entity):
+            return all(test(entity) for test in tests)
+
+        return predicate
@@ -0,0 +1,41 @@
+from dataclasses import dataclass
+
+from pydantic import BaseModel
+
+from app.models.book import Book
+from app.models.borrow import BorrowRecord
+from app.models.reservation import Reservation
+from app.models.user import User
+
+# Entity model stored in each DataStore collection
+COLLECTION_MODELS: dict[str, type[BaseModel]] = {
+    "users": User,
+    "books": Book,
+    "borrow_records": BorrowRecord,
+    "reservations": Reservation,
+}
+
+# DataStore ID sequence backing each collection
+COLLECTION_SEQUENCES = {
+    "users": "user",
+    "books": "book",
+    "borrow_records": "borrow",
+    "reservations": "reservation",
+}
+
+
+@dataclass(frozen=True, slots=True)
+class Mutation:
+    """
+    A change made through a repository, published to DataStore listeners.
+
+    Attributes:
+        op (str): Name of the repository operation, e.g. "borrow_book".
+        puts (tuple): (collection, entity) pairs holding the state of every
+            entity the operation created or changed.
+        deletes (tuple): (collection, entity ID) pairs of deleted entities.
+    """
+
+    op: str
+    puts: tuple[tuple[str, BaseModel], ...] = ()
+    deletes: tuple[tuple[str, int], ...] = ()
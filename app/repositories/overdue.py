@@ -0,0 +1,136 @@
+import asyncio
+import heapq
+import threading
+from bisect import bisect_left, insort
+from datetime import date
+
+# Seconds between sweeps for loans that became overdue
+SWEEP_INTERVAL = 60.0
+
+
+class DueDateIndex:
+    """
+    Open loans bucketed by due date.
+
+    Each bucket holds the IDs of the loans due on one day, and the days that
+    have loans are kept sorted, so the loans due before a date are found
+    without looking at loans not yet due or at the returned history.
+
+    Attributes:
+        buckets (dict): Maps due date ordinals to the set of IDs of the open
+            loans due that day.
+        days (list[int]): The ordinals of `buckets`, in ascending order.
+    """
+
+    def __init__(self):
+        self.buckets = {}
+        self.days = []
+        self._lock = threading.Lock()
+
+    def add(self, record_id: int, due_date: date):
+        """
+        Indexes an open loan.
+
+        Args:
+            record_id (int): ID of the borrow record.
+            due_date (date): When the book is due back.
+        """
+        day = due_date.toordinal()
+        with self._lock:
+            bucket = self.buckets.get(day)
+            if bucket is None:
+                bucket = self.buckets[day] = set()
+                insort(self.days, day)
+            bucket.add(record_id)
+
+    def remove(self, record_id: int, due_date: date):
+        """
+        Forgets a loan once it is returned.
+
+        Args:
+            record_id (int): ID of the borrow record.
+            due_date (date): When the book was due back.
+        """
+        day = due_date.toordinal()
+        with self._lock:
+            bucket = self.buckets.get(day)
+            if bucket is None:
+                return
+            bucket.discard(record_id)
+            if not bucket:
+                del self.buckets[day]
+                del self.days[bisect_left(self.days, day)]
+
+    def due(
+        self, before: date, since: date | None = None, limit: int | None = None
+    ) -> list[int]:
+        """
+        Lists the open loans due within a range of days.
+
+        Args:
+            before (date): Only loans due before this day.
+            since (date | None): Only loans due on or after this day, if set.
+            limit (int | None): Maximum number of loans to return, if set.
+
+        Returns:
+            list[int]: IDs of the borrow records, earliest due first, then
+                in ID order.
+        """
+        record_ids = []
+        with self._lock:
+            start = bisect_left(self.days, since.toordinal()) if since else 0
+            end = bisect_left(self.days, before.toordinal())
+            for day in self.days[start:end]:
+                bucket = self.buckets[day]
+                if limit is None:
+                    record_ids.extend(sorted(bucket))
+                    continue
+                record_ids.extend(heapq.nsmallest(limit - len(record_ids), bucket))
+                if len(record_ids) >= limit:
+                    break
+        return record_ids
+
+
+class OverdueSweeper:
+    """
+    Flags the loans that are still open after their due date.
+
+    Due dates are whole days, so each sweep only has to look at the loans
+    due since the day of the previous one; the first sweep looks at every
+    overdue loan.
+
+    Attributes:
+        repository (BorrowRepository): Repository flagging the loans.
+        swept_through (date | None): Day of the last sweep; every loan due
+            before it has been flagged.
+    """
+
+    def __init__(self, repository):
+        self.repository = repository
+        self.swept_through = None
+
+    def sweep(self, today: date | None = None) -> int:
+        """
+        Flags the loans that became overdue since the last sweep.
+
+        Args:
+            today (date | None): The current day; defaults to today.
+
+        Returns:
+            int: Number of loans flagged.
+        """
+        today = today or date.today()
+        flagged = self.repository.flag_overdue_loans(today, self.swept_through)
+        self.swept_through = today
+        return len(flagged)
+
+    async def run(self, interval: float = SWEEP_INTERVAL):
+        """
+        Sweeps every `interval` seconds, until cancelled.
+
+        Args:
+            interval (float): Seconds between sweeps.
+        """
+        while True:
+            await asyncio.to_thread(self.sweep)
+            await asyncio.sleep(interval)
@@ -0,0 +1,178 @@
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+from collections.abc import Callable, Iterator
+
+# IDs read from an IdIndex at a time while iterating over it
+INDEX_CHUNK_SIZE = 1024
+
+
+class IdIndex:
+    """
+    Sorted set of entity IDs, such as the IDs of the books available.
+
+    IDs are kept in a sorted array, so a page starting at a cursor is found
+    by bisection and costs the same however many IDs come before it. IDs are
+    handed out in increasing order, so most additions are appends.
+
+    Additions and removals are serialized; reads take no lock. A read racing
+    a write may miss or include the ID being changed, so callers check the
+    entities they read against the filter the index stands for.
+
+    Attributes:
+        ids (array): The IDs, in ascending order.
+    """
+
+    def __init__(self):
+        self.ids = array("q")
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def add(self, entity_id: int):
+        """
+        Adds an ID, unless already present.
+
+        Args:
+            entity_id (int): The ID to add.
+        """
+        with self._lock:
+            ids = self.ids
+            if not ids or ids[-1] < entity_id:
+                ids.append(entity_id)
+                return
+            position = bisect_left(ids, entity_id)
+            if ids[position] != entity_id:
+                ids.insert(position, entity_id)
+
+    def discard(self, entity_id: int):
+        """
+        Removes an ID, if present.
+
+        Args:
+            entity_id (int): The ID to remove.
+        """
+        with self._lock:
+            ids = self.ids
+            position = bisect_left(ids, entity_id)
+            if position < len(ids) and ids[position] == entity_id:
+                del ids[position]
+
+    def after(self, after: int, limit: int) -> array:
+        """
+        Returns the first IDs greater than a cursor.
+
+        Args:
+            after (int): Only IDs greater than this are returned.
+            limit (int): Maximum number of IDs to return.
+
+        Returns:
+            array: Up to `limit` IDs, in ascending order.
+        """
+        ids = self.ids
+        start = bisect_right(ids, after)
+        return ids[start : start + limit]
+
+    def iter_after(self, after: int) -> Iterator[int]:
+        """
+        Iterates over the IDs greater than a cursor, a chunk at a time, so
+        the index is never copied whole.
+
+        Args:
+            after (int): Only IDs greater than this are returned.
+
+        Yields:
+            int: The IDs, in ascending order.
+        """
+        while True:
+            chunk = self.after(after, INDEX_CHUNK_SIZE)
+            yield from chunk
+            if len(chunk) < INDEX_CHUNK_SIZE:
+                return
+            after = chunk[-1]
+
+
+def paginate(
+    entities: dict,
+    last_id: int,
+    after: int,
+    limit: int,
+    predicate: Callable | None = None,
+) -> list:
+    """
+    Returns a page of entities with IDs greater than `after`, in ID order.
+
+    IDs are handed out by monotonically increasing sequences, so walking the
+    ID range directly seeks to the cursor without visiting earlier entities.
+    The work done is proportional to the page size plus any deleted or
+    filtered-out IDs skipped on the way.
+
+    Args:
+        entities (dict): Entities keyed by ID.
+        last_id (int): The highest ID handed out so far.
+        after (int): Only entities with a greater ID are returned.
+        limit (int): Maximum number of entities to return.
+        predicate (Callable | None): Optional filter applied to each entity.
+
+    Returns:
+        list: Up to `limit` matching entities.
+    """
+    return paginate_ids(entities, range(after + 1, last_id + 1), limit, predicate)
+
+
+def paginate_index(
+    entities: dict,
+    index: IdIndex,
+    after: int,
+    limit: int,
+    predicate: Callable | None = None,
+) -> list:
+    """
+    Returns a page of the entities in an index with IDs greater than `after`.
+
+    Only the indexed IDs from the cursor on are visited, so the work done is
+    proportional to the page size plus any indexed entities the predicate
+    filters out.
+
+    Args:
+        entities (dict): Entities keyed by ID.
+        index (IdIndex): IDs of the candidate entities.
+        after (int): Only entities with a greater ID are returned.
+        limit (int): Maximum number of entities to return.
+        predicate (Callable | None): Optional filter applied to each entity.
+
+    Returns:
+        list: Up to `limit` matching entities, in ID order.
+    """
+    return paginate_ids(entities, index.iter_after(after), limit, predicate)
+
+
+def paginate_ids(
+    entities: dict,
+    ids: Iterator[int] | range,
+    limit: int,
+    predicate: Callable | None = None,
+) -> list:
+    """
+    Returns the first entities found, in the order of the given IDs.
+
+    Args:
+        entities (dict): Entities keyed by ID.
+        ids (Iterator[int] | range): IDs of the candidate entities.
+        limit (int): Maximum number of entities to return.
+        predicate (Callable | None): Optional filter applied to each entity.
+
+    Returns:
+        list: Up to `limit` matching entities.
+    """
+    page = []
+    if limit <= 0:
+        return page
+    for entity_id in ids:
+        entity = entities.get(entity_id)
+        if entity is not None and (predicate is None or predicate(entity)):
+            page.append(entity)
+            if len(page) == limit:
+                break
+    return page
@@ -0,0 +1,146 @@
+import heapq
+import threading
+import time
+from collections import Counter
+from collections.abc import Callable
+from datetime import date
+
+from .circulation import RankedCounter
+
+# Longest window, in days, that popularity can be asked for
+MAX_WINDOW_DAYS = 30
+
+# Books tracked per day; memory stays bounded however large the catalog is
+DAILY_CAPACITY = 1000
+
+# Rankings are computed and cached this deep, whatever `limit` asks for
+MAX_RANKING = 100
+
+# Seconds a cached ranking is served after loans made it stale
+RANKING_REFRESH_INTERVAL = 1.0
+
+
+class PopularityTracker:
+    """
+    Tracks the most borrowed books over a sliding window of recent days.
+
+    Loans are counted in one bounded `RankedCounter` per borrow date, and
+    days older than `MAX_WINDOW_DAYS` are dropped. A window's ranking merges
+    its days' counters. Rankings are cached and answered by slicing; a
+    cached ranking stays fresh until the next loan, and is then served for
+    at most `refresh_interval` more seconds before being rebuilt. Under a
+    steady stream of loans, each window is thus merged at most once per
+    interval instead of on every read.
+
+    Counts are exact as long as fewer than `DAILY_CAPACITY` distinct books
+    are borrowed a day, and otherwise may overestimate books that only just
+    made it into a day's counter.
+
+    Attributes:
+        days (dict): Maps borrow date ordinals to that day's RankedCounter.
+        refresh_interval (float): Seconds a ranking made stale by new loans
+            may still be served.
+    """
+
+    def __init__(
+        self,
+        max_window_days: int = MAX_WINDOW_DAYS,
+        daily_capacity: int = DAILY_CAPACITY,
+        refresh_interval: float = RANKING_REFRESH_INTERVAL,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        Initializes an empty tracker.
+
+        Args:
+            max_window_days (int): Longest window that can be asked for.
+            daily_capacity (int): Books tracked per day.
+            refresh_interval (float): Seconds a stale ranking may be served.
+            clock (Callable[[], float]): Source of the current time, in
+                seconds.
+        """
+        self.max_window_days = max_window_days
+        self.daily_capacity = daily_capacity
+        self.refresh_interval = refresh_interval
+        self.days = {}
+        self._clock = clock
+        self._version = 0
+        # Maps (last day, window) to (ranking, version, time computed)
+        self._rankings = {}
+        self._lock = threading.Lock()
+
+    def add_loan(self, book_id: int, borrow_date: date):
+        """
+        Counts a loan.
+
+        Args:
+            book_id (int): ID of the borrowed book.
+            borrow_date (date): When it was borrowed.
+        """
+        day = borrow_date.toordinal()
+        with self._lock:
+            counter = self.days.get(day)
+            if counter is None:
+                newest = max(self.days, default=day)
+                if day <= newest - self.max_window_days:
+                    return
+                counter = self.days[day] = RankedCounter(self.daily_capacity)
+                if day > newest:
+                    horizon = day - self.max_window_days
+                    for expired in [d for d in self.days if d <= horizon]:
+                        del self.days[expired]
+            counter.increment(book_id)
+            self._version += 1
+
+    def top(self, window_days: int, limit: int, today: date) -> list[tuple[int, int]]:
+        """
+        Returns the books borrowed most often within a window.
+
+        Args:
+            window_days (int): Number of days, ending today, to rank over.
+            limit (int): Maximum number of books to return.
+            today (date): Last day of the window.
+
+        Returns:
+            list[tuple[int, int]]: (book ID, loans) pairs, most loans first,
+                ties broken by ascending book ID.
+        """
+        if not 1 <= window_days <= self.max_window_days:
+            raise ValueError(
+                f"Window must be between 1 and {self.max_window_days} days"
+            )
+        last = today.toordinal()
+        key = (last, window_days)
+        now = self._clock()
+        with self._lock:
+            version = self._version
+            cached = self._rankings.get(key)
+            if cached is not None:
+                ranking, computed_version, computed = cached
+                if (
+                    computed_version == version
+                    or now < computed + self.refresh_interval
+                ):
+                    return ranking[:limit]
+            totals = Counter()
+            for day in range(last - window_days + 1, last + 1):
+                counter = self.days.get(day)
+                if counter is not None:
+                    totals.update(counter.counts)
+        ranking = heapq.nsmallest(
+            MAX_RANKING, totals.items(), key=lambda item: (-item[1], item[0])
+        )
+        with self._lock:
+            if (
+                len(self._rankings) >= self.max_window_days
+                and key not in self._rankings
+            ):
+                # Rankings of past days are never asked for again
+                self._rankings = {
+                    k: v for k, v in self._rankings.items() if k[0] == last
+                }
+            current = self._rankings.get(key)
+            # Keep a ranking another reader computed from newer loans
+            if current is None or current[1] <= version:
+                self._rankings[key] = (ranking, version, now)
+        return ranking[:limit]
@@ -0,0 +1,334 @@
+import asyncio
+import threading
+from collections import defaultdict
+from collections.abc import Awaitable, Callable, Iterable
+from datetime import date, timedelta
+from enum import StrEnum
+
+from pydantic import BaseModel
+from starlette.concurrency import run_in_threadpool
+
+from app.models.borrow import BorrowRecord
+from app.models.reservation import Reservation, ReservationCreate, ReservationStatus
+
+# Seconds between checks on a reservation being waited for, when other
+# processes share the store and may settle it
+SHARED_STORE_POLL_INTERVAL = 1.0
+
+
+class ReservationError(StrEnum):
+    """
+    Reasons a reservation could not be made or cancelled.
+    """
+
+    USER_NOT_FOUND = "User not found"
+    USER_INACTIVE = "User is inactive"
+    BOOK_NOT_FOUND = "Book not found"
+    BOOK_AVAILABLE = "Book is available for borrowing"
+    ALREADY_BORROWED = "Book already borrowed by the user"
+    ALREADY_RESERVED = "Book already reserved by the user"
+    NOT_WAITING = "Reservation is no longer waiting"
+
+
+class ReservationWaiters:
+    """
+    Wakes up requests long-polling for reservations to be settled.
+
+    Waiters are asyncio futures, possibly on different event loops, while
+    reservations are settled by repository calls running in worker threads;
+    each future is therefore resolved on its own loop.
+
+    Notifications only reach waiters of the same process. When processes
+    share a store, reservations settled by another process are noticed by
+    checking on them every `poll_interval` seconds.
+
+    Attributes:
+        poll_interval (float | None): Seconds between checks while waiting,
+            or None to rely on notifications alone.
+    """
+
+    def __init__(self, poll_interval: float | None = None):
+        self.poll_interval = poll_interval
+        self._waiters = defaultdict(list)
+        self._lock = threading.Lock()
+
+    async def wait(
+        self,
+        reservation_id: int,
+        timeout: float,
+        settled: Callable[[], Awaitable[bool]],
+    ) -> bool:
+        """
+        Waits until a reservation is notified or the timeout expires.
+
+        Args:
+            reservation_id (int): ID of the reservation.
+            timeout (float): Maximum number of seconds to wait.
+            settled (Callable[[], Awaitable[bool]]): Checked once the waiter
+                is registered, so a notification sent just before is not
+                missed, and on every poll.
+
+        Returns:
+            bool: True if the reservation was notified or already settled.
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        waiter = (loop, future)
+        with self._lock:
+            self._waiters[reservation_id].append(waiter)
+        deadline = loop.time() + timeout
+        try:
+            if await settled():
+                return True
+            while not future.done():
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    return False
+                if self.poll_interval is not None:
+                    remaining = min(remaining, self.poll_interval)
+                await asyncio.wait({future}, timeout=remaining)
+                if not future.done() and await settled():
+                    return True
+            return True
+        finally:
+            with self._lock:
+                waiters = self._waiters.get(reservation_id)
+                if waiters and waiter in waiters:
+                    waiters.remove(waiter)
+                    if not waiters:
+                        del self._waiters[reservation_id]
+
+    def notify(self, reservation_ids: Iterable[int]):
+        """
+        Wakes up everyone waiting for the given reservations.
+
+        Args:
+            reservation_ids (Iterable[int]): IDs of the settled reservations.
+        """
+        with self._lock:
+            waiters = [
+                waiter
+                for reservation_id in reservation_ids
+                for waiter in self._waiters.pop(reservation_id, ())
+            ]
+        for loop, future in waiters:
+            try:
+                loop.call_soon_threadsafe(_resolve, future)
+            except RuntimeError:
+                # The waiter's event loop has been closed
+                pass
+
+
+def _resolve(future: asyncio.Future):
+    if not future.done():
+        future.set_result(None)
+
+
+reservation_waiters = ReservationWaiters()
+
+
+def hand_off(
+    data_store, book, today: date, loan_period: timedelta
+) -> list[tuple[str, BaseModel]]:
+    """
+    Makes a book that just came back available, or lends it straight to the
+    first user on its waitlist.
+
+    Users who were deleted or deactivated while waiting lose their place.
+    Only the head of the waitlist is read, so the hand-off takes the same
+    time however many users are waiting.
+    Must be called while holding the book's lock; the caller publishes the
+    returned changes and then notifies `reservation_waiters`.
+
+    Args:
+        data_store (StorageBackend): The store to update.
+        book (Book): The returned book.
+        today (date): The borrow date of the new loan.
+        loan_period (timedelta): How long the new loan lasts.
+
+    Returns:
+        list[tuple[str, BaseModel]]: (collection, entity) pairs of the
+            settled reservations, the new borrow record if any, and the book.
+    """
+    puts = []
+    loan = None
+    while loan is None:
+        head = data_store.find_waiting_reservations(book.id, limit=1)
+        if not head:
+            break
+        reservation = head[0]
+        user = data_store.get("users", reservation.user_id)
+        if user is None or not user.is_active:
+            reservation.status = ReservationStatus.CANCELLED
+        else:
+            loan = BorrowRecord(
+                id=data_store.next_id("borrow"),
+                user_id=reservation.user_id,
+                book_id=book.id,
+                borrow_date=today,
+                due_date=today + loan_period,
+            )
+            reservation.status = ReservationStatus.FULFILLED
+            reservation.borrow_id = loan.id
+        data_store.put("reservations", reservation)
+        puts.append(("reservations", reservation))
+        if loan is not None:
+            data_store.put("borrow_records", loan)
+            puts.append(("borrow_records", loan))
+    book.is_available = loan is None
+    book.version += 1
+    data_store.put("books", book)
+    puts.append(("books", book))
+    return puts
+
+
+def settled_reservations(puts: list[tuple[str, BaseModel]]) -> list[int]:
+    """
+    Returns the IDs of the reservations among the changes made by `hand_off`.
+    """
+    return [entity.id for collection, entity in puts if collection == "reservations"]
+
+
+class ReservationRepository:
+    """
+    Repository for managing Reservation entities.
+
+    Each book has a first-come, first-served waitlist of reservations. When
+    a book is returned, `BorrowRepository` lends it straight to the first
+    user waiting, so nobody has to poll for it.
+    """
+
+    def __init__(self, data_store):
+        """
+        Initializes the ReservationRepository with a data store.
+
+        Args:
+            data_store (StorageBackend): The storage backend.
+        """
+        self.data_store = data_store
+
+    def reserve_book(
+        self, reservation_create: ReservationCreate
+    ) -> Reservation | ReservationError:
+        """
+        Puts a user on the waitlist of a book that is currently lent out.
+
+        Args:
+            reservation_create (ReservationCreate): The user and the book.
+
+        Returns:
+            Reservation | ReservationError: The new reservation, or why the
+                user cannot join the waitlist.
+        """
+        user_id, book_id = reservation_create.user_id, reservation_create.book_id
+        user = self.data_store.get("users", user_id)
+        if user is None:
+            return ReservationError.USER_NOT_FOUND
+        if not user.is_active:
+            return ReservationError.USER_INACTIVE
+        with self.data_store.lock_books(book_id):
+            book = self.data_store.get("books", book_id)
+            if book is None:
+                return ReservationError.BOOK_NOT_FOUND
+            if book.is_available:
+                return ReservationError.BOOK_AVAILABLE
+            if self.data_store.find_active_borrow_record(user_id, book_id):
+                return ReservationError.ALREADY_BORROWED
+            if self.data_store.find_waiting_reservation(book_id, user_id):
+                return ReservationError.ALREADY_RESERVED
+            reservation = Reservation(
+                id=self.data_store.next_id("reservation"),
+                user_id=user_id,
+                book_id=book_id,
+                reserved_date=date.today(),
+            )
+            self.data_store.put("reservations", reservation)
+            self.data_store.publish(
+                "reserve_book", puts=[("reservations", reservation)]
+            )
+            return reservation
+
+    def get_reservation(self, reservation_id: int) -> Reservation | None:
+        """
+        Retrieves a reservation by ID.
+
+        Args:
+            reservation_id (int): The ID of the reservation.
+
+        Returns:
+            Reservation | None: The reservation if found, else None.
+        """
+        return self.data_store.get("reservations", reservation_id)
+
+    def get_waitlist(self, book_id: int) -> list[Reservation]:
+        """
+        Retrieves the users waiting for a book.
+
+        Args:
+            book_id (int): ID of the book.
+
+        Returns:
+            list[Reservation]: The waiting reservations, first come first.
+        """
+        return self.data_store.find_waiting_reservations(book_id)
+
+    def cancel_reservation(
+        self, reservation_id: int
+    ) -> Reservation | ReservationError | None:
+        """
+        Takes a user off a waitlist.
+
+        Args:
+            reservation_id (int): The ID of the reservation.
+
+        Returns:
+            Reservation | ReservationError | None: The cancelled reservation,
+                NOT_WAITING if it was already settled, or None if not found.
+        """
+        reservation = self.get_reservation(reservation_id)
+        if reservation is None:
+            return None
+        with self.data_store.lock_books(reservation.book_id):
+            # Re-read under the lock, the book may have been handed over since
+            reservation = self.get_reservation(reservation_id)
+            if reservation.status != ReservationStatus.WAITING:
+                return ReservationError.NOT_WAITING
+            reservation.status = ReservationStatus.CANCELLED
+            self.data_store.put("reservations", reservation)
+            self.data_store.publish(
+                "cancel_reservation", puts=[("reservations", reservation)]
+            )
+        reservation_waiters.notify([reservation_id])
+        return reservation
+
+    async def wait_for_reservation(
+        self, reservation_id: int, timeout: float
+    ) -> Reservation | None:
+        """
+        Waits until a reservation is no longer waiting, or the timeout expires.
+
+        The reservation is read in the threadpool when the store may block,
+        so the event loop is never held up by a query.
+
+        Args:
+            reservation_id (int): The ID of the reservation.
+            timeout (float): Maximum number of seconds to wait.
+
+        Returns:
+            Reservation | None: The reservation as it stands when the wait
+                ends, or None if not found.
+        """
+
+        async def read() -> Reservation | None:
+            if self.data_store.blocking:
+                return await run_in_threadpool(self.get_reservation, reservation_id)
+            return self.get_reservation(reservation_id)
+
+        async def settled() -> bool:
+            reservation = await read()
+            return (
+                reservation is None or reservation.status != ReservationStatus.WAITING
+            )
+
+        await reservation_waiters.wait(reservation_id, timeout, settled)
+        return await read()
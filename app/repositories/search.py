@@ -0,0 +1,154 @@
+import bisect
+import heapq
+import re
+import threading
+import unicodedata
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+# Relative weight of a match in each indexed field
+TITLE_WEIGHT = 2.0
+AUTHOR_WEIGHT = 1.0
+
+# A prefix match scores less than an exact match of the same term
+PREFIX_PENALTY = 0.5
+
+# Caps how many vocabulary terms a short prefix may expand into
+MAX_PREFIX_EXPANSIONS = 64
+
+
+def tokenize(text: str) -> list[str]:
+    """
+    Splits text into lowercase, accent-free word tokens.
+
+    Args:
+        text (str): The text to tokenize.
+
+    Returns:
+        list[str]: The tokens in order of appearance.
+    """
+    decomposed = unicodedata.normalize("NFKD", text.casefold())
+    stripped = "".join(c for c in decomposed if not unicodedata.combining(c))
+    return TOKEN_PATTERN.findall(stripped)
+
+
+class InvertedIndex:
+    """
+    In-memory inverted index over book titles and authors.
+
+    Attributes:
+        postings (dict): Maps each token to {book ID: field weight}.
+        vocabulary (list): All indexed tokens, sorted for prefix lookups.
+        documents (dict): Maps each book ID to its {token: field weight}, so the
+            book can be removed from the index without re-tokenizing it.
+    """
+
+    def __init__(self):
+        """
+        Initializes an empty index.
+        """
+        self.postings = {}
+        self.vocabulary = []
+        self.documents = {}
+        self._lock = threading.Lock()
+
+    def add(self, book):
+        """
+        Indexes a book, replacing any previous entry for the same ID.
+
+        Args:
+            book (Book): The book to index.
+        """
+        weights = {}
+        for token in tokenize(book.title):
+            weights[token] = weights.get(token, 0.0) + TITLE_WEIGHT
+        for token in tokenize(book.author):
+            weights[token] = weights.get(token, 0.0) + AUTHOR_WEIGHT
+        with self._lock:
+            self._remove(book.id)
+            self.documents[book.id] = weights
+            for token, weight in weights.items():
+                posting = self.postings.get(token)
+                if posting is None:
+                    posting = self.postings[token] = {}
+                    bisect.insort(self.vocabulary, token)
+                posting[book.id] = weight
+
+    def remove(self, book_id: int):
+        """
+        Removes a book from the index.
+
+        Args:
+            book_id (int): The ID of the book to remove.
+        """
+        with self._lock:
+            self._remove(book_id)
+
+    def _remove(self, book_id: int):
+        weights = self.documents.pop(book_id, None)
+        if not weights:
+            return
+        for token in weights:
+            posting = self.postings[token]
+            del posting[book_id]
+            if not posting:
+                del self.postings[token]
+                del self.vocabulary[bisect.bisect_left(self.vocabulary, token)]
+
+    def _expand(self, term: str) -> list[str]:
+        start = bisect.bisect_left(self.vocabulary, term)
+        expansions = []
+        for token in self.vocabulary[start : start + MAX_PREFIX_EXPANSIONS]:
+            if not token.startswith(term):
+                break
+            expansions.append(token)
+        return expansions
+
+    def _term_scores(self, term: str, prefix: bool) -> dict:
+        if not prefix:
+            return self.postings.get(term, {})
+        scores = dict(self.postings.get(term, {}))
+        for token in self._expand(term):
+            if token == term:
+                continue
+            for book_id, weight in self.postings[token].items():
+                score = weight * PREFIX_PENALTY
+                if score > scores.get(book_id, 0.0):
+                    scores[book_id] = score
+        return scores
+
+    def search(self, query: str, limit: int = 20) -> list[int]:
+        """
+        Finds the books matching every term of a query, best matches first.
+
+        The last term also matches as a prefix so that partially typed words
+        find results. Books are ranked by the summed field weights of their
+        matching terms, then by ID.
+
+        Args:
+            query (str): Free-text query.
+            limit (int): Maximum number of book IDs to return.
+
+        Returns:
+            list[int]: IDs of the matching books, best match first.
+        """
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms:
+            return []
+        with self._lock:
+            term_scores = [
+                self._term_scores(term, prefix=index == len(terms) - 1)
+                for index, term in enumerate(terms)
+            ]
+            term_scores.sort(key=len)
+            candidates = term_scores[0]
+            ranked = []
+            for book_id, score in candidates.items():
+                for other in term_scores[1:]:
+                    weight = other.get(book_id)
+                    if weight is None:
+                        break
+                    score += weight
+                else:
+                    ranked.append((score, -book_id))
+        return [-negated_id for _, negated_id in heapq.nlargest(limit, ranked)]
@@ -0,0 +1,581 @@
+import os
+import sqlite3
+import threading
+import types
+import typing
+from contextlib import contextmanager
+from datetime import date, timedelta
+
+from .backend import StorageBackend, normalize_email
+from .mutations import COLLECTION_MODELS, COLLECTION_SEQUENCES
+from .popularity import MAX_WINDOW_DAYS
+from .search import tokenize
+
+# Number of rows fetched per query while scanning a table
+SCAN_BATCH_SIZE = 500
+
+# Entries kept in the change log; older ones are trimmed every
+# `CHANGE_LOG_TRIM_EVERY` new entries
+CHANGE_LOG_SIZE = 10_000
+CHANGE_LOG_TRIM_EVERY = 1_000
+
+# Range filters accepted by `scan` and `page`
+RANGE_FILTERS = {
+    "borrowed_from": "borrow_date >= ?",
+    "borrowed_to": "borrow_date <= ?",
+}
+
+INDEXES = """
+CREATE INDEX IF NOT EXISTS borrow_records_by_user
+    ON borrow_records (user_id, id);
+CREATE INDEX IF NOT EXISTS borrow_records_by_book
+    ON borrow_records (book_id, id);
+CREATE INDEX IF NOT EXISTS borrow_records_by_user_book_return
+    ON borrow_records (user_id, book_id, return_date);
+CREATE INDEX IF NOT EXISTS borrow_records_open
+    ON borrow_records (id) WHERE return_date IS NULL;
+CREATE INDEX IF NOT EXISTS borrow_records_open_by_user
+    ON borrow_records (user_id, id) WHERE return_date IS NULL;
+CREATE INDEX IF NOT EXISTS borrow_records_due
+    ON borrow_records (due_date, id) WHERE return_date IS NULL;
+CREATE INDEX IF NOT EXISTS borrow_records_by_date
+    ON borrow_records (borrow_date, book_id);
+CREATE INDEX IF NOT EXISTS reservations_waiting
+    ON reservations (book_id, id) WHERE status = 'waiting';
+CREATE INDEX IF NOT EXISTS reservations_waiting_by_user
+    ON reservations (book_id, user_id) WHERE status = 'waiting';
+CREATE INDEX IF NOT EXISTS users_by_email
+    ON users (normalize_email(email));
+"""
+
+BOOK_SEARCH = """
+CREATE VIRTUAL TABLE IF NOT EXISTS books_fts USING fts5(
+    title, author,
+    content='books', content_rowid='id',
+    tokenize='unicode61 remove_diacritics 2'
+);
+CREATE TRIGGER IF NOT EXISTS books_fts_insert AFTER INSERT ON books BEGIN
+    INSERT INTO books_fts (rowid, title, author)
+    VALUES (new.id, new.title, new.author);
+END;
+CREATE TRIGGER IF NOT EXISTS books_fts_delete AFTER DELETE ON books BEGIN
+    INSERT INTO books_fts (books_fts, rowid, title, author)
+    VALUES ('delete', old.id, old.title, old.author);
+END;
+CREATE TRIGGER IF NOT EXISTS books_fts_update AFTER UPDATE ON books
+WHEN old.title IS NOT new.title OR old.author IS NOT new.author BEGIN
+    INSERT INTO books_fts (books_fts, rowid, title, author)
+    VALUES ('delete', old.id, old.title, old.author);
+    INSERT INTO books_fts (rowid, title, author)
+    VALUES (new.id, new.title, new.author);
+END;
+"""
+
+
+def _column_type(annotation) -> str:
+    """
+    Maps a model field annotation to an SQLite column type.
+    """
+    if isinstance(annotation, types.UnionType) or typing.get_origin(annotation):
+        annotation = next(a for a in typing.get_args(annotation) if a is not type(None))
+    return "INTEGER" if annotation in (int, bool) else "TEXT"
+
+
+class _Table:
+    """
+    Column list and prepared SQL for one collection.
+    """
+
+    def __init__(self, name: str, model):
+        self.name = name
+        self.model = model
+        self.columns = ["id", *(f for f in model.model_fields if f != "id")]
+        columns = ", ".join(self.columns)
+        placeholders = ", ".join("?" for _ in self.columns)
+        updates = ", ".join(f"{c} = excluded.{c}" for c in self.columns if c != "id")
+        definitions = ", ".join(
+            "id INTEGER PRIMARY KEY" if c == "id" else f"{c} {self._type(c)}"
+            for c in self.columns
+        )
+        self.create = f"CREATE TABLE IF NOT EXISTS {name} ({definitions})"
+        self.select = f"SELECT {columns} FROM {name}"
+        self.select_prefixed = ", ".join(f"{name}.{c}" for c in self.columns)
+        self.get = f"{self.select} WHERE id = ?"
+        self.upsert = (
+            f"INSERT INTO {name} ({columns}) VALUES ({placeholders}) "
+            f"ON CONFLICT (id) DO UPDATE SET {updates}"
+        )
+        self.delete = f"DELETE FROM {name} WHERE id = ?"
+
+    def add_columns(self, existing: set[str]) -> list[str]:
+        """
+        Returns the statements adding model fields missing from the table,
+        so databases created by older versions keep working.
+        """
+        return [
+            f"ALTER TABLE {self.name} ADD COLUMN {column} {self._type(column)}"
+            f"{self._default(column)}"
+            for column in self.columns
+            if column not in existing
+        ]
+
+    def _type(self, column: str) -> str:
+        return _column_type(self.model.model_fields[column].annotation)
+
+    def _default(self, column: str) -> str:
+        # Existing rows take the field's default, e.g. version 1
+        default = self.model.model_fields[column].default
+        if isinstance(default, int):
+            return f" DEFAULT {int(default)}"
+        if isinstance(default, str):
+            return " DEFAULT '{}'".format(default.replace("'", "''"))
+        return ""
+
+    def to_row(self, entity) -> tuple:
+        data = entity.model_dump(mode="json")
+        return tuple(data[column] for column in self.columns)
+
+    def to_entity(self, row):
+        return self.model.model_validate(dict(zip(self.columns, row, strict=True)))
+
+
+class SqliteStore(StorageBackend):
+    """
+    SQLite storage backend.
+
+    The database runs in WAL mode so readers never block the writer. Each
+    thread gets its own connection, whose statement cache keeps the prepared
+    statements. Operations that hold user or book locks run inside a single
+    `BEGIN IMMEDIATE` transaction, which serializes writers across threads
+    and processes alike.
+
+    Several processes, such as the workers of `uvicorn --workers N`, can
+    thus share one database: each reads it directly, in parallel, while
+    writes stay consistent. Listeners can append changes to a shared log
+    with `log_change`, so each process can follow those made by the others.
+
+    Attributes:
+        path (str): Path of the database file.
+    """
+
+    blocking = True
+
+    def __init__(self, path: str | os.PathLike):
+        """
+        Opens the database, creating the schema if needed.
+
+        Args:
+            path (str | os.PathLike): Path of the database file.
+        """
+        super().__init__()
+        self.path = os.fspath(path)
+        self.tables = {
+            name: _Table(name, model) for name, model in COLLECTION_MODELS.items()
+        }
+        self._local = threading.local()
+        self._connections = []
+        self._connections_lock = threading.Lock()
+        self._create_schema()
+
+    def close(self):
+        super().close()
+        with self._connections_lock:
+            for connection in self._connections:
+                connection.close()
+            self._connections.clear()
+        self._local = threading.local()
+
+    def reset(self):
+        with self.transaction() as connection:
+            for name in self.tables:
+                connection.execute(f"DELETE FROM {name}")
+            # Change sequence numbers keep growing, so followers never
+            # mistake new changes for ones they already delivered
+            connection.execute("DELETE FROM changes")
+            connection.execute("UPDATE sequences SET value = 1")
+
+    def next_id(self, sequence: str) -> int:
+        (value,) = (
+            self._connection()
+            .execute(
+                "UPDATE sequences SET value = value + 1 WHERE name = ? "
+                "RETURNING value - 1",
+                (sequence,),
+            )
+            .fetchone()
+        )
+        return value
+
+    def reserve_ids(self, sequence: str, count: int) -> range:
+        (first,) = (
+            self._connection()
+            .execute(
+                "UPDATE sequences SET value = value + ? WHERE name = ? "
+                "RETURNING value - ?",
+                (count, sequence, count),
+            )
+            .fetchone()
+        )
+        return range(first, first + count)
+
+    def advance_sequence(self, collection: str, entity_id: int):
+        self._connection().execute(
+            "UPDATE sequences SET value = MAX(value, ?) WHERE name = ?",
+            (entity_id + 1, COLLECTION_SEQUENCES[collection]),
+        )
+
+    def get(self, collection: str, entity_id: int):
+        table = self.tables[collection]
+        row = self._connection().execute(table.get, (entity_id,)).fetchone()
+        return table.to_entity(row) if row else None
+
+    def put(self, collection: str, entity):
+        table = self.tables[collection]
+        self._connection().execute(table.upsert, table.to_row(entity))
+
+    def put_many(self, collection: str, entities: list):
+        table = self.tables[collection]
+        with self.transaction() as connection:
+            connection.executemany(table.upsert, map(table.to_row, entities))
+
+    def delete(self, collection: str, entity_id: int) -> bool:
+        table = self.tables[collection]
+        cursor = self._connection().execute(table.delete, (entity_id,))
+        return cursor.rowcount > 0
+
+    def scan(self, collection: str, after: int = 0, **filters):
+        while True:
+            page = self.page(collection, after, SCAN_BATCH_SIZE, **filters)
+            yield from page
+            if len(page) < SCAN_BATCH_SIZE:
+                return
+            after = page[-1].id
+
+    def page(self, collection: str, after: int, limit: int, **filters) -> list:
+        table = self.tables[collection]
+        conditions, parameters = self._where(table, filters)
+        conditions.insert(0, "id > ?")
+        parameters.insert(0, after)
+        query = f"{table.select} WHERE {' AND '.join(conditions)} ORDER BY id LIMIT ?"
+        rows = self._connection().execute(query, (*parameters, limit))
+        return [table.to_entity(row) for row in rows]
+
+    def count(self, collection: str, **filters) -> int:
+        table = self.tables[collection]
+        conditions, parameters = self._where(table, filters)
+        query = f"SELECT COUNT(*) FROM {table.name}"
+        if conditions:
+            query += f" WHERE {' AND '.join(conditions)}"
+        return self._connection().execute(query, parameters).fetchone()[0]
+
+    def find_borrow_records_by_user(self, user_id: int) -> list:
+        table = self.tables["borrow_records"]
+        rows = self._connection().execute(
+            f"{table.select} WHERE user_id = ? ORDER BY id", (user_id,)
+        )
+        return [table.to_entity(row) for row in rows]
+
+    def find_active_borrow_record(self, user_id: int, book_id: int):
+        table = self.tables["borrow_records"]
+        row = (
+            self._connection()
+            .execute(
+                f"{table.select} WHERE user_id = ? AND book_id = ? "
+                "AND return_date IS NULL",
+                (user_id, book_id),
+            )
+            .fetchone()
+        )
+        return table.to_entity(row) if row else None
+
+    def count_active_loans(self, user_id: int) -> int:
+        return (
+            self._connection()
+            .execute(
+                "SELECT COUNT(*) FROM borrow_records "
+                "WHERE user_id = ? AND return_date IS NULL",
+                (user_id,),
+            )
+            .fetchone()[0]
+        )
+
+    def find_active_borrow_records_by_user(self, user_id: int) -> list:
+        table = self.tables["borrow_records"]
+        rows = self._connection().execute(
+            f"{table.select} WHERE user_id = ? AND return_date IS NULL ORDER BY id",
+            (user_id,),
+        )
+        return [table.to_entity(row) for row in rows]
+
+    def find_due_borrow_records(
+        self, before: date, since: date | None = None, limit: int | None = None
+    ) -> list:
+        table = self.tables["borrow_records"]
+        query = f"{table.select} WHERE return_date IS NULL AND due_date < ?"
+        parameters = [before.isoformat()]
+        if since is not None:
+            query += " AND due_date >= ?"
+            parameters.append(since.isoformat())
+        query += " ORDER BY due_date, id"
+        if limit is not None:
+            query += " LIMIT ?"
+            parameters.append(limit)
+        rows = self._connection().execute(query, parameters)
+        return [table.to_entity(row) for row in rows]
+
+    def find_waiting_reservations(self, book_id: int, limit: int | None = None) -> list:
+        table = self.tables["reservations"]
+        query = f"{table.select} WHERE book_id = ? AND status = 'waiting' ORDER BY id"
+        parameters = [book_id]
+        if limit is not None:
+            query += " LIMIT ?"
+            parameters.append(limit)
+        rows = self._connection().execute(query, parameters)
+        return [table.to_entity(row) for row in rows]
+
+    def find_waiting_reservation(self, book_id: int, user_id: int):
+        table = self.tables["reservations"]
+        row = (
+            self._connection()
+            .execute(
+                f"{table.select} WHERE book_id = ? AND user_id = ? "
+                "AND status = 'waiting'",
+                (book_id, user_id),
+            )
+            .fetchone()
+        )
+        return table.to_entity(row) if row else None
+
+    def find_user_by_email(self, email: str):
+        table = self.tables["users"]
+        row = (
+            self._connection()
+            .execute(
+                f"{table.select} WHERE normalize_email(email) = ? ORDER BY id LIMIT 1",
+                (normalize_email(email),),
+            )
+            .fetchone()
+        )
+        return table.to_entity(row) if row else None
+
+    def search_books(self, query: str, limit: int) -> list:
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms:
+            return []
+        # Every term must match and the last one may be a prefix
+        match = " ".join(f'"{term}"' for term in terms) + "*"
+        table = self.tables["books"]
+        rows = self._connection().execute(
+            f"SELECT {table.select_prefixed} FROM books_fts "
+            "JOIN books ON books.id = books_fts.rowid "
+            "WHERE books_fts MATCH ? "
+            "ORDER BY bm25(books_fts, 2.0, 1.0), books.id LIMIT ?",
+            (match, limit),
+        )
+        return [table.to_entity(row) for row in rows]
+
+    def loans_per_day(self, start: date | None = None, end: date | None = None) -> list:
+        conditions, parameters = self._where(
+            self.tables["borrow_records"],
+            {"borrowed_from": start, "borrowed_to": end},
+        )
+        where = f"WHERE {' AND '.join(conditions)} " if conditions else ""
+        rows = self._connection().execute(
+            f"SELECT borrow_date, COUNT(*) FROM borrow_records {where}"
+            "GROUP BY borrow_date ORDER BY borrow_date",
+            parameters,
+        )
+        return [(date.fromisoformat(day), loans) for day, loans in rows]
+
+    def most_borrowed(self, field: str, limit: int) -> list:
+        if field not in ("book_id", "user_id"):
+            raise ValueError(f"Unknown field: {field}")
+        rows = self._connection().execute(
+            f"SELECT {field}, COUNT(*) AS loans FROM borrow_records "
+            f"GROUP BY {field} ORDER BY loans DESC, {field} LIMIT ?",
+            (limit,),
+        )
+        return [tuple(row) for row in rows]
+
+    def popular_books(self, window_days: int, limit: int, today: date) -> list:
+        if not 1 <= window_days <= MAX_WINDOW_DAYS:
+            raise ValueError(f"Window must be between 1 and {MAX_WINDOW_DAYS} days")
+        start = today - timedelta(days=window_days - 1)
+        rows = self._connection().execute(
+            "SELECT book_id, COUNT(*) AS loans FROM borrow_records "
+            "WHERE borrow_date BETWEEN ? AND ? "
+            "GROUP BY book_id ORDER BY loans DESC, book_id LIMIT ?",
+            (start.isoformat(), today.isoformat(), limit),
+        )
+        return [tuple(row) for row in rows]
+
+    def loan_duration(self) -> tuple:
+        returned, mean_days = (
+            self._connection()
+            .execute(
+                "SELECT COUNT(*), AVG(julianday(return_date) - julianday(borrow_date)) "
+                "FROM borrow_records WHERE return_date IS NOT NULL"
+            )
+            .fetchone()
+        )
+        return returned, mean_days
+
+    def log_change(self, op: str, data: str) -> int:
+        """
+        Appends an entry to the change log shared by every process using the
+        database.
+
+        Called by listeners while the mutation's transaction, if any, is
+        still open, so the entry commits with the change itself. SQLite
+        allows a single writer at a time, hence entries are numbered in
+        commit order and followers never skip one.
+
+        Args:
+            op (str): Name of the repository operation.
+            data (str): The change, serialized.
+
+        Returns:
+            int: Sequence number of the entry.
+        """
+        connection = self._connection()
+        (seq,) = connection.execute(
+            "INSERT INTO changes (op, data) VALUES (?, ?) RETURNING seq", (op, data)
+        ).fetchone()
+        if seq % CHANGE_LOG_TRIM_EVERY == 0:
+            connection.execute(
+                "DELETE FROM changes WHERE seq <= ?", (seq - CHANGE_LOG_SIZE,)
+            )
+        return seq
+
+    def changes_since(self, seq: int, limit: int) -> list[tuple[int, str, str]]:
+        """
+        Reads the change log.
+
+        Args:
+            seq (int): Sequence number of the last entry already read.
+            limit (int): Maximum number of entries to return.
+
+        Returns:
+            list[tuple[int, str, str]]: (seq, op, data) entries logged after
+                `seq`, oldest first.
+        """
+        rows = self._connection().execute(
+            "SELECT seq, op, data FROM changes WHERE seq > ? ORDER BY seq LIMIT ?",
+            (seq, limit),
+        )
+        return rows.fetchall()
+
+    def lock_users(self, *user_ids: int):
+        return self.transaction()
+
+    def lock_emails(self, *emails: str):
+        return self.transaction()
+
+    def lock_books(self, *book_ids: int):
+        return self.transaction()
+
+    @contextmanager
+    def transaction(self):
+        """
+        Runs the enclosed operations in one write transaction.
+
+        Nested transactions on the same thread join the outermost one.
+
+        Yields:
+            sqlite3.Connection: The calling thread's connection.
+        """
+        connection = self._connection()
+        if connection.in_transaction:
+            yield connection
+            return
+        connection.execute("BEGIN IMMEDIATE")
+        self._local.after_write = []
+        try:
+            yield connection
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        else:
+            connection.execute("COMMIT")
+        finally:
+            callbacks, self._local.after_write = self._local.after_write, None
+            for callback in callbacks:
+                callback()
+
+    def after_write(self, callback):
+        # Deferred until the enclosing transaction commits or rolls back
+        callbacks = getattr(self._local, "after_write", None)
+        if callbacks is None:
+            callback()
+        else:
+            callbacks.append(callback)
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(
+                self.path,
+                isolation_level=None,
+                check_same_thread=False,
+                cached_statements=256,
+            )
+            connection.execute("PRAGMA journal_mode = WAL")
+            connection.execute("PRAGMA synchronous = NORMAL")
+            connection.execute("PRAGMA busy_timeout = 5000")
+            # Backs the email index; it must exist on every connection that
+            # writes users
+            connection.create_function(
+                "normalize_email", 1, normalize_email, deterministic=True
+            )
+            self._local.connection = connection
+            with self._connections_lock:
+                self._connections.append(connection)
+        return connection
+
+    def _create_schema(self):
+        with self.transaction() as connection:
+            for table in self.tables.values():
+                connection.execute(table.create)
+                existing = {
+                    row[1]
+                    for row in connection.execute(f"PRAGMA table_info({table.name})")
+                }
+                for statement in table.add_columns(existing):
+                    connection.execute(statement)
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS changes (seq INTEGER PRIMARY KEY "
+                "AUTOINCREMENT, op TEXT NOT NULL, data TEXT NOT NULL)"
+            )
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS sequences "
+                "(name TEXT PRIMARY KEY, value INTEGER NOT NULL)"
+            )
+            connection.executemany(
+                "INSERT OR IGNORE INTO sequences (name, value) VALUES (?, 1)",
+                [(sequence,) for sequence in COLLECTION_SEQUENCES.values()],
+            )
+        # executescript commits on its own, so the DDL below runs outside
+        # the transaction above
+        self._connection().executescript(INDEXES + BOOK_SEARCH)
+
+    @staticmethod
+    def _where(table: _Table, filters: dict) -> tuple[list[str], list]:
+        """
+        Translates `scan` filters into SQL conditions and their parameters.
+        """
+        conditions = []
+        parameters = []
+        for field, value in filters.items():
+            if value is None:
+                continue
+            if field == "is_returned":
+                conditions.append(f"return_date IS {'NOT ' if value else ''}NULL")
+            elif field in RANGE_FILTERS:
+                conditions.append(RANGE_FILTERS[field])
+                parameters.append(value.isoformat())
+            elif field in table.columns:
+                conditions.append(f"{field} = ?")
+                parameters.append(value)
+            else:
+                raise ValueError(f"Unknown field: {field}")
+        return conditions, parameters
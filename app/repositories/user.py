@@ -1,19 +1,39 @@
+from collections.abc import Collection
+
 from app.models.user import User, UserCreate, UserUpdate
 
+from .backend import VersionMismatchError, normalize_email
+from .cache import read_through
+
+
+class DuplicateEmailError(Exception):
+    """
+    Raised when an email address is already registered to another user.
+    """
+
 
 class UserRepository:
     """
     Repository for managing User entities.
+
+    Writes read the user they change straight from the store, under its
+    lock, never from the cache, which may lag behind a concurrent write.
+
+    Attributes:
+        cache (EntityCache | None): Cache serving `get_user`, if enabled.
     """
 
+    collection = "users"
+
     def __init__(self, data_store):
         """
         Initializes the UserRepository with a data store.
 
         Args:
-            data_store (dict): In-memory data store for users.
+            data_store (StorageBackend): Storage backend holding the users.
         """
         self.data_store = data_store
+        self.cache = None
 
     def create_user(self, user_create: UserCreate) -> User:
         """
@@ -24,12 +44,60 @@ class UserRepository:
 
         Returns:
             User: The created user with a unique ID.
+
+        Raises:
+            DuplicateEmailError: The email address is already registered.
         """
-        user = User(id=self.data_store.user_id_seq, **user_create.model_dump())
-        self.data_store.users[self.data_store.user_id_seq] = user
-        self.data_store.user_id_seq += 1
+        with self.data_store.lock_emails(user_create.email):
+            if self.data_store.find_user_by_email(user_create.email):
+                raise DuplicateEmailError(user_create.email)
+            user = User(id=self.data_store.next_id("user"), **user_create.model_dump())
+            self.data_store.put("users", user)
+            self.data_store.publish("create_user", puts=[("users", user)])
         return user
 
+    def create_users(self, user_creates: list[UserCreate]) -> list[User]:
+        """
+        Creates several users at once.
+
+        The IDs are reserved as one contiguous block and the users are stored
+        in a single backend call. Users whose email address is already
+        registered, or used by an earlier item, are skipped.
+
+        Args:
+            user_creates (list[UserCreate]): Validated data for each new user.
+
+        Returns:
+            list[User | None]: The created users in input order, with None for
+                each skipped item.
+        """
+        emails = [user_create.email for user_create in user_creates]
+        with self.data_store.lock_emails(*emails):
+            claimed = set()
+            accepted = []
+            for user_create in user_creates:
+                key = normalize_email(user_create.email)
+                free = key not in claimed and not self.data_store.find_user_by_email(
+                    user_create.email
+                )
+                claimed.add(key)
+                accepted.append(free)
+            ids = iter(self.data_store.reserve_ids("user", sum(accepted)))
+            # The input is already validated, so skip validating it a second time
+            results = [
+                User.model_construct(id=next(ids), **user_create.model_dump())
+                if free
+                else None
+                for user_create, free in zip(user_creates, accepted, strict=True)
+            ]
+            users = [user for user in results if user is not None]
+            self.data_store.put_many("users", users)
+            self.data_store.publish(
+                "create_users", puts=[("users", user) for user in users]
+            )
+        return results
+
+    @read_through
     def get_user(self, user_id: int) -> User | None:
         """
         Retrieves a user by ID.
@@ -40,26 +108,81 @@ class UserRepository:
         Returns:
             User | None: The user if found, else None.
         """
-        return self.data_store.users.get(user_id)
+        return self.data_store.get("users", user_id)
+
+    def get_user_by_email(self, email: str) -> User | None:
+        """
+        Retrieves a user by email address, ignoring case.
+
+        The lookup goes through the backend's email index, so it takes
+        constant time however many users there are.
+
+        Args:
+            email (str): The email address of the user to retrieve.
+
+        Returns:
+            User | None: The user if found, else None.
+        """
+        return self.data_store.find_user_by_email(email)
 
-    def update_user(self, user_id: int, user_update: UserUpdate) -> User | None:
+    def list_users(
+        self, after: int = 0, limit: int = 100, is_active: bool | None = None
+    ) -> list[User]:
+        """
+        Retrieves a page of users in ID order.
+
+        Args:
+            after (int): Only users with a greater ID are returned.
+            limit (int): Maximum number of users to return.
+            is_active (bool | None): If set, only users with this status.
+
+        Returns:
+            list[User]: Up to `limit` users.
+        """
+        return self.data_store.page("users", after, limit, is_active=is_active)
+
+    def update_user(
+        self,
+        user_id: int,
+        user_update: UserUpdate,
+        versions: Collection[int] | None = None,
+    ) -> User | None:
         """
         Updates an existing user's information.
 
         Args:
             user_id (int): The ID of the user to update.
             user_update (UserUpdate): The new data for the user.
+            versions (Collection[int] | None): If set, the user is only
+                updated while their version is one of these.
 
         Returns:
             User | None: The updated user if found, else None.
+
+        Raises:
+            DuplicateEmailError: The new email address is registered to
+                another user.
+            VersionMismatchError: The user's version is not in `versions`.
         """
-        user = self.get_user(user_id)
-        if user:
-            updated_data = user.model_copy(
-                update=user_update.model_dump(exclude_unset=True)
-            )
-            self.data_store.users[user_id] = updated_data
-            return updated_data
+        emails = [user_update.email] if user_update.email is not None else []
+        with self.data_store.lock_users(user_id), self.data_store.lock_emails(*emails):
+            user = self.data_store.get("users", user_id)
+            if user and versions is not None and user.version not in versions:
+                raise VersionMismatchError(user.version)
+            if user and emails:
+                owner = self.data_store.find_user_by_email(user_update.email)
+                if owner and owner.id != user_id:
+                    raise DuplicateEmailError(user_update.email)
+            if user:
+                updated_data = user.model_copy(
+                    update={
+                        **user_update.model_dump(exclude_unset=True),
+                        "version": user.version + 1,
+                    }
+                )
+                self.data_store.put("users", updated_data)
+                self.data_store.publish("update_user", puts=[("users", updated_data)])
+                return updated_data
         return None
 
     def delete_user(self, user_id: int) -> bool:
@@ -72,10 +195,11 @@ class UserRepository:
         Returns:
             bool: True if deletion was successful, False otherwise.
         """
-        if user_id in self.data_store.users:
-            del self.data_store.users[user_id]
-            return True
-        return False
+        with self.data_store.lock_users(user_id):
+            deleted = self.data_store.delete("users", user_id)
+            if deleted:
+                self.data_store.publish("delete_user", deletes=[("users", user_id)])
+        return deleted
 
     def deactivate_user(self, user_id: int) -> User | None:
         """
@@ -87,9 +211,12 @@ class UserRepository:
         Returns:
             User | None: The deactivated user if found and active, else None.
         """
-        user = self.get_user(user_id)
-        if user and user.is_active:
-            user.is_active = False
-            self.data_store.users[user_id] = user
-            return user
+        with self.data_store.lock_users(user_id):
+            user = self.data_store.get("users", user_id)
+            if user and user.is_active:
+                user.is_active = False
+                user.version += 1
+                self.data_store.put("users", user)
+                self.data_store.publish("deactivate_user", puts=[("users", user)])
+                return user
         return None
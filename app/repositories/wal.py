@@ -0,0 +1,371 @@
+import json
+import os
+import threading
+from pathlib import Path
+
+from pydantic import ValidationError
+
+from .mutations import COLLECTION_MODELS, COLLECTION_SEQUENCES, Mutation
+
+try:
+    import fcntl
+except ImportError:  # Windows has no flock
+    fcntl = None
+
+LOCK_FILE = "LOCK"
+SNAPSHOT_FILE = "snapshot.jsonl"
+SEGMENT_PREFIX = "wal-"
+SEGMENT_SUFFIX = ".log"
+
+
+def encode_mutation(mutation: Mutation) -> str:
+    """
+    Serializes a mutation as a single line of JSON.
+
+    Args:
+        mutation (Mutation): The mutation to serialize.
+
+    Returns:
+        str: The JSON document, without a trailing newline.
+    """
+    return json.dumps(
+        {
+            "op": mutation.op,
+            "puts": [
+                [collection, entity.model_dump(mode="json")]
+                for collection, entity in mutation.puts
+            ],
+            "deletes": [list(delete) for delete in mutation.deletes],
+        },
+        separators=(",", ":"),
+    )
+
+
+def decode_mutation(payload: str) -> Mutation:
+    """
+    Parses a mutation serialized by `encode_mutation`.
+
+    Args:
+        payload (str): The JSON document.
+
+    Returns:
+        Mutation: The mutation, with entities rebuilt as models.
+    """
+    data = json.loads(payload)
+    return Mutation(
+        data["op"],
+        tuple(
+            (collection, COLLECTION_MODELS[collection].model_validate(entity))
+            for collection, entity in data["puts"]
+        ),
+        tuple((collection, entity_id) for collection, entity_id in data["deletes"]),
+    )
+
+
+def _fsync_directory(directory: Path):
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class WriteAheadLog:
+    """
+    Append-only log of every mutation made through the repositories.
+
+    Each mutation is appended as a `<lsn>\\t<json>` line holding the new state
+    of the entities it touched, so replaying the log is idempotent. Writes are
+    made durable by group commit: `append` returns only once an fsync covers
+    its mutation, so an acknowledged write survives a crash. The first
+    appender to find no fsync in flight leads the next one: it waits up to
+    `fsync_interval` seconds, or until `fsync_batch` mutations are pending,
+    for concurrent appenders to join, then fsyncs them all at once while they
+    wait for it.
+
+    Every `snapshot_every` mutations the whole store is written to a snapshot
+    and the log segments it covers are deleted, so recovery only replays the
+    log tail written after the latest snapshot.
+    """
+
+    def __init__(
+        self,
+        data_store,
+        directory: str | os.PathLike,
+        fsync_interval: float = 0.01,
+        fsync_batch: int = 512,
+        snapshot_every: int = 100_000,
+    ):
+        """
+        Initializes the log. Call `open` to recover and start logging.
+
+        Args:
+            data_store (DataStore): The store to recover into and log from.
+            directory (str | os.PathLike): Directory for log segments and
+                snapshots; created if missing.
+            fsync_interval (float): Seconds a group commit waits for more
+                mutations to join it. 0 fsyncs at once; mutations appended
+                during an fsync still share the next one.
+            fsync_batch (int): Pending mutations that start a group commit
+                before the interval elapses.
+            snapshot_every (int): Mutations between snapshots; 0 disables
+                automatic snapshots.
+        """
+        self.data_store = data_store
+        self.directory = Path(directory)
+        self.fsync_interval = fsync_interval
+        self.fsync_batch = fsync_batch
+        self.snapshot_every = snapshot_every
+        self.lsn = 0
+        self._file = None
+        self._lock_file = None
+        self._pending = 0
+        self._since_snapshot = 0
+        self._synced_lsn = 0
+        self._syncing = False
+        # _lock guards the LSN and appends; _sync_lock keeps a segment open
+        # while it is being fsynced outside of _lock; _committed guards the
+        # durable LSN and the group commit in flight
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._committed = threading.Condition()
+        self._batch_full = threading.Event()
+        self._snapshot_lock = threading.Lock()
+        self._snapshot_requested = threading.Event()
+        self._closed = threading.Event()
+        self._threads = []
+
+    def open(self):
+        """
+        Rebuilds the data store from disk and starts logging its mutations.
+
+        Raises:
+            RuntimeError: Another process already logs to the directory, e.g.
+                another worker of the same server.
+        """
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._acquire_directory()
+        self.lsn = self._synced_lsn = self.recover()
+        self._open_segment()
+        self.data_store.listeners.append(self.append)
+        # Every mutation now writes to the log, waits for a group commit,
+        # and must stay off the event loop
+        self.data_store.blocking = True
+        if self.snapshot_every > 0:
+            self._start_thread(self._snapshot_loop)
+
+    def close(self):
+        """
+        Stops logging and makes every appended mutation durable.
+        """
+        if self.append in self.data_store.listeners:
+            self.data_store.listeners.remove(self.append)
+        self.data_store.blocking = False
+        self._closed.set()
+        self._snapshot_requested.set()
+        for thread in self._threads:
+            thread.join()
+        self._threads.clear()
+        self.sync()
+        with self._sync_lock, self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
+
+    def recover(self) -> int:
+        """
+        Loads the latest snapshot and replays the log written after it.
+
+        Returns:
+            int: The LSN of the last mutation recovered.
+        """
+        snapshot_lsn = self._load_snapshot()
+        lsn = snapshot_lsn
+        for _, path in self._segments():
+            with path.open("r+b") as segment:
+                offset = 0
+                for line in segment:
+                    try:
+                        if not line.endswith(b"\n"):
+                            raise ValueError("incomplete entry")
+                        entry_lsn, payload = line.decode("utf-8").split("\t", 1)
+                        entry_lsn = int(entry_lsn)
+                        mutation = decode_mutation(payload)
+                    except (ValueError, KeyError, ValidationError):
+                        # Drop a write torn by a crash so new entries
+                        # never get appended to a partial line
+                        segment.truncate(offset)
+                        break
+                    offset += len(line)
+                    if entry_lsn > snapshot_lsn:
+                        self.data_store.apply(mutation)
+                        lsn = max(lsn, entry_lsn)
+        return lsn
+
+    def append(self, mutation: Mutation):
+        """
+        Appends a mutation to the log and waits until it is durable.
+
+        Args:
+            mutation (Mutation): The mutation to log.
+        """
+        payload = encode_mutation(mutation)
+        with self._lock:
+            self.lsn += 1
+            lsn = self.lsn
+            self._file.write(f"{lsn}\t{payload}\n")
+            self._pending += 1
+            self._since_snapshot += 1
+            if self._pending >= self.fsync_batch:
+                self._batch_full.set()
+            if 0 < self.snapshot_every <= self._since_snapshot:
+                self._snapshot_requested.set()
+        self._commit(lsn)
+
+    def sync(self):
+        """
+        Flushes and fsyncs every mutation appended so far.
+        """
+        with self._sync_lock:
+            with self._lock:
+                if not self._pending or self._file is None:
+                    return
+                self._file.flush()
+                self._pending = 0
+                self._batch_full.clear()
+                lsn = self.lsn
+            os.fsync(self._file.fileno())
+            self._mark_synced(lsn)
+
+    def snapshot(self) -> int:
+        """
+        Writes a snapshot of the data store and deletes the log it covers.
+
+        The log is rolled over to a new segment first. Entities are copied
+        while writers keep running, so the snapshot may already contain some
+        mutations logged after the rollover; replaying those again on recovery
+        is harmless because log entries hold complete entity states.
+
+        Returns:
+            int: The LSN the snapshot covers.
+        """
+        with self._snapshot_lock:
+            lsn = self._roll_over()
+            data_store = self.data_store
+            header = {
+                "lsn": lsn,
+                "sequences": {
+                    collection: getattr(data_store, f"{sequence}_id_seq")
+                    for collection, sequence in COLLECTION_SEQUENCES.items()
+                },
+            }
+            temporary = self.directory / f"{SNAPSHOT_FILE}.tmp"
+            with temporary.open("w", encoding="utf-8") as snapshot:
+                snapshot.write(json.dumps(header) + "\n")
+                for collection in COLLECTION_MODELS:
+                    for entity in data_store.scan(collection):
+                        snapshot.write(f'["{collection}",{entity.model_dump_json()}]\n')
+                snapshot.flush()
+                os.fsync(snapshot.fileno())
+            os.replace(temporary, self.directory / SNAPSHOT_FILE)
+            _fsync_directory(self.directory)
+            for first_lsn, path in self._segments():
+                if first_lsn <= lsn:
+                    path.unlink()
+            return lsn
+
+    def _acquire_directory(self):
+        # Two processes appending to the same log would corrupt it, and their
+        # in-memory stores would diverge anyway
+        if fcntl is None:
+            return
+        lock_file = (self.directory / LOCK_FILE).open("a")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock_file.close()
+            raise RuntimeError(
+                f"{self.directory} is in use by another process; the memory "
+                "backend cannot be shared between workers, use the sqlite "
+                "backend instead"
+            ) from None
+        self._lock_file = lock_file
+
+    def _load_snapshot(self) -> int:
+        path = self.directory / SNAPSHOT_FILE
+        if not path.exists():
+            return 0
+        with path.open(encoding="utf-8") as snapshot:
+            header = json.loads(snapshot.readline())
+            for line in snapshot:
+                collection, entity = json.loads(line)
+                model = COLLECTION_MODELS[collection].model_validate(entity)
+                self.data_store.apply(Mutation("snapshot", puts=((collection, model),)))
+        for collection, next_id in header["sequences"].items():
+            self.data_store.advance_sequence(collection, next_id - 1)
+        return header["lsn"]
+
+    def _segments(self) -> list[tuple[int, Path]]:
+        segments = []
+        for path in self.directory.glob(f"{SEGMENT_PREFIX}*{SEGMENT_SUFFIX}"):
+            first_lsn = path.name[len(SEGMENT_PREFIX) : -len(SEGMENT_SUFFIX)]
+            segments.append((int(first_lsn), path))
+        return sorted(segments)
+
+    def _open_segment(self):
+        name = f"{SEGMENT_PREFIX}{self.lsn + 1:020d}{SEGMENT_SUFFIX}"
+        self._file = (self.directory / name).open("a", encoding="utf-8")
+        _fsync_directory(self.directory)
+
+    def _roll_over(self) -> int:
+        with self._sync_lock, self._lock:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._file.close()
+            self._pending = 0
+            self._batch_full.clear()
+            self._since_snapshot = 0
+            self._mark_synced(self.lsn)
+            self._open_segment()
+            return self.lsn
+
+    def _commit(self, lsn: int):
+        # Followers wait for the group commit in flight; if it did not cover
+        # their mutation, one of them leads the next
+        with self._committed:
+            while self._synced_lsn < lsn and self._syncing:
+                self._committed.wait()
+            if self._synced_lsn >= lsn:
+                return
+            self._syncing = True
+        try:
+            if self.fsync_interval > 0:
+                self._batch_full.wait(self.fsync_interval)
+            self.sync()
+        finally:
+            with self._committed:
+                self._syncing = False
+                self._committed.notify_all()
+
+    def _mark_synced(self, lsn: int):
+        with self._committed:
+            if lsn > self._synced_lsn:
+                self._synced_lsn = lsn
+                self._committed.notify_all()
+
+    def _start_thread(self, target):
+        thread = threading.Thread(target=target, name=f"wal-{target.__name__}")
+        thread.daemon = True
+        thread.start()
+        self._threads.append(thread)
+
+    def _snapshot_loop(self):
+        while not self._closed.is_set():
+            self._snapshot_requested.wait()
+            self._snapshot_requested.clear()
+            if self._closed.is_set():
+                return
+            self.snapshot()
@@ -1,14 +1,28 @@
-from fastapi import APIRouter, HTTPException, status
-
-from app.models.book import Book, BookCreate, BookUpdate
-from app.repositories import book_repository
+from typing import Annotated
+
+from fastapi import APIRouter, Header, HTTPException, Query, Request, Response, status
+
+from app.models.book import Book, BookCreate, BookUpdate, PopularBook
+from app.models.bulk import BulkResult
+from app.repositories import async_book_repository, book_repository
+from app.repositories.backend import VersionMismatchError
+from app.routes.bulk import bulk_create, bulk_openapi
+from app.routes.conditional import (
+    ETAG_HEADER,
+    conditional_response,
+    expected_versions,
+    precondition_failed,
+    version_tag,
+)
+from app.routes.pagination import Page, set_next_cursor
+from app.routes.responses import FastJSONRoute
 
 # Initialize repository with data_store from app.main
-router = APIRouter(prefix="/books", tags=["Book Endpoints"])
+router = APIRouter(prefix="/books", tags=["Book Endpoints"], route_class=FastJSONRoute)
 
 
 @router.post("/", response_model=Book, status_code=status.HTTP_201_CREATED)
-def create_book(book_create: BookCreate):
+async def create_book(book_create: BookCreate):
     """
     Creates a new book.
 
@@ -21,12 +35,115 @@ def create_book(book_create: BookCreate):
         - 201 Created: Returns the created book.
         - 400 Bad Request: Validation errors.
     """
-    new_book = book_repository.create_book(book_create)
+    new_book = await async_book_repository.create_book(book_create)
     return new_book
 
 
-@router.get("/{book_id}", response_model=Book)
-def get_book(book_id: int):
+@router.post("/bulk", response_model=BulkResult, openapi_extra=bulk_openapi(BookCreate))
+async def bulk_create_books(request: Request):
+    """
+    Creates many books in one request.
+
+    **Endpoint:** POST /books/bulk
+
+    **Parameters:**
+        - body: A JSON array of BookCreate objects, or one BookCreate per line
+          with an `application/x-ndjson` content type.
+
+    **Responses:**
+        - 200 OK: Returns the outcome of each item; valid items are created
+          even when others fail validation.
+        - 400 Bad Request: The body is not a JSON array or NDJSON stream.
+        - 413 Content Too Large: Too many items.
+    """
+    return await bulk_create(request, BookCreate, book_repository.create_books)
+
+
+@router.get("/", response_model=list[Book])
+async def list_books(
+    response: Response,
+    page: Page,
+    is_available: bool | None = None,
+):
+    """
+    Lists books in ID order, one page at a time.
+
+    **Endpoint:** GET /books/
+
+    **Parameters:**
+        - limit (int): Maximum number of books to return (1-1000, default 100).
+        - after (str | None): Cursor taken from the previous page's `X-Next-Cursor` header.
+        - is_available (bool | None): Only return books with this availability.
+
+    **Responses:**
+        - 200 OK: Returns a page of books. `X-Next-Cursor` is set when more may follow.
+        - 400 Bad Request: Invalid cursor.
+    """
+    books_page = await async_book_repository.list_books(
+        page.after, page.limit, is_available
+    )
+    set_next_cursor(response, books_page, page)
+    return books_page
+
+
+@router.get("/search", response_model=list[Book])
+async def search_books(
+    q: Annotated[str, Query(min_length=1, max_length=200)],
+    limit: Annotated[int, Query(ge=1, le=100)] = 20,
+):
+    """
+    Searches books by title and author.
+
+    **Endpoint:** GET /books/search
+
+    **Parameters:**
+        - q (str): Words to look for; the last word also matches as a prefix.
+        - limit (int): Maximum number of books to return (1-100, default 20).
+
+    **Responses:**
+        - 200 OK: Returns the books matching every word, best match first.
+    """
+    return await async_book_repository.search_books(q, limit)
+
+
+@router.get("/popular", response_model=list[PopularBook])
+async def get_popular_books(
+    window: Annotated[str, Query(pattern=r"^\d+d$")] = "7d",
+    k: Annotated[int, Query(ge=1, le=100)] = 20,
+):
+    """
+    Lists the books borrowed most often recently, e.g. "most borrowed this week".
+
+    **Endpoint:** GET /books/popular
+
+    **Parameters:**
+        - window (str): Number of days to rank over, ending today, such as
+          `7d` (1d-30d, default 7d).
+        - k (int): Maximum number of books to return (1-100, default 20).
+
+    **Responses:**
+        - 200 OK: Returns the most borrowed books and their loan counts,
+          most loans first.
+        - 422 Unprocessable Entity: Invalid window.
+    """
+    try:
+        return await async_book_repository.get_popular_books(int(window[:-1]), k)
+    except ValueError as error:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(error)
+        ) from None
+
+
+@router.get(
+    "/{book_id}",
+    response_model=Book,
+    responses={status.HTTP_304_NOT_MODIFIED: {"description": "Not Modified"}},
+)
+async def get_book(
+    book_id: int,
+    response: Response,
+    if_none_match: Annotated[str | None, Header()] = None,
+):
     """
     Retrieves a book by ID.
 
@@ -34,21 +151,28 @@ def get_book(book_id: int):
 
     **Parameters:**
         - book_id (int): The ID of the book to retrieve.
+        - If-None-Match (header): ETags of versions the client already has.
 
     **Responses:**
-        - 200 OK: Returns the book data.
+        - 200 OK: Returns the book data, with its `ETag`.
+        - 304 Not Modified: The client's version is current.
         - 404 Not Found: Book does not exist.
     """
-    book = book_repository.get_book(book_id)
+    book = await async_book_repository.get_book(book_id)
     if not book:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Book not found"
         )
-    return book
+    return conditional_response(response, book, if_none_match)
 
 
 @router.put("/{book_id}", response_model=Book)
-def update_book(book_id: int, book_update: BookUpdate):
+async def update_book(
+    book_id: int,
+    book_update: BookUpdate,
+    response: Response,
+    if_match: Annotated[str | None, Header()] = None,
+):
     """
     Updates an existing book's information.
 
@@ -57,23 +181,34 @@ def update_book(book_id: int, book_update: BookUpdate):
     **Parameters:**
         - book_id (int): The ID of the book to update.
         - book_update (BookUpdate): The new data for the book.
+        - If-Match (header): ETag of the version the update is based on; the
+          update is refused if the book has changed since.
 
     **Responses:**
-        - 200 OK: Returns the updated book.
+        - 200 OK: Returns the updated book, with its new `ETag`.
         - 404 Not Found: Book does not exist.
+        - 412 Precondition Failed: The book has changed since the `If-Match`
+          version.
     """
-    updated_book = book_repository.update_book(book_id, book_update)
+    versions = expected_versions(if_match)
+    try:
+        updated_book = await async_book_repository.update_book(
+            book_id, book_update, versions
+        )
+    except VersionMismatchError as error:
+        raise precondition_failed("Book has been modified", error.version) from None
     if not updated_book:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Book not found"
         )
+    response.headers[ETAG_HEADER] = version_tag(updated_book.version)
     return updated_book
 
 
 @router.delete("/{book_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_book(book_id: int):
+async def delete_book(book_id: int):
     """
-    Deletes a book from the system.
+    Deletes a book from the system, cancelling the reservations waiting for it.
 
     **Endpoint:** DELETE /books/{book_id}
 
@@ -84,7 +219,7 @@ def delete_book(book_id: int):
         - 204 No Content: Book successfully deleted.
         - 404 Not Found: Book does not exist.
     """
-    success = book_repository.delete_book(book_id)
+    success = await async_book_repository.delete_book(book_id)
     if not success:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Book not found"
@@ -93,7 +228,7 @@ def delete_book(book_id: int):
 
 
 @router.patch("/{book_id}/mark_unavailable", response_model=Book)
-def mark_book_unavailable(book_id: int):
+async def mark_book_unavailable(book_id: int):
     """
     Marks a book as unavailable.
 
@@ -107,7 +242,7 @@ def mark_book_unavailable(book_id: int):
         - 400 Bad Request: Book already unavailable.
         - 404 Not Found: Book does not exist.
     """
-    book = book_repository.mark_book_unavailable(book_id)
+    book = await async_book_repository.mark_book_unavailable(book_id)
     if not book:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -117,9 +252,10 @@ def mark_book_unavailable(book_id: int):
 
 
 @router.patch("/{book_id}/mark_available", response_model=Book)
-def mark_book_available(book_id: int):
+async def mark_book_available(book_id: int):
     """
-    Marks a book as available.
+    Marks a book as available. If users are waiting for it, the book is lent
+    to the first of them instead and stays unavailable.
 
     **Endpoint:** PATCH /books/{book_id}/mark_available
 
@@ -131,7 +267,7 @@ def mark_book_available(book_id: int):
         - 400 Bad Request: Book already available.
         - 404 Not Found: Book does not exist.
     """
-    book = book_repository.mark_book_available(book_id)
+    book = await async_book_repository.mark_book_available(book_id)
     if not book:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
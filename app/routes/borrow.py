@@ -1,14 +1,83 @@
-from fastapi import APIRouter, HTTPException, status
+from datetime import date
+from typing import Annotated, Literal
 
-from app.models.borrow import BorrowRecord, BorrowRecordCreate
-from app.repositories import book_repository, borrow_repository, user_repository
+from fastapi import APIRouter, HTTPException, Query, Response, status
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from app.models.borrow import (
+    BorrowBatchCreate,
+    BorrowBatchItemResult,
+    BorrowBatchResult,
+    BorrowRecord,
+    BorrowRecordCreate,
+    ReturnBatch,
+)
+from app.repositories import (
+    async_book_repository,
+    async_borrow_repository,
+    async_user_repository,
+    borrow_repository,
+)
+from app.repositories.borrow import BorrowError, LoanLimitError
+from app.routes.export import EXPORT_MEDIA_TYPES, export_chunks
+from app.routes.pagination import Page, set_next_cursor
+from app.routes.responses import FastJSONRoute
 
 # Initialize repositories with data_store from app.main
-router = APIRouter(prefix="/borrow", tags=["Borrow Operations"])
+router = APIRouter(
+    prefix="/borrow", tags=["Borrow Operations"], route_class=FastJSONRoute
+)
+
+# Status returned for each batch item failure, matching the single-item routes
+BATCH_ERROR_STATUS = {
+    BorrowError.USER_NOT_FOUND: status.HTTP_404_NOT_FOUND,
+    BorrowError.USER_INACTIVE: status.HTTP_400_BAD_REQUEST,
+    BorrowError.ALREADY_BORROWED: status.HTTP_409_CONFLICT,
+    BorrowError.BOOK_NOT_FOUND: status.HTTP_404_NOT_FOUND,
+    BorrowError.BOOK_UNAVAILABLE: status.HTTP_400_BAD_REQUEST,
+    BorrowError.LOAN_LIMIT_REACHED: status.HTTP_409_CONFLICT,
+    BorrowError.CANNOT_RETURN: status.HTTP_400_BAD_REQUEST,
+    BorrowError.DUPLICATE: status.HTTP_409_CONFLICT,
+    BorrowError.BATCH_ABORTED: status.HTTP_424_FAILED_DEPENDENCY,
+}
+
+
+def batch_response(outcomes: list, success_status: int, atomic: bool):
+    """
+    Builds the response of a batch borrow or return.
+
+    Args:
+        outcomes (list): Borrow records or BorrowErrors, one per item.
+        success_status (int): Status reported for applied items.
+        atomic (bool): Whether the batch was all-or-nothing.
+
+    Returns:
+        BorrowBatchResult | JSONResponse: The result, sent with 409 Conflict
+            when an atomic batch was rejected.
+    """
+    items = [
+        BorrowBatchItemResult(
+            index=index, status_code=BATCH_ERROR_STATUS[outcome], detail=outcome
+        )
+        if isinstance(outcome, BorrowError)
+        else BorrowBatchItemResult(
+            index=index, status_code=success_status, record=outcome
+        )
+        for index, outcome in enumerate(outcomes)
+    ]
+    failed = sum(item.record is None for item in items)
+    result = BorrowBatchResult(
+        succeeded=len(items) - failed, failed=failed, items=items
+    )
+    if atomic and failed:
+        return JSONResponse(
+            status_code=status.HTTP_409_CONFLICT, content=result.model_dump(mode="json")
+        )
+    return result
 
 
 @router.post("/", response_model=BorrowRecord, status_code=status.HTTP_201_CREATED)
-def borrow_book(borrow_data: BorrowRecordCreate):
+async def borrow_book(borrow_data: BorrowRecordCreate):
     """
     Allows an active user to borrow an available book.
 
@@ -21,10 +90,11 @@ def borrow_book(borrow_data: BorrowRecordCreate):
         - 201 Created: Book successfully borrowed.
         - 400 Bad Request: User is inactive or book is unavailable.
         - 404 Not Found: User or book does not exist.
-        - 409 Conflict: Book already borrowed by the user.
+        - 409 Conflict: Book already borrowed by the user, or the user holds
+          the maximum number of books.
     """
     # Validate user existence and status
-    user = user_repository.get_user(borrow_data.user_id)
+    user = await async_user_repository.get_user(borrow_data.user_id)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="User not found"
@@ -34,8 +104,18 @@ def borrow_book(borrow_data: BorrowRecordCreate):
             status_code=status.HTTP_400_BAD_REQUEST, detail="User is inactive"
         )
 
+    # Check the loan limit against the user's active-loan counter
+    limit = borrow_repository.max_active_loans
+    if limit is not None:
+        loans = await async_borrow_repository.count_active_loans(borrow_data.user_id)
+        if loans >= limit:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="User has reached the maximum number of loans",
+            )
+
     # Check if the user has already borrowed the book and hasn't returned it
-    existing_borrow = borrow_repository.get_active_borrow_record(
+    existing_borrow = await async_borrow_repository.get_active_borrow_record(
         borrow_data.user_id, borrow_data.book_id
     )
     if existing_borrow:
@@ -45,7 +125,7 @@ def borrow_book(borrow_data: BorrowRecordCreate):
         )
 
     # Validate book existence
-    book = book_repository.get_book(borrow_data.book_id)
+    book = await async_book_repository.get_book(borrow_data.book_id)
     if not book:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Book not found"
@@ -58,15 +138,69 @@ def borrow_book(borrow_data: BorrowRecordCreate):
             detail="Book is not available for borrowing",
         )
 
-    # Proceed with borrowing the book
-    borrow_record = borrow_repository.borrow_book(
-        borrow_data.user_id, borrow_data.book_id
-    )
+    # Proceed with borrowing the book; the checks above may have been
+    # overtaken by a concurrent request, so the repository re-checks atomically
+    try:
+        borrow_record = await async_borrow_repository.borrow_book(
+            borrow_data.user_id, borrow_data.book_id
+        )
+    except LoanLimitError:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="User has reached the maximum number of loans",
+        ) from None
+    if not borrow_record:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Book is not available for borrowing",
+        )
     return borrow_record
 
 
+@router.post("/batch", response_model=BorrowBatchResult)
+async def borrow_books(batch: BorrowBatchCreate):
+    """
+    Lends several books in one request, e.g. a stack scanned at the desk.
+
+    **Endpoint:** POST /borrow/batch
+
+    **Parameters:**
+        - batch (BorrowBatchCreate): The `items` to lend and the `atomic` flag.
+
+    **Responses:**
+        - 200 OK: Returns the outcome of each item, with the status the
+          single-item endpoint would have returned.
+        - 409 Conflict: An `atomic` batch had failing items; nothing was lent.
+    """
+    outcomes = await async_borrow_repository.borrow_books(
+        [(item.user_id, item.book_id) for item in batch.items], batch.atomic
+    )
+    return batch_response(outcomes, status.HTTP_201_CREATED, batch.atomic)
+
+
+@router.post("/return/batch", response_model=BorrowBatchResult)
+async def return_books(batch: ReturnBatch):
+    """
+    Returns several borrowed books in one request.
+
+    **Endpoint:** POST /borrow/return/batch
+
+    **Parameters:**
+        - batch (ReturnBatch): The `borrow_ids` to close and the `atomic` flag.
+
+    **Responses:**
+        - 200 OK: Returns the outcome of each item, with the status the
+          single-item endpoint would have returned.
+        - 409 Conflict: An `atomic` batch had failing items; nothing was returned.
+    """
+    outcomes = await async_borrow_repository.return_books(
+        batch.borrow_ids, batch.atomic
+    )
+    return batch_response(outcomes, status.HTTP_200_OK, batch.atomic)
+
+
 @router.post("/return/{borrow_id}", response_model=BorrowRecord)
-def return_book(borrow_id: int):
+async def return_book(borrow_id: int):
     """
     Marks a borrowed book as returned.
 
@@ -80,7 +214,7 @@ def return_book(borrow_id: int):
         - 400 Bad Request: Cannot return book (e.g., already returned).
         - 404 Not Found: Borrow record does not exist.
     """
-    borrow_record = borrow_repository.return_book(borrow_id)
+    borrow_record = await async_borrow_repository.return_book(borrow_id)
     if not borrow_record:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -90,20 +224,95 @@ def return_book(borrow_id: int):
 
 
 @router.get("/records", response_model=list[BorrowRecord])
-def get_all_borrow_records():
+async def get_all_borrow_records(
+    response: Response,
+    page: Page,
+    is_returned: bool | None = None,
+):
     """
-    Retrieves all borrow records.
+    Retrieves borrow records in ID order, one page at a time.
 
     **Endpoint:** GET /borrow/records
 
+    **Parameters:**
+        - limit (int): Maximum number of records to return (1-1000, default 100).
+        - after (str | None): Cursor taken from the previous page's `X-Next-Cursor` header.
+        - is_returned (bool | None): Only return returned (true) or open (false) loans.
+
     **Responses:**
-        - 200 OK: Returns a list of all borrow records.
+        - 200 OK: Returns a page of borrow records. `X-Next-Cursor` is set when more may follow.
+        - 400 Bad Request: Invalid cursor.
+    """
+    records = await async_borrow_repository.list_borrow_records(
+        page.after, page.limit, is_returned
+    )
+    set_next_cursor(response, records, page)
+    return records
+
+
+@router.get("/overdue", response_model=list[BorrowRecord])
+async def get_overdue_borrow_records(
+    limit: Annotated[
+        int, Query(ge=1, le=1000, description="Maximum number of loans.")
+    ] = 100,
+):
     """
-    return borrow_repository.get_all_borrow_records()
+    Retrieves the loans still open after their due date.
+
+    Loans are read from an index of open loans by due date, so the time taken
+    grows with the number of loans returned, not with the borrow history.
+
+    **Endpoint:** GET /borrow/overdue
+
+    **Parameters:**
+        - limit (int): Maximum number of loans to return (1-1000, default 100).
+
+    **Responses:**
+        - 200 OK: Returns the overdue loans, longest overdue first.
+    """
+    return await async_borrow_repository.get_overdue_borrow_records(limit)
+
+
+@router.get(
+    "/records/export",
+    response_class=StreamingResponse,
+    responses={
+        200: {"content": {media_type: {} for media_type in EXPORT_MEDIA_TYPES.values()}}
+    },
+)
+async def export_borrow_records(
+    format: Literal["ndjson", "csv"] = "ndjson",
+    borrowed_from: Annotated[date | None, Query()] = None,
+    borrowed_to: Annotated[date | None, Query()] = None,
+):
+    """
+    Streams the borrow history for offline analysis.
+
+    Records are read and encoded chunk by chunk while the response is sent,
+    so server memory stays flat however long the history is.
+
+    **Endpoint:** GET /borrow/records/export
+
+    **Parameters:**
+        - format (str): `ndjson` (default) or `csv`.
+        - borrowed_from (date | None): Only records borrowed on or after this date.
+        - borrowed_to (date | None): Only records borrowed on or before this date.
+
+    **Responses:**
+        - 200 OK: Streams the matching borrow records in ID order.
+    """
+    records = borrow_repository.iter_borrow_records(borrowed_from, borrowed_to)
+    return StreamingResponse(
+        export_chunks(format, BorrowRecord, records),
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={
+            "Content-Disposition": f'attachment; filename="borrow_records.{format}"'
+        },
+    )
 
 
 @router.get("/records/user/{user_id}", response_model=list[BorrowRecord])
-def get_borrow_records_by_user(user_id: int):
+async def get_borrow_records_by_user(user_id: int):
     """
     Retrieves borrow records for a specific user.
 
@@ -116,9 +325,9 @@ def get_borrow_records_by_user(user_id: int):
         - 200 OK: Returns a list of borrow records for the user.
         - 404 Not Found: User does not exist.
     """
-    user = user_repository.get_user(user_id)
+    user = await async_user_repository.get_user(user_id)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="User not found"
         )
-    return borrow_repository.get_borrow_records_by_user(user_id)
+    return await async_borrow_repository.get_borrow_records_by_user(user_id)
@@ -0,0 +1,170 @@
+import json
+from collections.abc import Callable
+
+from fastapi import HTTPException, Request, status
+from fastapi.concurrency import run_in_threadpool
+from pydantic import BaseModel, TypeAdapter, ValidationError
+
+from app.models.bulk import BulkItemResult, BulkResult
+
+# Largest number of items accepted in one bulk request
+MAX_BULK_ITEMS = 100_000
+
+NDJSON_MEDIA_TYPES = {"application/x-ndjson", "application/ndjson", "application/jsonl"}
+
+
+def bulk_openapi(model: type[BaseModel]) -> dict:
+    """
+    Documents a bulk request body of `model` items for the OpenAPI schema.
+
+    Args:
+        model (type[BaseModel]): The item model.
+
+    Returns:
+        dict: The `openapi_extra` for the route.
+    """
+    reference = {"$ref": f"#/components/schemas/{model.__name__}"}
+    return {
+        "requestBody": {
+            "required": True,
+            "content": {
+                "application/json": {"schema": {"type": "array", "items": reference}},
+                "application/x-ndjson": {"schema": reference},
+            },
+        }
+    }
+
+
+def _too_many_items():
+    return HTTPException(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        detail=f"A bulk request may contain at most {MAX_BULK_ITEMS} items",
+    )
+
+
+async def _read_ndjson(request: Request, items: list, errors: dict):
+    buffer = b""
+    async for chunk in request.stream():
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            _parse_line(line, items, errors)
+    _parse_line(buffer, items, errors)
+
+
+def _parse_line(line: bytes, items: list, errors: dict):
+    if not line.strip():
+        return
+    if len(items) >= MAX_BULK_ITEMS:
+        raise _too_many_items()
+    try:
+        items.append(json.loads(line))
+    except ValueError as exc:
+        errors[len(items)] = [{"type": "json_invalid", "loc": [], "msg": str(exc)}]
+        items.append(None)
+
+
+async def read_bulk_items(request: Request) -> tuple[list, dict[int, list]]:
+    """
+    Reads the items of a bulk request.
+
+    The body is either a JSON array or, with an NDJSON content type, one JSON
+    document per line. NDJSON bodies are parsed as they stream in.
+
+    Args:
+        request (Request): The incoming request.
+
+    Returns:
+        tuple[list, dict[int, list]]: The raw items, and the errors of items
+            that are not valid JSON keyed by their index.
+
+    Raises:
+        HTTPException: 400 if a JSON body is not an array, 413 if there are
+            too many items.
+    """
+    media_type = request.headers.get("content-type", "").split(";")[0].strip()
+    items, errors = [], {}
+    if media_type in NDJSON_MEDIA_TYPES:
+        await _read_ndjson(request, items, errors)
+        return items, errors
+    try:
+        items = json.loads(await request.body())
+    except ValueError:
+        items = None
+    if not isinstance(items, list):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Expected a JSON array or an NDJSON stream",
+        )
+    if len(items) > MAX_BULK_ITEMS:
+        raise _too_many_items()
+    return items, errors
+
+
+def validate_bulk_items(
+    model: type[BaseModel], items: list, errors: dict[int, list]
+) -> tuple[list[int], list[BaseModel]]:
+    """
+    Validates bulk items against a model in one pass.
+
+    All items are validated together; when some fail, the errors are split
+    per item and the remaining items are validated again without them.
+
+    Args:
+        model (type[BaseModel]): The item model.
+        items (list): The raw items.
+        errors (dict[int, list]): Errors by item index; updated in place.
+
+    Returns:
+        tuple[list[int], list[BaseModel]]: The indexes of the valid items and
+            the validated items.
+    """
+    adapter = TypeAdapter(list[model])
+    while True:
+        indexes = [index for index in range(len(items)) if index not in errors]
+        try:
+            return indexes, adapter.validate_python([items[i] for i in indexes])
+        except ValidationError as exc:
+            for error in exc.errors(include_url=False, include_context=False):
+                position, *loc = error["loc"]
+                errors.setdefault(indexes[position], []).append(
+                    {"type": error["type"], "loc": loc, "msg": error["msg"]}
+                )
+
+
+async def bulk_create(
+    request: Request,
+    model: type[BaseModel],
+    create_many: Callable,
+    conflict: str = "Conflicts with an existing entity",
+) -> BulkResult:
+    """
+    Handles a bulk create request end to end.
+
+    Args:
+        request (Request): The incoming request.
+        model (type[BaseModel]): The item model, e.g. BookCreate.
+        create_many (Callable): Repository method creating a list of items.
+            It returns the created entities in input order, with None for
+            items it rejected as conflicting.
+        conflict (str): Error message for the rejected items.
+
+    Returns:
+        BulkResult: The per-item outcome.
+    """
+    items, errors = await read_bulk_items(request)
+    indexes, valid_items = validate_bulk_items(model, items, errors)
+    created = await run_in_threadpool(create_many, valid_items) if valid_items else []
+    results = []
+    for index, entity in zip(indexes, created, strict=True):
+        if entity is None:
+            errors[index] = [{"type": "conflict", "loc": [], "msg": conflict}]
+        else:
+            results.append(BulkItemResult(index=index, id=entity.id))
+    created_count = len(results)
+    results.extend(
+        BulkItemResult(index=index, errors=item_errors)
+        for index, item_errors in errors.items()
+    )
+    results.sort(key=lambda result: result.index)
+    return BulkResult(created=created_count, failed=len(errors), items=results)
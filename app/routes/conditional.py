@@ -0,0 +1,91 @@
+from fastapi import HTTPException, Response, status
+
+ETAG_HEADER = "ETag"
+
+
+def version_tag(version: int) -> str:
+    """
+    Returns the strong ETag of an entity version.
+
+    Args:
+        version (int): The entity's version.
+
+    Returns:
+        str: The quoted entity tag, e.g. `"3"`.
+    """
+    return f'"{version}"'
+
+
+def _parse_tags(header: str) -> list[str]:
+    return [tag.strip() for tag in header.split(",") if tag.strip()]
+
+
+def conditional_response(response: Response, entity, if_none_match: str | None):
+    """
+    Answers a conditional GET for an entity.
+
+    Sets the entity's ETag on the response, or, when the client already
+    holds the current version, returns an empty 304 response so the entity
+    is not serialized at all.
+
+    Args:
+        response (Response): The outgoing response.
+        entity (BaseModel): The requested entity.
+        if_none_match (str | None): The `If-None-Match` request header.
+
+    Returns:
+        BaseModel | Response: The entity, or an empty 304 Not Modified
+            response.
+    """
+    tag = version_tag(entity.version)
+    if if_none_match is not None:
+        # Weak comparison: a W/ prefix does not prevent a match
+        tags = [t.removeprefix("W/") for t in _parse_tags(if_none_match)]
+        if "*" in tags or tag in tags:
+            return Response(
+                status_code=status.HTTP_304_NOT_MODIFIED, headers={ETAG_HEADER: tag}
+            )
+    response.headers[ETAG_HEADER] = tag
+    return entity
+
+
+def expected_versions(if_match: str | None) -> set[int] | None:
+    """
+    Parses the `If-Match` header of an update into the versions it accepts.
+
+    Args:
+        if_match (str | None): The `If-Match` request header.
+
+    Returns:
+        set[int] | None: The versions the entity may have for the update to
+            proceed, or None when any version will do. Weak and unknown
+            tags never match.
+    """
+    if if_match is None:
+        return None
+    tags = _parse_tags(if_match)
+    if "*" in tags:
+        return None
+    return {
+        int(tag[1:-1])
+        for tag in tags
+        if len(tag) > 2 and tag[0] == tag[-1] == '"' and tag[1:-1].isdigit()
+    }
+
+
+def precondition_failed(detail: str, version: int) -> HTTPException:
+    """
+    Builds the 412 error of an update whose `If-Match` did not match.
+
+    Args:
+        detail (str): The error message.
+        version (int): The entity's current version, sent back as its ETag.
+
+    Returns:
+        HTTPException: The error to raise.
+    """
+    return HTTPException(
+        status_code=status.HTTP_412_PRECONDITION_FAILED,
+        detail=detail,
+        headers={ETAG_HEADER: version_tag(version)},
+    )
@@ -0,0 +1,83 @@
+import secrets
+from typing import Annotated
+
+from fastapi import APIRouter, Depends, Header, HTTPException, status
+
+from app.config import settings
+from app.models.profile import ProfileSettings, ProfileSettingsUpdate
+from app.profiling import profiler
+
+
+def require_admin(x_admin_token: Annotated[str | None, Header()] = None):
+    """
+    Lets through only requests carrying the configured admin token.
+
+    Args:
+        x_admin_token (str | None): The `X-Admin-Token` request header.
+
+    Raises:
+        HTTPException: 403 if no admin token is configured or the header
+            does not match it.
+    """
+    expected = settings.admin_token
+    if (
+        expected is None
+        or x_admin_token is None
+        or not secrets.compare_digest(x_admin_token, expected)
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN, detail="Admin token required"
+        )
+
+
+router = APIRouter(
+    prefix="/debug", tags=["Debug"], dependencies=[Depends(require_admin)]
+)
+
+
+@router.get("/profile")
+def get_profile(reset: bool = False):
+    """
+    Retrieves the aggregated profile of the profiled requests.
+
+    **Endpoint:** GET /debug/profile
+
+    **Parameters:**
+        - reset (bool): Whether to clear the collected data after reading it.
+
+    **Responses:**
+        - 200 OK: Returns whether the profiler is enabled and, per route, the
+          request count and timings with the timings of each repository
+          method called, and the sampled stacks of repository calls in
+          folded format.
+        - 403 Forbidden: Missing or wrong `X-Admin-Token` header.
+    """
+    return profiler.dump(reset=reset)
+
+
+@router.put("/profile", response_model=ProfileSettings)
+def update_profile_settings(profile_settings: ProfileSettingsUpdate):
+    """
+    Turns the profiler on or off, or changes the fraction of requests
+    profiled.
+
+    While enabled, requests with an `X-Profile: 1` header are always
+    profiled. Turning the profiler off keeps the data collected so far.
+
+    **Endpoint:** PUT /debug/profile
+
+    **Parameters:**
+        - profile_settings (ProfileSettingsUpdate): Whether the profiler is
+          enabled and the sampling rate; settings left out are unchanged.
+
+    **Responses:**
+        - 200 OK: Returns the applied settings.
+        - 403 Forbidden: Missing or wrong `X-Admin-Token` header.
+    """
+    if profile_settings.sample_rate is not None:
+        profiler.sample_rate = profile_settings.sample_rate
+    if profile_settings.enabled is True:
+        profiler.install()
+    elif profile_settings.enabled is False:
+        profiler.uninstall()
+    return ProfileSettings(enabled=profiler.enabled, sample_rate=profiler.sample_rate)
@@ -0,0 +1,80 @@
+import asyncio
+from collections.abc import AsyncIterator
+from typing import Annotated
+
+from fastapi import APIRouter, Header, Query
+from fastapi.responses import StreamingResponse
+
+from app.events import EventHub, Subscription, event_hub
+
+router = APIRouter(tags=["Events"])
+
+# Seconds of silence after which a comment is sent to keep proxies from
+# closing the connection
+HEARTBEAT_INTERVAL = 15.0
+
+
+async def event_stream(hub: EventHub, subscription: Subscription) -> AsyncIterator[str]:
+    """
+    Yields the server-sent events of a subscription until the client leaves
+    or falls too far behind.
+    """
+    try:
+        for event in subscription.backlog:
+            yield event.encode()
+        while True:
+            try:
+                event = await asyncio.wait_for(
+                    subscription.queue.get(), HEARTBEAT_INTERVAL
+                )
+            except TimeoutError:
+                yield ": keepalive\n\n"
+                continue
+            if event is None:
+                # Dropped as too slow; the client resumes with Last-Event-ID
+                yield "event: overflow\ndata: {}\n\n"
+                return
+            yield event.encode()
+    finally:
+        hub.unsubscribe(subscription)
+
+
+@router.get(
+    "/events",
+    response_class=StreamingResponse,
+    responses={200: {"content": {"text/event-stream": {}}}},
+)
+async def stream_events(
+    last_event_id: Annotated[int | None, Header()] = None,
+    after: Annotated[int | None, Query(ge=0)] = None,
+):
+    """
+    Streams changes to books, borrow records and reservations as
+    server-sent events.
+
+    Each event is named after the operation that made the change and carries
+    the new state of the entities it touched, or the IDs of those deleted.
+    Event IDs are sequence numbers, so a reconnecting client resumes where it
+    left off. When a client cannot be resumed, because the events it missed
+    are no longer kept or the server restarted, a `reset` event tells it to
+    reload its state. A client that falls too far behind receives an
+    `overflow` event and is disconnected, and should reconnect.
+
+    **Endpoint:** GET /events
+
+    **Parameters:**
+        - Last-Event-ID (header): ID of the last event received, sent by
+          browsers when they reconnect.
+        - after (int | None): Same as `Last-Event-ID`, for clients that
+          cannot set headers.
+
+    **Responses:**
+        - 200 OK: An endless `text/event-stream`.
+    """
+    last_seq = last_event_id if last_event_id is not None else after
+    subscription = await event_hub.subscribe(last_seq)
+    return StreamingResponse(
+        event_stream(event_hub, subscription),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -0,0 +1,70 @@
+import csv
+import io
+from collections.abc import Iterable, Iterator
+from itertools import batched
+
+from pydantic import BaseModel
+
+# Number of entities encoded per chunk of a streamed export
+EXPORT_CHUNK_SIZE = 1000
+
+EXPORT_MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+
+def ndjson_chunks(entities: Iterable[BaseModel]) -> Iterator[str]:
+    """
+    Encodes entities as NDJSON, one chunk of lines at a time.
+
+    Args:
+        entities (Iterable[BaseModel]): The entities to encode.
+
+    Yields:
+        str: Chunks of newline-terminated JSON documents.
+    """
+    for chunk in batched(entities, EXPORT_CHUNK_SIZE):
+        yield "".join(f"{entity.model_dump_json()}\n" for entity in chunk)
+
+
+def csv_chunks(model: type[BaseModel], entities: Iterable[BaseModel]) -> Iterator[str]:
+    """
+    Encodes entities as CSV with a header row, one chunk of rows at a time.
+
+    Args:
+        model (type[BaseModel]): The entity model; its fields are the columns, id first.
+        entities (Iterable[BaseModel]): The entities to encode.
+
+    Yields:
+        str: Chunks of CSV rows; empty values stand for None.
+    """
+    columns = ["id", *(field for field in model.model_fields if field != "id")]
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for chunk in batched(entities, EXPORT_CHUNK_SIZE):
+        for entity in chunk:
+            data = entity.model_dump(mode="json")
+            writer.writerow(data[column] for column in columns)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def export_chunks(
+    export_format: str, model: type[BaseModel], entities: Iterable[BaseModel]
+) -> Iterator[str]:
+    """
+    Encodes entities in the requested export format.
+
+    Args:
+        export_format (str): "ndjson" or "csv".
+        model (type[BaseModel]): The entity model.
+        entities (Iterable[BaseModel]): The entities to encode.
+
+    Returns:
+        Iterator[str]: The encoded chunks.
+    """
+    if export_format == "csv":
+        return csv_chunks(model, entities)
+    return ndjson_chunks(entities)
@@ -0,0 +1,70 @@
+from fastapi import APIRouter, Response
+
+from app import repositories
+from app.metrics import CONTENT_TYPE, counter, gauge, request_metrics
+
+router = APIRouter(tags=["Monitoring"])
+
+
+@router.get("/metrics", response_class=Response)
+def metrics():
+    """
+    Exposes request and storage metrics in the Prometheus text format.
+
+    **Endpoint:** GET /metrics
+
+    **Responses:**
+        - 200 OK: Returns per-route request counts and latency histograms,
+          the number of stored users, books and borrow records, and the
+          number of active loans, and the hits, misses, evictions and
+          size of each enabled repository cache.
+    """
+    store = repositories.data_store
+    lines = request_metrics.render()
+    lines += gauge(
+        "elib_store_entities",
+        "Number of stored entities.",
+        [
+            ({"collection": collection}, store.count(collection))
+            for collection in ("users", "books", "borrow_records")
+        ],
+    )
+    lines += gauge(
+        "elib_active_loans",
+        "Number of books currently borrowed.",
+        [({}, store.count("borrow_records", is_returned=False))],
+    )
+    caches = [
+        repository.cache
+        for repository in (repositories.book_repository, repositories.user_repository)
+        if repository.cache is not None
+    ]
+    if caches:
+        lines += counter(
+            "elib_cache_requests_total",
+            "Lookups by ID through a repository cache, by result.",
+            [
+                ({"collection": cache.collection, "result": result}, value)
+                for cache in caches
+                for result, value in (("hit", cache.hits), ("miss", cache.misses))
+            ],
+        )
+        lines += counter(
+            "elib_cache_evictions_total",
+            "Entities evicted from a repository cache to make room.",
+            [({"collection": cache.collection}, cache.evictions) for cache in caches],
+        )
+        lines += counter(
+            "elib_cache_invalidations_total",
+            "Cached entities dropped because they were changed.",
+            [
+                ({"collection": cache.collection}, cache.invalidations)
+                for cache in caches
+            ],
+        )
+        lines += gauge(
+            "elib_cache_entries",
+            "Number of entities held by a repository cache.",
+            [({"collection": cache.collection}, len(cache)) for cache in caches],
+        )
+    return Response("\n".join(lines) + "\n", media_type=CONTENT_TYPE)
@@ -0,0 +1,104 @@
+import base64
+import binascii
+from dataclasses import dataclass
+from typing import Annotated
+
+from fastapi import Depends, HTTPException, Query, Response, status
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+# Largest entity ID a cursor may hold, that of a signed 64-bit integer as
+# stored by SQLite
+MAX_CURSOR_ID = 2**63 - 1
+
+
+@dataclass(frozen=True)
+class PageParams:
+    """
+    Pagination parameters shared by the list endpoints.
+
+    Attributes:
+        after (int): ID of the last entity on the previous page, 0 for the first.
+        limit (int): Maximum number of entities on the page.
+    """
+
+    after: int
+    limit: int
+
+
+def encode_cursor(entity_id: int) -> str:
+    """
+    Encodes an entity ID as an opaque cursor.
+
+    Args:
+        entity_id (int): ID of the last entity on a page.
+
+    Returns:
+        str: The URL-safe cursor.
+    """
+    return base64.urlsafe_b64encode(str(entity_id).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> int:
+    """
+    Decodes an opaque cursor back into an entity ID.
+
+    Args:
+        cursor (str): A cursor produced by `encode_cursor`.
+
+    Returns:
+        int: The entity ID the cursor points at.
+
+    Raises:
+        ValueError: If the cursor is malformed, is not the canonical decimal
+            form of an ID, or is out of range.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+    except binascii.Error as exc:
+        raise ValueError(cursor) from exc
+    # ASCII digits only: int() would also take signs, spaces and underscores
+    if not raw.isdigit():
+        raise ValueError(cursor)
+    entity_id = int(raw)
+    if entity_id > MAX_CURSOR_ID:
+        raise ValueError(cursor)
+    return entity_id
+
+
+async def page_params(
+    limit: Annotated[int, Query(ge=1, le=1000, description="Maximum page size.")] = 100,
+    after: Annotated[
+        str | None, Query(description="Cursor from the previous page.")
+    ] = None,
+) -> PageParams:
+    """
+    Parses the `limit` and `after` query parameters.
+
+    Raises:
+        HTTPException: 400 if the cursor is invalid.
+    """
+    if after is None:
+        return PageParams(after=0, limit=limit)
+    try:
+        return PageParams(after=decode_cursor(after), limit=limit)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor"
+        ) from None
+
+
+Page = Annotated[PageParams, Depends(page_params)]
+
+
+def set_next_cursor(response: Response, page: list, params: PageParams):
+    """
+    Sets the `X-Next-Cursor` header when more entities may follow the page.
+
+    Args:
+        response (Response): The outgoing response.
+        page (list): The entities on the current page.
+        params (PageParams): The parameters the page was fetched with.
+    """
+    if len(page) == params.limit:
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(page[-1].id)
@@ -0,0 +1,149 @@
+from typing import Annotated
+
+from fastapi import APIRouter, HTTPException, Query, status
+
+from app.models.reservation import Reservation, ReservationCreate
+from app.repositories import reservation_repository
+from app.repositories.reservation import ReservationError
+from app.routes.responses import FastJSONRoute
+
+router = APIRouter(
+    prefix="/reservations", tags=["Reservations"], route_class=FastJSONRoute
+)
+
+# Status returned for each reason a reservation is refused
+ERROR_STATUS = {
+    ReservationError.USER_NOT_FOUND: status.HTTP_404_NOT_FOUND,
+    ReservationError.USER_INACTIVE: status.HTTP_400_BAD_REQUEST,
+    ReservationError.BOOK_NOT_FOUND: status.HTTP_404_NOT_FOUND,
+    ReservationError.BOOK_AVAILABLE: status.HTTP_409_CONFLICT,
+    ReservationError.ALREADY_BORROWED: status.HTTP_409_CONFLICT,
+    ReservationError.ALREADY_RESERVED: status.HTTP_409_CONFLICT,
+    ReservationError.NOT_WAITING: status.HTTP_409_CONFLICT,
+}
+
+
+@router.post("/", response_model=Reservation, status_code=status.HTTP_201_CREATED)
+def reserve_book(reservation_create: ReservationCreate):
+    """
+    Puts an active user on the waitlist of a book that is lent out.
+
+    When the book is returned it is lent straight to the first user waiting,
+    which settles their reservation as `fulfilled` with the new `borrow_id`.
+
+    **Endpoint:** POST /reservations/
+
+    **Parameters:**
+        - reservation_create (ReservationCreate): The `user_id` and `book_id`.
+
+    **Responses:**
+        - 201 Created: The user joined the waitlist.
+        - 400 Bad Request: User is inactive.
+        - 404 Not Found: User or book does not exist.
+        - 409 Conflict: Book is available, already borrowed by the user, or
+          already reserved by the user.
+    """
+    reservation = reservation_repository.reserve_book(reservation_create)
+    if isinstance(reservation, ReservationError):
+        raise HTTPException(
+            status_code=ERROR_STATUS[reservation], detail=reservation.value
+        )
+    return reservation
+
+
+@router.get("/book/{book_id}", response_model=list[Reservation])
+def get_waitlist(book_id: int):
+    """
+    Retrieves the waitlist of a book.
+
+    **Endpoint:** GET /reservations/book/{book_id}
+
+    **Parameters:**
+        - book_id (int): The ID of the book.
+
+    **Responses:**
+        - 200 OK: Returns the waiting reservations, first come first.
+    """
+    return reservation_repository.get_waitlist(book_id)
+
+
+@router.get("/{reservation_id}", response_model=Reservation)
+def get_reservation(reservation_id: int):
+    """
+    Retrieves a reservation by ID.
+
+    **Endpoint:** GET /reservations/{reservation_id}
+
+    **Parameters:**
+        - reservation_id (int): The ID of the reservation.
+
+    **Responses:**
+        - 200 OK: Returns the reservation.
+        - 404 Not Found: Reservation does not exist.
+    """
+    reservation = reservation_repository.get_reservation(reservation_id)
+    if not reservation:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Reservation not found"
+        )
+    return reservation
+
+
+@router.get("/{reservation_id}/wait", response_model=Reservation)
+async def wait_for_reservation(
+    reservation_id: int,
+    timeout: Annotated[float, Query(ge=0, le=60)] = 30,
+):
+    """
+    Long-polls a reservation until it is fulfilled or cancelled.
+
+    The request is held open, without using a worker thread, until the book
+    is handed to the user or the reservation is cancelled, so clients need
+    not poll the book.
+
+    **Endpoint:** GET /reservations/{reservation_id}/wait
+
+    **Parameters:**
+        - reservation_id (int): The ID of the reservation.
+        - timeout (float): Maximum seconds to wait (0-60, default 30).
+
+    **Responses:**
+        - 200 OK: Returns the reservation; its status is still `waiting` if
+          the timeout expired first.
+        - 404 Not Found: Reservation does not exist.
+    """
+    reservation = await reservation_repository.wait_for_reservation(
+        reservation_id, timeout
+    )
+    if not reservation:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Reservation not found"
+        )
+    return reservation
+
+
+@router.delete("/{reservation_id}", response_model=Reservation)
+def cancel_reservation(reservation_id: int):
+    """
+    Takes a user off a waitlist.
+
+    **Endpoint:** DELETE /reservations/{reservation_id}
+
+    **Parameters:**
+        - reservation_id (int): The ID of the reservation.
+
+    **Responses:**
+        - 200 OK: Returns the cancelled reservation.
+        - 404 Not Found: Reservation does not exist.
+        - 409 Conflict: The reservation was already fulfilled or cancelled.
+    """
+    reservation = reservation_repository.cancel_reservation(reservation_id)
+    if reservation is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Reservation not found"
+        )
+    if isinstance(reservation, ReservationError):
+        raise HTTPException(
+            status_code=ERROR_STATUS[reservation], detail=reservation.value
+        )
+    return reservation
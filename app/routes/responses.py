@@ -0,0 +1,111 @@
+import asyncio
+import functools
+from collections.abc import Callable
+from copy import copy
+from typing import Any
+
+from fastapi.datastructures import DefaultPlaceholder
+from fastapi.responses import JSONResponse, Response
+from fastapi.routing import APIRoute, get_request_handler
+from pydantic import TypeAdapter
+from pydantic_core import to_json
+
+
+class RawJSON(str):
+    """
+    An already serialized JSON document.
+
+    Being a `str`, it passes through FastAPI's `jsonable_encoder` untouched, so
+    `FastJSONResponse` can send it as is.
+    """
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSON response rendered by pydantic-core's serializer.
+
+    Content that is already serialized (`RawJSON`) is sent as is; anything
+    else, including Pydantic models, dates and containers of them, is dumped
+    straight to bytes without a `json.dumps` round trip.
+    """
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, RawJSON):
+            return content.encode()
+        return to_json(content)
+
+
+class FastJSONRoute(APIRoute):
+    """
+    Route class that skips response_model re-validation for fast responses.
+
+    When the effective response class of a route is `FastJSONResponse`, the
+    value returned by the endpoint is trusted to already match the declared
+    `response_model` (the repositories only hand out validated models) and is
+    serialized by it directly instead of being validated and encoded again.
+    Any other route, or one using `response_model_include`/`exclude` options,
+    behaves exactly like a regular `APIRoute`.
+
+    Use it per router with
+    `APIRouter(route_class=FastJSONRoute, default_response_class=FastJSONResponse)`,
+    or app wide by passing `default_response_class=FastJSONResponse` to the app.
+    """
+
+    def get_route_handler(self):
+        response_class = self.response_class
+        if isinstance(response_class, DefaultPlaceholder):
+            response_class = response_class.value
+        if (
+            self.response_field is None
+            or not issubclass(response_class, FastJSONResponse)
+            or self.response_model_include is not None
+            or self.response_model_exclude is not None
+            or self.response_model_exclude_unset
+            or self.response_model_exclude_defaults
+            or self.response_model_exclude_none
+        ):
+            return super().get_route_handler()
+        dependant = copy(self.dependant)
+        dependant.call = dump_with(TypeAdapter(self.response_model), dependant.call)
+        return get_request_handler(
+            dependant=dependant,
+            body_field=self.body_field,
+            status_code=self.status_code,
+            response_class=self.response_class,
+            response_field=None,
+            dependency_overrides_provider=self.dependency_overrides_provider,
+            embed_body_fields=self._embed_body_fields,
+        )
+
+
+def dump_with(adapter: TypeAdapter, endpoint: Callable) -> Callable:
+    """
+    Wraps an endpoint so that its result is serialized by the given adapter.
+
+    Args:
+        adapter (TypeAdapter): Adapter for the route's response model.
+        endpoint (Callable): The endpoint function, sync or async.
+
+    Returns:
+        Callable: An endpoint of the same kind returning `RawJSON`, or the
+        original result when it is already a `Response`.
+    """
+
+    def dump(result: Any) -> Any:
+        if isinstance(result, Response):
+            return result
+        return RawJSON(adapter.dump_json(result, by_alias=True).decode())
+
+    if asyncio.iscoroutinefunction(endpoint):
+
+        @functools.wraps(endpoint)
+        async def async_endpoint(**values: Any) -> Any:
+            return dump(await endpoint(**values))
+
+        return async_endpoint
+
+    @functools.wraps(endpoint)
+    def sync_endpoint(**values: Any) -> Any:
+        return dump(endpoint(**values))
+
+    return sync_endpoint
@@ -0,0 +1,77 @@
+from datetime import date
+from typing import Annotated
+
+from fastapi import APIRouter, Query
+
+from app.models.stats import BookLoans, DailyLoans, LoanDuration, UserLoans
+from app.repositories import async_borrow_repository
+from app.routes.responses import FastJSONRoute
+
+router = APIRouter(prefix="/stats", tags=["Statistics"], route_class=FastJSONRoute)
+
+
+@router.get("/loans/daily", response_model=list[DailyLoans])
+async def get_loans_per_day(
+    borrowed_from: Annotated[date | None, Query()] = None,
+    borrowed_to: Annotated[date | None, Query()] = None,
+):
+    """
+    Counts the loans made each day.
+
+    **Endpoint:** GET /stats/loans/daily
+
+    **Parameters:**
+        - borrowed_from (date | None): First day to report.
+        - borrowed_to (date | None): Last day to report.
+
+    **Responses:**
+        - 200 OK: Returns the days with at least one loan and their loan
+          counts, in date order.
+    """
+    return await async_borrow_repository.get_loans_per_day(borrowed_from, borrowed_to)
+
+
+@router.get("/loans/duration", response_model=LoanDuration)
+async def get_loan_duration():
+    """
+    Measures how long returned books were out.
+
+    **Endpoint:** GET /stats/loans/duration
+
+    **Responses:**
+        - 200 OK: Returns the number of returned loans and their mean
+          duration in days.
+    """
+    return await async_borrow_repository.get_loan_duration()
+
+
+@router.get("/books/most-borrowed", response_model=list[BookLoans])
+async def get_most_borrowed_books(limit: Annotated[int, Query(ge=1, le=100)] = 10):
+    """
+    Ranks books by the number of times they were borrowed.
+
+    **Endpoint:** GET /stats/books/most-borrowed
+
+    **Parameters:**
+        - limit (int): Maximum number of books to return (1-100, default 10).
+
+    **Responses:**
+        - 200 OK: Returns the most borrowed books, most loans first.
+    """
+    return await async_borrow_repository.get_most_borrowed_books(limit)
+
+
+@router.get("/users/top-borrowers", response_model=list[UserLoans])
+async def get_top_borrowers(limit: Annotated[int, Query(ge=1, le=100)] = 10):
+    """
+    Ranks users by the number of books they borrowed.
+
+    **Endpoint:** GET /stats/users/top-borrowers
+
+    **Parameters:**
+        - limit (int): Maximum number of users to return (1-100, default 10).
+
+    **Responses:**
+        - 200 OK: Returns the heaviest borrowers, most loans first.
+    """
+    return await async_borrow_repository.get_top_borrowers(limit)
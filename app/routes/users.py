@@ -1,14 +1,34 @@
-from fastapi import APIRouter, HTTPException, status
+from typing import Annotated
 
+from fastapi import APIRouter, Header, HTTPException, Request, Response, status
+
+from app.models.borrow import BorrowRecord
+from app.models.bulk import BulkResult
 from app.models.user import User, UserCreate, UserUpdate
-from app.repositories import user_repository
+from app.repositories import (
+    async_borrow_repository,
+    async_user_repository,
+    user_repository,
+)
+from app.repositories.backend import VersionMismatchError
+from app.repositories.user import DuplicateEmailError
+from app.routes.bulk import bulk_create, bulk_openapi
+from app.routes.conditional import (
+    ETAG_HEADER,
+    conditional_response,
+    expected_versions,
+    precondition_failed,
+    version_tag,
+)
+from app.routes.pagination import Page, set_next_cursor
+from app.routes.responses import FastJSONRoute
 
 # Initialize repository with data_store from app.main
-router = APIRouter(prefix="/users", tags=["User Endpoints"])
+router = APIRouter(prefix="/users", tags=["User Endpoints"], route_class=FastJSONRoute)
 
 
 @router.post("/", response_model=User, status_code=status.HTTP_201_CREATED)
-def create_user(user_create: UserCreate):
+async def create_user(user_create: UserCreate):
     """
     Creates a new user.
 
@@ -20,13 +40,101 @@ def create_user(user_create: UserCreate):
     **Responses:**
         - 201 Created: Returns the created user.
         - 400 Bad Request: Validation errors.
+        - 409 Conflict: The email address is already registered.
     """
-    new_user = user_repository.create_user(user_create)
+    try:
+        new_user = await async_user_repository.create_user(user_create)
+    except DuplicateEmailError:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT, detail="Email already registered"
+        ) from None
     return new_user
 
 
-@router.get("/{user_id}", response_model=User)
-def get_user(user_id: int):
+@router.post("/bulk", response_model=BulkResult, openapi_extra=bulk_openapi(UserCreate))
+async def bulk_create_users(request: Request):
+    """
+    Creates many users in one request.
+
+    **Endpoint:** POST /users/bulk
+
+    **Parameters:**
+        - body: A JSON array of UserCreate objects, or one UserCreate per line
+          with an `application/x-ndjson` content type.
+
+    **Responses:**
+        - 200 OK: Returns the outcome of each item; valid items are created
+          even when others fail validation or reuse a registered email.
+        - 400 Bad Request: The body is not a JSON array or NDJSON stream.
+        - 413 Content Too Large: Too many items.
+    """
+    return await bulk_create(
+        request,
+        UserCreate,
+        user_repository.create_users,
+        conflict="Email already registered",
+    )
+
+
+@router.get("/", response_model=list[User])
+async def list_users(
+    response: Response,
+    page: Page,
+    is_active: bool | None = None,
+):
+    """
+    Lists users in ID order, one page at a time.
+
+    **Endpoint:** GET /users/
+
+    **Parameters:**
+        - limit (int): Maximum number of users to return (1-1000, default 100).
+        - after (str | None): Cursor taken from the previous page's `X-Next-Cursor` header.
+        - is_active (bool | None): Only return users with this active status.
+
+    **Responses:**
+        - 200 OK: Returns a page of users. `X-Next-Cursor` is set when more may follow.
+        - 400 Bad Request: Invalid cursor.
+    """
+    users_page = await async_user_repository.list_users(
+        page.after, page.limit, is_active
+    )
+    set_next_cursor(response, users_page, page)
+    return users_page
+
+
+@router.get("/by-email/{email}", response_model=User)
+async def get_user_by_email(email: str):
+    """
+    Retrieves a user by email address, ignoring case.
+
+    **Endpoint:** GET /users/by-email/{email}
+
+    **Parameters:**
+        - email (str): The email address of the user to retrieve.
+
+    **Responses:**
+        - 200 OK: Returns the user.
+        - 404 Not Found: No user has this email address.
+    """
+    user = await async_user_repository.get_user_by_email(email)
+    if not user:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="User not found"
+        )
+    return user
+
+
+@router.get(
+    "/{user_id}",
+    response_model=User,
+    responses={status.HTTP_304_NOT_MODIFIED: {"description": "Not Modified"}},
+)
+async def get_user(
+    user_id: int,
+    response: Response,
+    if_none_match: Annotated[str | None, Header()] = None,
+):
     """
     Retrieves a user by ID.
 
@@ -34,21 +142,28 @@ def get_user(user_id: int):
 
     **Parameters:**
         - user_id (int): The ID of the user to retrieve.
+        - If-None-Match (header): ETags of versions the client already has.
 
     **Responses:**
-        - 200 OK: Returns the user data.
+        - 200 OK: Returns the user data, with its `ETag`.
+        - 304 Not Modified: The client's version is current.
         - 404 Not Found: User does not exist.
     """
-    user = user_repository.get_user(user_id)
+    user = await async_user_repository.get_user(user_id)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="User not found"
         )
-    return user
+    return conditional_response(response, user, if_none_match)
 
 
 @router.put("/{user_id}", response_model=User)
-def update_user(user_id: int, user_update: UserUpdate):
+async def update_user(
+    user_id: int,
+    user_update: UserUpdate,
+    response: Response,
+    if_match: Annotated[str | None, Header()] = None,
+):
     """
     Updates an existing user's information.
 
@@ -57,21 +172,37 @@ def update_user(user_id: int, user_update: UserUpdate):
     **Parameters:**
         - user_id (int): The ID of the user to update.
         - user_update (UserUpdate): The new data for the user.
+        - If-Match (header): ETag of the version the update is based on; the
+          update is refused if the user has changed since.
 
     **Responses:**
-        - 200 OK: Returns the updated user.
+        - 200 OK: Returns the updated user, with their new `ETag`.
         - 404 Not Found: User does not exist.
+        - 409 Conflict: The new email address belongs to another user.
+        - 412 Precondition Failed: The user has changed since the `If-Match`
+          version.
     """
-    updated_user = user_repository.update_user(user_id, user_update)
+    versions = expected_versions(if_match)
+    try:
+        updated_user = await async_user_repository.update_user(
+            user_id, user_update, versions
+        )
+    except DuplicateEmailError:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT, detail="Email already registered"
+        ) from None
+    except VersionMismatchError as error:
+        raise precondition_failed("User has been modified", error.version) from None
     if not updated_user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="User not found"
         )
+    response.headers[ETAG_HEADER] = version_tag(updated_user.version)
     return updated_user
 
 
 @router.delete("/{user_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_user(user_id: int):
+async def delete_user(user_id: int):
     """
     Deletes a user from the system.
 
@@ -84,7 +215,7 @@ def delete_user(user_id: int):
         - 204 No Content: User successfully deleted.
         - 404 Not Found: User does not exist.
     """
-    success = user_repository.delete_user(user_id)
+    success = await async_user_repository.delete_user(user_id)
     if not success:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="User not found"
@@ -93,7 +224,7 @@ def delete_user(user_id: int):
 
 
 @router.patch("/{user_id}/deactivate", response_model=User)
-def deactivate_user(user_id: int):
+async def deactivate_user(user_id: int):
     """
     Deactivates a user by setting `is_active` to False.
 
@@ -107,10 +238,35 @@ def deactivate_user(user_id: int):
         - 400 Bad Request: User already deactivated.
         - 404 Not Found: User does not exist.
     """
-    user = user_repository.deactivate_user(user_id)
+    user = await async_user_repository.deactivate_user(user_id)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="User not found or already deactivated",
         )
     return user
+
+
+@router.get("/{user_id}/loans/active", response_model=list[BorrowRecord])
+async def get_active_loans(user_id: int):
+    """
+    Retrieves the books a user currently holds.
+
+    The loans are found through the user's active-loan counter and borrow
+    index, without going through the rest of the user's history.
+
+    **Endpoint:** GET /users/{user_id}/loans/active
+
+    **Parameters:**
+        - user_id (int): The ID of the user.
+
+    **Responses:**
+        - 200 OK: Returns the user's unreturned borrow records, in ID order.
+        - 404 Not Found: User does not exist.
+    """
+    user = await async_user_repository.get_user(user_id)
+    if not user:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="User not found"
+        )
+    return await async_borrow_repository.get_active_borrow_records_by_user(user_id)
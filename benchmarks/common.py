@@ -0,0 +1,122 @@
+import json
+import math
+import platform
+import subprocess
+from datetime import UTC, datetime
+from pathlib import Path
+from typing import Any
+
+from app.models.book import BookCreate
+from app.models.user import UserCreate
+from app.repositories import book_repository, borrow_repository, user_repository
+
+# Entities are created in chunks of this size while populating
+POPULATE_CHUNK_SIZE = 10_000
+
+
+def populate(size: int):
+    """
+    Fills the current store with a reproducible library of the given size.
+
+    Creates `size` users and `size` books. Books `1..size/2` are borrowed by
+    the user with the same ID, and the first half of those loans, records
+    `1..size/4`, are returned again. This leaves books above `size/2`
+    available and records `size/4+1..size/2` open.
+
+    Args:
+        size (int): Number of users and books.
+    """
+    for start in range(0, size, POPULATE_CHUNK_SIZE):
+        stop = min(start + POPULATE_CHUNK_SIZE, size)
+        user_repository.create_users(
+            [
+                UserCreate(name=f"User {i}", email=f"user{i}@example.com")
+                for i in range(start + 1, stop + 1)
+            ]
+        )
+        book_repository.create_books(
+            [
+                BookCreate(title=f"Book {i}", author=f"Author {i % 1000}")
+                for i in range(start + 1, stop + 1)
+            ]
+        )
+    loans = size // 2
+    for start in range(0, loans, POPULATE_CHUNK_SIZE):
+        stop = min(start + POPULATE_CHUNK_SIZE, loans)
+        borrow_repository.borrow_books(
+            [(i, i) for i in range(start + 1, stop + 1)], atomic=False
+        )
+    for start in range(0, loans // 2, POPULATE_CHUNK_SIZE):
+        stop = min(start + POPULATE_CHUNK_SIZE, loans // 2)
+        borrow_repository.return_books(list(range(start + 1, stop + 1)), atomic=False)
+
+
+def percentile(sorted_values: list[float], fraction: float) -> float:
+    """
+    Returns a percentile of already sorted values (nearest rank).
+
+    Args:
+        sorted_values (list[float]): The values, in ascending order.
+        fraction (float): The percentile as a fraction, e.g. 0.99.
+
+    Returns:
+        float: The value at that rank, or 0.0 for no values.
+    """
+    if not sorted_values:
+        return 0.0
+    rank = max(math.ceil(fraction * len(sorted_values)), 1)
+    return sorted_values[rank - 1]
+
+
+def environment() -> dict[str, Any]:
+    """
+    Describes where and on which commit the benchmarks ran.
+
+    Returns:
+        dict[str, Any]: Commit, Python version, platform and timestamp.
+    """
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "processor": platform.processor() or platform.machine(),
+        "timestamp": datetime.now(UTC).isoformat(),
+    }
+
+
+def write_results(
+    path: str | Path | None,
+    suite: str,
+    parameters: dict[str, Any],
+    results: dict[str, dict[str, float]],
+):
+    """
+    Writes benchmark results as JSON, for `benchmarks.compare`.
+
+    Args:
+        path (str | Path | None): Output file; nothing is written when None.
+        suite (str): Name of the benchmark suite.
+        parameters (dict[str, Any]): The options the suite ran with.
+        results (dict[str, dict[str, float]]): Metrics keyed by benchmark
+            name. Metrics ending in `_us`, `_ms`, `_bytes` or `_mb` are
+            lower-is-better and those ending in `_per_sec` are
+            higher-is-better.
+    """
+    if path is None:
+        return
+    document = {
+        "suite": suite,
+        "environment": environment(),
+        "parameters": parameters,
+        "results": results,
+    }
+    Path(path).write_text(json.dumps(document, indent=2) + "\n")
@@ -0,0 +1,82 @@
+"""
+Compares two benchmark result files and fails on regressions.
+
+Every metric present in both files is compared. Metrics ending in `_us`,
+`_ms`, `_bytes` or `_mb` are better when lower, those ending in `_per_sec`
+when higher; others, such as request counts, are ignored. The exit status is
+1 when any metric got worse by more than the threshold, so it can gate a CI
+job.
+
+Usage:
+    python -m benchmarks.compare baseline.json current.json [--threshold 0.2]
+"""
+
+import argparse
+import json
+import sys
+from pathlib import Path
+
+
+def direction(metric: str) -> int:
+    """
+    Tells whether a metric is better when lower (-1), higher (1) or neither (0).
+    """
+    if metric.endswith(("_us", "_ms", "_bytes", "_mb")):
+        return -1
+    if metric.endswith("_per_sec"):
+        return 1
+    return 0
+
+
+def compare(
+    baseline: dict, current: dict, threshold: float
+) -> list[tuple[str, str, float, float, float]]:
+    """
+    Finds the metrics that regressed beyond a threshold.
+
+    Args:
+        baseline (dict): Results of the reference run.
+        current (dict): Results of the run under test.
+        threshold (float): Allowed relative slowdown, e.g. 0.2 for 20%.
+
+    Returns:
+        list[tuple[str, str, float, float, float]]: Benchmark, metric,
+            baseline value, current value and relative change for every
+            regression, worst first.
+    """
+    regressions = []
+    for name, metrics in current["results"].items():
+        reference = baseline["results"].get(name, {})
+        for metric, value in metrics.items():
+            sign = direction(metric)
+            old = reference.get(metric)
+            if not sign or not old:
+                continue
+            change = (value - old) / old
+            if -sign * change > threshold:
+                regressions.append((name, metric, old, value, change))
+    regressions.sort(key=lambda regression: -abs(regression[4]))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("baseline", type=Path)
+    parser.add_argument("current", type=Path)
+    parser.add_argument("--threshold", type=float, default=0.2)
+    args = parser.parse_args()
+
+    baseline = json.loads(args.baseline.read_text())
+    current = json.loads(args.current.read_text())
+    regressions = compare(baseline, current, args.threshold)
+    print(
+        f"{baseline['environment']['commit']} -> {current['environment']['commit']}: "
+        f"{len(regressions)} regression(s) over {args.threshold:.0%}"
+    )
+    for name, metric, old, new, change in regressions:
+        print(f"  {name} {metric}: {old:.2f} -> {new:.2f} ({change:+.0%})")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
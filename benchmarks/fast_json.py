@@ -0,0 +1,91 @@
+"""
+Measures the CPU time per request saved by the fast JSON response path.
+
+Runs `GET /books/{book_id}` and `GET /borrow/records` against the app with
+validated responses and against the same routers with `FastJSONResponse`.
+
+Usage:
+    python -m benchmarks.fast_json [--requests N] [--records N] [--output results.json]
+"""
+
+import argparse
+import time
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.routes import books, borrow, users
+from app.routes.responses import FastJSONResponse
+from benchmarks.common import populate, write_results
+
+
+def build_fast_app() -> FastAPI:
+    """
+    Builds an app serving the API routers with fast JSON responses.
+
+    Returns:
+        FastAPI: The app.
+    """
+    fast_app = FastAPI(default_response_class=FastJSONResponse)
+    for module in (users, books, borrow):
+        fast_app.include_router(module.router)
+    return fast_app
+
+
+def cpu_per_request(client: TestClient, path: str, requests: int) -> float:
+    """
+    Measures the CPU time spent per request on a path.
+
+    Args:
+        client (TestClient): Client for the app under test.
+        path (str): The path to request.
+        requests (int): Number of requests per round; the best of three
+            rounds is kept.
+
+    Returns:
+        float: CPU microseconds per request.
+    """
+    client.get(path).raise_for_status()
+    best = float("inf")
+    for _ in range(3):
+        start = time.process_time()
+        for _ in range(requests):
+            client.get(path)
+        best = min(best, time.process_time() - start)
+    return best / requests * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--records", type=int, default=1000)
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    args = parser.parse_args()
+
+    # Creates `args.records` borrow records, the page size fetched below
+    populate(2 * args.records)
+    validated = TestClient(app)
+    fast = TestClient(build_fast_app())
+    paths = ["/books/1", f"/borrow/records?limit={args.records}"]
+    print(f"{'path':<40} {'validated':>12} {'fast':>12} {'saved':>8}")
+    results = {}
+    for path in paths:
+        before = cpu_per_request(validated, path, args.requests)
+        after = cpu_per_request(fast, path, args.requests)
+        results[path] = {"validated_cpu_us": before, "fast_cpu_us": after}
+        print(
+            f"{path:<40} {before:>10.0f}us {after:>10.0f}us "
+            f"{1 - after / before:>7.0%}"
+        )
+
+    write_results(
+        args.output,
+        "fast_json",
+        {"requests": args.requests, "records": args.records},
+        results,
+    )
+
+
+if __name__ == "__main__":
+    main()
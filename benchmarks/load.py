@@ -0,0 +1,250 @@
+"""
+In-process load generator for the API.
+
+Drives the real `app.main:app` through an ASGI transport with a mixed
+read/borrow/return workload from concurrent virtual clients, and reports
+latency percentiles and throughput per operation.
+
+Usage:
+    python -m benchmarks.load [--size N] [--clients N] [--requests N]
+        [--mix read=80,borrow=10,return=10] [--seed N] [--output results.json]
+"""
+
+import argparse
+import asyncio
+import random
+import time
+from collections import defaultdict
+
+import httpx
+
+from app import repositories
+from app.main import app
+from app.routes.pagination import encode_cursor
+from benchmarks.common import percentile, populate, write_results
+
+# Read operations, picked uniformly when the workload draws a read
+READS = ["get_book", "get_user", "list_books", "search_books", "user_records"]
+
+
+class Workload:
+    """
+    Shared state of a load run: what can be borrowed and returned next.
+
+    Books borrowed by a client are only returned by a later return
+    operation, so borrows and returns keep succeeding for the whole run.
+
+    Attributes:
+        size (int): The populated library size.
+        weights (dict[str, int]): Relative weight of "read", "borrow" and
+            "return" operations.
+        available_books (list[int]): Books that can be borrowed.
+        open_loans (list[int]): Borrow records that can be returned.
+        latencies (dict[str, list[float]]): Latency in seconds of each
+            request, keyed by operation.
+        errors (dict[str, int]): Unexpected responses, keyed by operation.
+    """
+
+    def __init__(self, size: int, weights: dict[str, int]):
+        self.size = size
+        self.weights = weights
+        self.available_books = list(range(size // 2 + 1, size + 1))
+        self.open_loans = list(range(size // 4 + 1, size // 2 + 1))
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    def next_request(self, rng: random.Random) -> tuple[str, str, str, dict | None]:
+        """
+        Draws the next operation.
+
+        Args:
+            rng (random.Random): The client's random generator.
+
+        Returns:
+            tuple[str, str, str, dict | None]: Operation name, HTTP method,
+                path and JSON body.
+        """
+        kind = rng.choices(list(self.weights), list(self.weights.values()))[0]
+        if kind == "borrow" and self.available_books:
+            index = rng.randrange(len(self.available_books))
+            book_id = self.available_books.pop(index)
+            body = {"user_id": rng.randint(1, self.size), "book_id": book_id}
+            return "borrow", "POST", "/borrow/", body
+        if kind == "return" and self.open_loans:
+            borrow_id = self.open_loans.pop(rng.randrange(len(self.open_loans)))
+            return "return", "POST", f"/borrow/return/{borrow_id}", None
+        read = rng.choice(READS)
+        entity_id = rng.randint(1, self.size)
+        path = {
+            "get_book": f"/books/{entity_id}",
+            "get_user": f"/users/{entity_id}",
+            "list_books": f"/books/?limit=50&after={encode_cursor(entity_id)}",
+            "search_books": f"/books/search?q=book+{entity_id}",
+            "user_records": f"/borrow/records/user/{entity_id}",
+        }[read]
+        return read, "GET", path, None
+
+    def record(self, operation: str, response: httpx.Response, latency: float):
+        """
+        Records the outcome of a request and recycles what it freed.
+
+        Args:
+            operation (str): The operation name.
+            response (httpx.Response): The response.
+            latency (float): Seconds the request took.
+        """
+        self.latencies[operation].append(latency)
+        if response.status_code >= 400:
+            self.errors[operation] += 1
+        elif operation == "borrow":
+            self.open_loans.append(response.json()["id"])
+        elif operation == "return":
+            self.available_books.append(response.json()["book_id"])
+
+
+async def client_loop(
+    client: httpx.AsyncClient, workload: Workload, requests: int, seed: int
+):
+    """
+    Issues requests one after the other, like a single virtual client.
+
+    Args:
+        client (httpx.AsyncClient): Client bound to the app.
+        workload (Workload): The shared workload state.
+        requests (int): Number of requests to issue.
+        seed (int): Seed of this client's random generator.
+    """
+    rng = random.Random(seed)
+    for _ in range(requests):
+        operation, method, path, body = workload.next_request(rng)
+        start = time.perf_counter()
+        response = await client.request(method, path, json=body)
+        workload.record(operation, response, time.perf_counter() - start)
+
+
+def summarize(latencies: list[float], elapsed: float, errors: int) -> dict:
+    """
+    Summarizes the latencies of one operation, or of all of them.
+
+    Args:
+        latencies (list[float]): Request latencies in seconds.
+        elapsed (float): Wall time of the run in seconds.
+        errors (int): Unexpected responses.
+
+    Returns:
+        dict: Request count, errors, throughput and p50/p95/p99/max in ms.
+    """
+    ordered = sorted(latencies)
+    return {
+        "requests": len(ordered),
+        "errors": errors,
+        "requests_per_sec": len(ordered) / elapsed,
+        "p50_ms": percentile(ordered, 0.50) * 1e3,
+        "p95_ms": percentile(ordered, 0.95) * 1e3,
+        "p99_ms": percentile(ordered, 0.99) * 1e3,
+        "max_ms": (ordered[-1] if ordered else 0.0) * 1e3,
+    }
+
+
+async def run_load(
+    size: int, clients: int, requests: int, weights: dict[str, int], seed: int = 0
+) -> dict[str, dict]:
+    """
+    Populates the configured store and runs the load against the app.
+
+    The app's lifespan runs around the load, so `ELIB_*` settings such as
+    the storage backend apply.
+
+    Args:
+        size (int): Number of users and books to start from.
+        clients (int): Concurrent virtual clients.
+        requests (int): Total number of requests, split among the clients.
+        weights (dict[str, int]): Relative weight of each operation kind.
+        seed (int): Base seed of the clients' random generators.
+
+    Returns:
+        dict[str, dict]: Summary of every operation, plus "total".
+    """
+    async with app.router.lifespan_context(app):
+        # The lifespan may have switched stores, so look the current one up
+        repositories.data_store.reset()
+        populate(size)
+        workload = Workload(size, weights)
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://bench"
+        ) as client:
+            start = time.perf_counter()
+            await asyncio.gather(
+                *(
+                    client_loop(client, workload, requests // clients, seed + i)
+                    for i in range(clients)
+                )
+            )
+            elapsed = time.perf_counter() - start
+    results = {
+        operation: summarize(latencies, elapsed, workload.errors[operation])
+        for operation, latencies in sorted(workload.latencies.items())
+    }
+    results["total"] = summarize(
+        [value for latencies in workload.latencies.values() for value in latencies],
+        elapsed,
+        sum(workload.errors.values()),
+    )
+    return results
+
+
+def parse_mix(mix: str) -> dict[str, int]:
+    """
+    Parses a workload mix such as "read=80,borrow=10,return=10".
+    """
+    weights = {}
+    for part in mix.split(","):
+        kind, _, weight = part.partition("=")
+        if kind not in ("read", "borrow", "return"):
+            raise argparse.ArgumentTypeError(f"Unknown operation: {kind}")
+        weights[kind] = int(weight)
+    return weights
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--size", type=int, default=10_000)
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=20_000)
+    parser.add_argument(
+        "--mix", type=parse_mix, default=parse_mix("read=80,borrow=10,return=10")
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    args = parser.parse_args()
+
+    results = asyncio.run(
+        run_load(args.size, args.clients, args.requests, args.mix, args.seed)
+    )
+    print(
+        f"{'operation':<14} {'requests':>9} {'errors':>7} {'req/s':>9} "
+        f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}"
+    )
+    for operation, summary in results.items():
+        print(
+            f"{operation:<14} {summary['requests']:>9} {summary['errors']:>7} "
+            f"{summary['requests_per_sec']:>9.0f} {summary['p50_ms']:>8.2f} "
+            f"{summary['p95_ms']:>8.2f} {summary['p99_ms']:>8.2f}"
+        )
+    write_results(
+        args.output,
+        "load",
+        {
+            "size": args.size,
+            "clients": args.clients,
+            "requests": args.requests,
+            "mix": args.mix,
+            "seed": args.seed,
+        },
+        results,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+"""
+Resident memory taken by the in-memory store, per entity and per million.
+
+Each collection is filled in a fresh child process, once with the compact
+tables of `DataStore` and once with the previous layout of Pydantic
+instances in dicts, and the growth of the process' resident set is
+reported. Both layouts maintain the same indexes.
+
+Usage:
+    python -m benchmarks.memory [--entities N] [--output results.json]
+"""
+
+import argparse
+import gc
+import json
+import os
+import resource
+import subprocess
+import sys
+from datetime import date
+
+from app.models.book import Book
+from app.models.borrow import BorrowRecord
+from app.models.user import User
+from app.repositories.memory import DataStore
+from benchmarks.common import write_results
+
+COLLECTIONS = ("users", "books", "borrow_records")
+
+# First borrow date of the generated records
+EPOCH = date(2024, 1, 1).toordinal()
+
+
+class ModelStore(DataStore):
+    """
+    `DataStore` with the layout it had before compact tables: Pydantic
+    instances in dicts and lists of borrow record IDs.
+    """
+
+    def reset(self):
+        super().reset()
+        self.users = {}
+        self.books = {}
+        self.borrow_records = {}
+
+    def add_borrow_record(self, record):
+        self.borrow_records[record.id] = record
+        self.borrow_records_by_user.setdefault(record.user_id, []).append(record.id)
+        self.borrow_records_by_book.setdefault(record.book_id, []).append(record.id)
+        self._index_flag("borrow_records", None, record)
+        if record.return_date is None:
+            self.active_borrow_records[(record.user_id, record.book_id)] = record.id
+
+
+def make_entity(collection: str, entity_id: int):
+    """
+    Builds the entity with the given ID of a reproducible library.
+
+    Users and books are built without validation, which only matters for
+    speed. One borrow record in ten is still open.
+    """
+    if collection == "users":
+        return User.model_construct(
+            id=entity_id,
+            name=f"User {entity_id}",
+            email=f"user{entity_id}@example.com",
+            is_active=True,
+        )
+    if collection == "books":
+        return Book.model_construct(
+            id=entity_id,
+            title=f"Book {entity_id}",
+            author=f"Author {entity_id % 1000}",
+            is_available=True,
+        )
+    borrowed = EPOCH + entity_id % 365
+    return BorrowRecord(
+        id=entity_id,
+        user_id=entity_id % 10_007 + 1,
+        book_id=entity_id % 100_003 + 1,
+        borrow_date=date.fromordinal(borrowed),
+        return_date=date.fromordinal(borrowed + 14) if entity_id % 10 else None,
+    )
+
+
+def resident_bytes() -> int:
+    """
+    Returns the resident set size of this process.
+
+    Falls back to the peak resident set size where `/proc` is unavailable.
+    """
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Kilobytes on Linux, bytes on macOS
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+def measure(layout: str, collection: str, entities: int) -> int:
+    """
+    Fills a store and returns how much its resident memory grew, in bytes.
+
+    Meant to run in a fresh process, see `measure_in_child`.
+    """
+    store = ModelStore() if layout == "models" else DataStore()
+    gc.collect()
+    before = resident_bytes()
+    for entity_id in range(1, entities + 1):
+        store.put(collection, make_entity(collection, entity_id))
+    gc.collect()
+    return resident_bytes() - before
+
+
+def measure_in_child(layout: str, collection: str, entities: int) -> int:
+    """
+    Runs `measure` in a fresh interpreter, so layouts do not share memory.
+    """
+    output = subprocess.run(
+        [
+            sys.executable,
+            "-m",
+            "benchmarks.memory",
+            "--child",
+            layout,
+            collection,
+            "--entities",
+            str(entities),
+        ],
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    return json.loads(output)["bytes"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--entities", type=int, default=1_000_000)
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    parser.add_argument("--child", nargs=2, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        layout, collection = args.child
+        print(json.dumps({"bytes": measure(layout, collection, args.entities)}))
+        return
+
+    results = {}
+    print(f"{'collection':<16} {'layout':<8} {'bytes/entity':>13} {'MB/million':>11}")
+    for collection in COLLECTIONS:
+        for layout in ("models", "compact"):
+            grown = measure_in_child(layout, collection, args.entities)
+            per_entity = grown / args.entities
+            results[f"{collection}/{layout}"] = {
+                "per_entity_bytes": per_entity,
+                "per_million_mb": per_entity * 1e6 / 2**20,
+            }
+            print(
+                f"{collection:<16} {layout:<8} {per_entity:>13.0f} "
+                f"{per_entity * 1e6 / 2**20:>11.1f}"
+            )
+    write_results(args.output, "memory", {"entities": args.entities}, results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,475 @@
+"""
+Micro-benchmarks of every repository method at several library sizes.
+
+Each size starts from a freshly populated store (see `benchmarks.common.populate`),
+and every method is timed over a fixed, seeded sequence of arguments so runs on
+different commits do the same work. The public methods of the repository
+classes must all have a benchmark; building the benchmarks fails otherwise.
+
+Usage:
+    python -m benchmarks.repositories [--sizes 10000,100000,1000000]
+        [--iterations N] [--backend memory|sqlite] [--output results.json]
+"""
+
+import argparse
+import asyncio
+import functools
+import inspect
+import random
+import tempfile
+import time
+from collections.abc import Callable
+from dataclasses import dataclass
+from datetime import date, timedelta
+from pathlib import Path
+
+from app.models.book import BookCreate, BookUpdate
+from app.models.reservation import ReservationCreate
+from app.models.user import UserCreate, UserUpdate
+from app.repositories import (
+    BookRepository,
+    BorrowRepository,
+    ReservationRepository,
+    UserRepository,
+    book_repository,
+    borrow_repository,
+    data_store,
+    reservation_repository,
+    use_store,
+    user_repository,
+)
+from app.repositories.popularity import MAX_WINDOW_DAYS
+from app.repositories.sqlite import SqliteStore
+from benchmarks.common import populate, write_results
+
+# Items per call of the batch methods
+BATCH_SIZE = 100
+
+# Iterations of the methods that walk the whole store
+SCAN_ITERATIONS = 3
+
+# Classes whose public methods must all be benchmarked
+REPOSITORY_CLASSES = (
+    UserRepository,
+    BookRepository,
+    BorrowRepository,
+    ReservationRepository,
+)
+
+
+@dataclass(frozen=True)
+class Benchmark:
+    """
+    A repository method and the arguments of each timed call.
+
+    Attributes:
+        name (str): Name of the benchmark, usually the method name.
+        method (Callable): The method to call.
+        calls (list[tuple]): Positional arguments of each call, in order.
+        items_per_call (int): Entities handled per call, for batch methods.
+    """
+
+    name: str
+    method: Callable
+    calls: list[tuple]
+    items_per_call: int = 1
+
+
+def drained(method: Callable) -> Callable:
+    """
+    Wraps a method returning an iterator so each call drains it, and lazy
+    methods do their work.
+    """
+
+    @functools.wraps(method)
+    def call(*args):
+        for _ in method(*args):
+            pass
+
+    return call
+
+
+def awaited(method: Callable) -> Callable:
+    """
+    Wraps a coroutine method so each call runs it to completion on a fresh
+    event loop, whose startup is included in the timing.
+    """
+
+    @functools.wraps(method)
+    def call(*args):
+        return asyncio.run(method(*args))
+
+    return call
+
+
+def repository_methods() -> set[str]:
+    """
+    Returns the names of the public methods of `REPOSITORY_CLASSES`.
+    """
+    return {
+        name
+        for repository in REPOSITORY_CLASSES
+        for name, _ in inspect.getmembers(repository, inspect.isfunction)
+        if not name.startswith("_")
+    }
+
+
+def benchmarks(size: int, iterations: int, seed: int = 0) -> list[Benchmark]:
+    """
+    Builds the benchmarks for a store populated with `populate(size)`.
+
+    They run in the returned order; later ones rely on the entities earlier
+    ones created (e.g. `delete_user` removes the users `create_user` added).
+
+    Args:
+        size (int): The populated library size.
+        iterations (int): Calls per benchmark, capped by the entities the
+            benchmark can use.
+        seed (int): Seed for the randomly picked IDs.
+
+    Returns:
+        list[Benchmark]: The benchmarks.
+
+    Raises:
+        RuntimeError: If a method of `repository_methods` has no benchmark.
+    """
+    rng = random.Random(seed)
+    n = min(iterations, size // 4)
+    batches = max(n // BATCH_SIZE, 1)
+
+    def ids(count: int = n) -> list[tuple[int]]:
+        return [(rng.randint(1, size),) for _ in range(count)]
+
+    new_users = range(size + 1, size + n + 1)
+    new_books = range(size + 1, size + n + 1)
+    free_books = range(size // 2 + 1, size // 2 + n + 1)
+    open_loans = range(size // 4 + 1, size // 4 + n + 1)
+    first_new_loan = size // 2 + 1
+    batch_books = range(size // 2 + n + 1, size // 2 + n + batches * BATCH_SIZE + 1)
+    reservations = range(1, n + 1)
+    # Every open loan is past its due date by then
+    past_due = date.today() + borrow_repository.loan_period + timedelta(days=1)
+    suite = [
+        # Users
+        Benchmark(
+            "create_user",
+            user_repository.create_user,
+            [
+                (UserCreate(name=f"New {i}", email=f"new{i}@example.com"),)
+                for i in new_users
+            ],
+        ),
+        Benchmark("get_user", user_repository.get_user, ids()),
+        Benchmark(
+            "get_user_by_email",
+            user_repository.get_user_by_email,
+            [(f"user{user_id}@example.com",) for (user_id,) in ids()],
+        ),
+        Benchmark(
+            "list_users",
+            user_repository.list_users,
+            [(after, 100) for (after,) in ids()],
+        ),
+        Benchmark(
+            "update_user",
+            user_repository.update_user,
+            [(user_id, UserUpdate(name="Renamed")) for (user_id,) in ids()],
+        ),
+        Benchmark(
+            "deactivate_user",
+            user_repository.deactivate_user,
+            [(user_id,) for user_id in new_users],
+        ),
+        Benchmark(
+            "delete_user", user_repository.delete_user, [(i,) for i in new_users]
+        ),
+        Benchmark(
+            "create_users",
+            user_repository.create_users,
+            [
+                (
+                    [
+                        UserCreate(name="Bulk", email=f"bulk{b}.{i}@example.com")
+                        for i in range(BATCH_SIZE)
+                    ],
+                )
+                for b in range(batches)
+            ],
+            BATCH_SIZE,
+        ),
+        # Books
+        Benchmark(
+            "create_book",
+            book_repository.create_book,
+            [(BookCreate(title=f"New {i}", author="Anon"),) for i in new_books],
+        ),
+        Benchmark("get_book", book_repository.get_book, ids()),
+        Benchmark(
+            "list_books",
+            book_repository.list_books,
+            [(after, 100) for (after,) in ids()],
+        ),
+        Benchmark(
+            "list_books_unavailable",
+            book_repository.list_books,
+            [(after, 100, False) for (after,) in ids()],
+        ),
+        Benchmark(
+            "search_books",
+            book_repository.search_books,
+            [(f"book {book_id}",) for (book_id,) in ids()]
+            + [(f"author {book_id % 1000}",) for (book_id,) in ids()],
+        ),
+        Benchmark(
+            "get_popular_books",
+            book_repository.get_popular_books,
+            [(rng.randint(1, MAX_WINDOW_DAYS), 20) for _ in range(n)],
+        ),
+        Benchmark(
+            "update_book",
+            book_repository.update_book,
+            [(book_id, BookUpdate(title="Retitled")) for (book_id,) in ids()],
+        ),
+        Benchmark(
+            "mark_book_unavailable",
+            book_repository.mark_book_unavailable,
+            [(i,) for i in new_books],
+        ),
+        Benchmark(
+            "mark_book_available",
+            book_repository.mark_book_available,
+            [(i,) for i in new_books],
+        ),
+        Benchmark(
+            "delete_book", book_repository.delete_book, [(i,) for i in new_books]
+        ),
+        Benchmark(
+            "create_books",
+            book_repository.create_books,
+            [
+                ([BookCreate(title="Bulk", author="Anon")] * BATCH_SIZE,)
+                for _ in range(batches)
+            ],
+            BATCH_SIZE,
+        ),
+        # Borrowing
+        Benchmark(
+            "borrow_book",
+            borrow_repository.borrow_book,
+            [(rng.randint(1, size), book_id) for book_id in free_books],
+        ),
+        Benchmark(
+            "return_book",
+            borrow_repository.return_book,
+            [(borrow_id,) for borrow_id in open_loans],
+        ),
+        Benchmark(
+            "borrow_books",
+            borrow_repository.borrow_books,
+            [
+                (
+                    [
+                        (rng.randint(1, size), book_id)
+                        for book_id in batch_books[start : start + BATCH_SIZE]
+                    ],
+                )
+                for start in range(0, len(batch_books), BATCH_SIZE)
+            ],
+            BATCH_SIZE,
+        ),
+        Benchmark(
+            "return_books",
+            borrow_repository.return_books,
+            [
+                (list(range(start, start + BATCH_SIZE)),)
+                for start in range(
+                    first_new_loan + n,
+                    first_new_loan + n + batches * BATCH_SIZE,
+                    BATCH_SIZE,
+                )
+            ],
+            BATCH_SIZE,
+        ),
+        Benchmark(
+            "get_borrow_records_by_user",
+            borrow_repository.get_borrow_records_by_user,
+            ids(),
+        ),
+        Benchmark("count_active_loans", borrow_repository.count_active_loans, ids()),
+        Benchmark(
+            "get_active_borrow_records_by_user",
+            borrow_repository.get_active_borrow_records_by_user,
+            ids(),
+        ),
+        Benchmark(
+            "get_active_borrow_record",
+            borrow_repository.get_active_borrow_record,
+            [(i, i) for i in rng.choices(range(size // 4 + 1, size // 2 + 1), k=n)],
+        ),
+        Benchmark(
+            "list_borrow_records",
+            borrow_repository.list_borrow_records,
+            [(after, 100) for (after,) in ids()],
+        ),
+        Benchmark(
+            "list_borrow_records_open",
+            borrow_repository.list_borrow_records,
+            [(after, 100, False) for (after,) in ids()],
+        ),
+        Benchmark(
+            "iter_borrow_records",
+            drained(borrow_repository.iter_borrow_records),
+            [()] * SCAN_ITERATIONS,
+        ),
+        Benchmark(
+            "get_all_borrow_records",
+            borrow_repository.get_all_borrow_records,
+            [()] * SCAN_ITERATIONS,
+        ),
+        Benchmark(
+            "get_overdue_borrow_records",
+            borrow_repository.get_overdue_borrow_records,
+            [(100,)] * n,
+        ),
+        # Statistics
+        Benchmark(
+            "get_loans_per_day",
+            borrow_repository.get_loans_per_day,
+            [(None, None)] * n,
+        ),
+        Benchmark(
+            "get_most_borrowed_books",
+            borrow_repository.get_most_borrowed_books,
+            [(10,)] * n,
+        ),
+        Benchmark(
+            "get_top_borrowers", borrow_repository.get_top_borrowers, [(10,)] * n
+        ),
+        Benchmark("get_loan_duration", borrow_repository.get_loan_duration, [()] * n),
+        # Reservations, on the books `borrow_book` lent out
+        Benchmark(
+            "reserve_book",
+            reservation_repository.reserve_book,
+            [
+                (ReservationCreate(user_id=book_id, book_id=book_id),)
+                for book_id in free_books
+            ],
+        ),
+        Benchmark(
+            "get_reservation",
+            reservation_repository.get_reservation,
+            [(i,) for i in reservations],
+        ),
+        Benchmark(
+            "get_waitlist",
+            reservation_repository.get_waitlist,
+            [(book_id,) for book_id in free_books],
+        ),
+        Benchmark(
+            "cancel_reservation",
+            reservation_repository.cancel_reservation,
+            [(i,) for i in reservations],
+        ),
+        Benchmark(
+            "wait_for_reservation",
+            awaited(reservation_repository.wait_for_reservation),
+            [(i, 1.0) for i in reservations],
+        ),
+        # Flags every open loan, so it runs last
+        Benchmark(
+            "flag_overdue_loans",
+            borrow_repository.flag_overdue_loans,
+            [(past_due,)] * SCAN_ITERATIONS,
+        ),
+    ]
+    missing = repository_methods() - {benchmark.method.__name__ for benchmark in suite}
+    if missing:
+        raise RuntimeError(f"No benchmark for {', '.join(sorted(missing))}")
+    return suite
+
+
+def run(benchmark: Benchmark) -> dict[str, float]:
+    """
+    Times every call of a benchmark.
+
+    Args:
+        benchmark (Benchmark): The benchmark to run.
+
+    Returns:
+        dict[str, float]: Calls made, mean microseconds per call and entities
+            handled per second.
+    """
+    method = benchmark.method
+    start = time.perf_counter_ns()
+    for args in benchmark.calls:
+        method(*args)
+    elapsed = (time.perf_counter_ns() - start) / 1e9
+    calls = len(benchmark.calls)
+    return {
+        "calls": calls,
+        "mean_us": elapsed / calls * 1e6,
+        "items_per_sec": calls * benchmark.items_per_call / elapsed,
+    }
+
+
+def run_size(size: int, iterations: int, backend: str) -> dict[str, dict[str, float]]:
+    """
+    Populates a fresh store of the given size and runs every benchmark on it.
+
+    Args:
+        size (int): Number of users and books to start from.
+        iterations (int): Calls per benchmark.
+        backend (str): "memory" or "sqlite".
+
+    Returns:
+        dict[str, dict[str, float]]: Metrics keyed by `<backend>/<size>/<name>`.
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        store = data_store
+        if backend == "sqlite":
+            store = SqliteStore(Path(directory) / "bench.db")
+            use_store(store)
+        store.reset()
+        try:
+            start = time.perf_counter()
+            populate(size)
+            print(f"{backend}/{size}: populated in {time.perf_counter() - start:.1f}s")
+            results = {}
+            for benchmark in benchmarks(size, iterations):
+                metrics = run(benchmark)
+                name = f"{backend}/{size}/{benchmark.name}"
+                results[name] = metrics
+                print(
+                    f"{name:<48} {metrics['mean_us']:>12.1f}us "
+                    f"{metrics['items_per_sec']:>14,.0f}/s"
+                )
+        finally:
+            if store is not data_store:
+                use_store(data_store)
+                store.close()
+            data_store.reset()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", default="10000,100000,1000000")
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--backend", choices=["memory", "sqlite"], default="memory")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(",")]
+    results = {}
+    for size in sizes:
+        results.update(run_size(size, args.iterations, args.backend))
+    write_results(
+        args.output,
+        "repositories",
+        {"sizes": sizes, "iterations": args.iterations, "backend": args.backend},
+        results,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+import asyncio
+import threading
+
+import pytest
+
+from app.models.book import BookCreate
+from app.models.reservation import ReservationCreate
+from app.models.user import UserCreate
+from app.repositories import (
+    AsyncBookRepository,
+    BookRepository,
+    BorrowRepository,
+    ReservationRepository,
+    UserRepository,
+    async_book_repository,
+    data_store,
+)
+from app.repositories.sqlite import SqliteStore
+
+
+@pytest.fixture(autouse=True)
+def run_before_tests():
+    """
+    Fixture to run before each test.
+    It resets the data_store to ensure test isolation.
+    """
+    data_store.reset()
+    yield
+    data_store.reset()
+
+
+def run_recording_threads(store, repository):
+    """
+    Creates and reads a book through an async repository, returning the
+    thread of the event loop, the threads the mutation was published on and
+    the threads the book was read on.
+    """
+    writes, reads = [], []
+    store.listeners.append(lambda _mutation: writes.append(threading.get_ident()))
+    get = store.get
+
+    def recording_get(collection, entity_id):
+        reads.append(threading.get_ident())
+        return get(collection, entity_id)
+
+    store.get = recording_get
+
+    async def scenario():
+        book = await repository.create_book(BookCreate(title="Dune", author="Anon"))
+        assert await repository.get_book(book.id) == book
+        return threading.get_ident()
+
+    try:
+        return asyncio.run(scenario()), writes, reads
+    finally:
+        store.listeners.pop()
+        del store.get
+
+
+def test_memory_operations_run_on_the_event_loop():
+    # Act
+    loop_thread, writes, reads = run_recording_threads(
+        data_store, async_book_repository
+    )
+
+    # Assert
+    assert reads == [loop_thread]
+    assert writes == [loop_thread]
+
+
+def test_contended_memory_writes_wait_in_the_threadpool():
+    # Arrange
+    book = BookRepository(data_store).create_book(
+        BookCreate(title="Dune", author="Anon")
+    )
+    writes = []
+    data_store.listeners.append(lambda _mutation: writes.append(threading.get_ident()))
+    locked, release = threading.Event(), threading.Event()
+
+    def hold_book():
+        with data_store.lock_books(book.id):
+            locked.set()
+            release.wait()
+
+    holder = threading.Thread(target=hold_book)
+    holder.start()
+    locked.wait()
+
+    async def scenario():
+        asyncio.get_running_loop().call_later(0.05, release.set)
+        updated = await async_book_repository.mark_book_unavailable(book.id)
+        return threading.get_ident(), updated
+
+    # Act
+    try:
+        loop_thread, updated = asyncio.run(scenario())
+    finally:
+        release.set()
+        holder.join()
+        data_store.listeners.pop()
+
+    # Assert
+    assert updated.is_available is False
+    assert len(writes) == 1
+    assert writes[0] not in (loop_thread, holder.ident)
+
+
+def test_blocking_store_operations_run_in_the_threadpool(tmp_path):
+    # Arrange
+    store = SqliteStore(tmp_path / "e-lib.db")
+    repository = AsyncBookRepository(BookRepository(store))
+
+    # Act
+    loop_thread, writes, reads = run_recording_threads(store, repository)
+
+    # Assert
+    assert len(writes) == 1
+    assert writes[0] != loop_thread
+    assert loop_thread not in reads
+    store.close()
+
+
+def test_reservation_waits_read_blocking_stores_in_the_threadpool(tmp_path):
+    # Arrange
+    store = SqliteStore(tmp_path / "e-lib.db")
+    users = UserRepository(store)
+    ann, ben = (
+        users.create_user(UserCreate(name=name, email=f"{name}@example.com"))
+        for name in ("Ann", "Ben")
+    )
+    book = BookRepository(store).create_book(BookCreate(title="Dune", author="Anon"))
+    BorrowRepository(store).borrow_book(ann.id, book.id)
+    reservations = ReservationRepository(store)
+    reservation = reservations.reserve_book(
+        ReservationCreate(user_id=ben.id, book_id=book.id)
+    )
+    reads = []
+    get = store.get
+
+    def recording_get(collection, entity_id):
+        reads.append(threading.get_ident())
+        return get(collection, entity_id)
+
+    store.get = recording_get
+
+    async def scenario():
+        waited = await reservations.wait_for_reservation(reservation.id, timeout=0)
+        return threading.get_ident(), waited
+
+    # Act
+    loop_thread, waited = asyncio.run(scenario())
+
+    # Assert
+    assert waited == reservation
+    assert len(reads) == 2
+    assert loop_thread not in reads
+    del store.get
+    store.close()
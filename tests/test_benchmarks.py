@@ -0,0 +1,70 @@
+import asyncio
+
+import pytest
+
+from app.repositories import data_store
+from benchmarks.compare import compare
+from benchmarks.load import parse_mix, run_load
+from benchmarks.repositories import repository_methods, run_size
+
+
+@pytest.fixture(autouse=True)
+def run_before_tests():
+    """
+    Fixture to run before each test.
+    It resets the data_store to ensure test isolation.
+    """
+    data_store.reset()
+    yield
+    data_store.reset()
+
+
+def test_repository_benchmarks_run_every_method():
+    # Act
+    results = run_size(400, iterations=50, backend="memory")
+
+    # Assert
+    assert {name.split("/")[-1] for name in results} >= repository_methods()
+    assert "wait_for_reservation" in repository_methods()
+    assert all(metrics["mean_us"] > 0 for metrics in results.values())
+
+
+def test_load_run_reports_latency_without_errors():
+    # Act
+    results = asyncio.run(
+        run_load(
+            200,
+            clients=4,
+            requests=200,
+            weights=parse_mix("read=50,borrow=25,return=25"),
+        )
+    )
+
+    # Assert
+    assert results["total"]["requests"] == 200
+    assert results["total"]["errors"] == 0
+    assert {"borrow", "return"} <= results.keys()
+    assert results["total"]["p50_ms"] <= results["total"]["p99_ms"]
+
+
+def test_compare_flags_regressions_only():
+    # Arrange
+    baseline = {
+        "results": {"get_user": {"mean_us": 1.0, "items_per_sec": 1000, "calls": 5}}
+    }
+    slower = {
+        "results": {"get_user": {"mean_us": 1.5, "items_per_sec": 700, "calls": 9}}
+    }
+    faster = {
+        "results": {"get_user": {"mean_us": 0.5, "items_per_sec": 2000, "calls": 9}}
+    }
+
+    # Act
+    regressions = compare(baseline, slower, threshold=0.2)
+
+    # Assert
+    assert [(name, metric) for name, metric, *_ in regressions] == [
+        ("get_user", "mean_us"),
+        ("get_user", "items_per_sec"),
+    ]
+    assert compare(baseline, faster, threshold=0.2) == []
@@ -0,0 +1,192 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from app import main
+from app.config import Settings
+from app.main import app
+from app.models.book import Book, BookCreate
+from app.models.user import UserCreate
+from app.repositories import (
+    BookRepository,
+    BorrowRepository,
+    UserRepository,
+    book_repository,
+    data_store,
+)
+from app.repositories.cache import EntityCache, disable_cache, enable_cache
+from app.repositories.sqlite import SqliteStore
+
+client = TestClient(app)
+
+
+@pytest.fixture(autouse=True)
+def run_before_tests():
+    """
+    Fixture to run before each test.
+    It resets the data_store to ensure test isolation.
+    """
+    data_store.reset()
+    yield
+    data_store.reset()
+
+
+class Loader:
+    """
+    Stands in for a store, counting the loads.
+    """
+
+    def __init__(self):
+        self.loads = 0
+
+    def __call__(self, book_id: int) -> Book:
+        self.loads += 1
+        return Book(id=book_id, title=f"Book {book_id}", author="Anon")
+
+
+def test_evicts_the_least_recently_used_and_expired_entries():
+    # Arrange
+    now = [0.0]
+    cache = EntityCache("books", capacity=2, ttl=10, clock=lambda: now[0])
+    load = Loader()
+    cache.get(1, load)
+    cache.get(2, load)
+
+    # Act
+    cache.get(1, load)  # 2 is now the least recently used
+    cache.get(3, load)  # evicts 2
+    cache.get(1, load)
+    cache.get(2, load)  # evicts 3
+    now[0] = 10.0
+    cache.get(1, load)  # expired
+
+    # Assert
+    assert load.loads == 5
+    assert (cache.hits, cache.misses, cache.evictions) == (2, 5, 2)
+    assert len(cache) == 2
+
+
+def test_returns_copies():
+    # Arrange
+    cache = EntityCache("books")
+    load = Loader()
+    cache.get(1, load).title = "Changed"
+
+    # Act
+    book = cache.get(1, load)
+
+    # Assert
+    assert book.title == "Book 1"
+
+
+def test_does_not_cache_a_load_overtaken_by_a_write():
+    # Arrange
+    cache = EntityCache("books")
+
+    def load(book_id: int) -> Book:
+        # The book changes while it is being read
+        cache.invalidate([book_id])
+        return Book(id=book_id, title="Old", author="Anon")
+
+    # Act
+    cache.get(1, load)
+
+    # Assert
+    assert len(cache) == 0
+    assert cache.get(1, Loader()).title == "Book 1"
+
+
+def test_writes_invalidate_cached_entities():
+    # Arrange
+    books = BookRepository(data_store)
+    users = UserRepository(data_store)
+    enable_cache(books)
+    enable_cache(users)
+    book = books.create_book(BookCreate(title="Dune", author="Herbert"))
+    user = users.create_user(UserCreate(name="Alice", email="alice@example.com"))
+    books.get_book(book.id)
+    users.get_user(user.id)
+
+    try:
+        # Act
+        BorrowRepository(data_store).borrow_book(user.id, book.id)
+        borrowed = books.get_book(book.id)
+        users.deactivate_user(user.id)
+        deactivated = users.get_user(user.id)
+        books.delete_book(book.id)
+        deleted = books.get_book(book.id)
+
+        # Assert
+        assert borrowed.is_available is False
+        assert deactivated.is_active is False
+        assert deleted is None
+        assert books.cache.invalidations == 2
+        assert users.cache.invalidations == 1
+    finally:
+        disable_cache(books)
+        disable_cache(users)
+
+    assert books.get_book(book.id) is None
+
+
+def test_invalidates_sqlite_entries_once_committed(tmp_path):
+    # Arrange
+    store = SqliteStore(tmp_path / "e-lib.db")
+    books = BookRepository(store)
+    cache = enable_cache(books)
+    book = books.create_book(BookCreate(title="Dune", author="Herbert"))
+    books.get_book(book.id)
+
+    # Act
+    with store.transaction():
+        books.mark_book_unavailable(book.id)
+        cached_before_commit = len(cache)
+
+    # Assert
+    assert cached_before_commit == 1
+    assert len(cache) == 0
+    assert books.get_book(book.id).is_available is False
+    store.close()
+
+
+def test_cache_metrics():
+    # Arrange
+    enable_cache(book_repository)
+    book = client.post("/books/", json={"title": "Dune", "author": "Herbert"}).json()
+    try:
+        client.get(f"/books/{book['id']}")
+        client.get(f"/books/{book['id']}")
+
+        # Act
+        response = client.get("/metrics")
+    finally:
+        disable_cache(book_repository)
+
+    # Assert
+    assert (
+        'elib_cache_requests_total{collection="books",result="hit"} 1' in response.text
+    )
+    assert (
+        'elib_cache_requests_total{collection="books",result="miss"} 1' in response.text
+    )
+    assert 'elib_cache_entries{collection="books"} 1' in response.text
+
+
+def test_shared_store_rejects_a_cache_without_ttl(monkeypatch, tmp_path):
+    # Arrange
+    monkeypatch.setattr(
+        main,
+        "settings",
+        Settings(
+            storage_backend="sqlite",
+            sqlite_path=str(tmp_path / "e-lib.db"),
+            cache=("books",),
+        ),
+    )
+
+    # Act
+    with pytest.raises(ValueError, match="ELIB_CACHE_TTL"):
+        with TestClient(app):
+            pass
+
+    # Assert
+    assert book_repository.cache is None
@@ -0,0 +1,64 @@
+from datetime import date
+
+from app.models.book import Book
+from app.models.borrow import BorrowRecord
+from app.repositories.compact import BorrowRecordTable, RowTable
+
+
+def test_borrow_record_table_round_trips_records():
+    # Arrange
+    table = BorrowRecordTable()
+    open_record = BorrowRecord(
+        id=3, user_id=7, book_id=2**40, borrow_date=date(2024, 5, 1)
+    )
+    returned = BorrowRecord(
+        id=1,
+        user_id=8,
+        book_id=9,
+        borrow_date=date(2024, 5, 1),
+        return_date=date(2024, 5, 15),
+    )
+
+    # Act
+    table[open_record.id] = open_record
+    table[returned.id] = returned
+
+    # Assert
+    assert table[3] == open_record
+    assert table[1] == returned
+    assert table.get(2) is None
+    assert list(table) == [1, 3]
+    assert len(table) == 2
+
+
+def test_borrow_record_table_deletes_records():
+    # Arrange
+    table = BorrowRecordTable()
+    record = BorrowRecord(id=1, user_id=1, book_id=1, borrow_date=date(2024, 5, 1))
+    table[1] = record
+
+    # Act
+    removed = table.pop(1)
+
+    # Assert
+    assert removed == record
+    assert 1 not in table
+    assert len(table) == 0
+    assert table.pop(1, None) is None
+
+
+def test_row_table_returns_copies_saved_only_when_put_back():
+    # Arrange
+    table = RowTable(Book)
+    table[1] = Book(id=1, title="Dune", author="Frank Herbert")
+
+    # Act
+    book = table[1]
+    book.is_available = False
+    unsaved = table[1]
+    table[1] = book
+
+    # Assert
+    assert unsaved.is_available is True
+    assert table[1].is_available is False
+    assert table[1].model_dump() == book.model_dump()
@@ -0,0 +1,305 @@
+import asyncio
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app.metrics import RequestMetrics
+from app.models.book import BookCreate
+from app.models.user import UserCreate
+from app.repositories import (
+    book_repository,
+    borrow_repository,
+    data_store,
+    user_repository,
+)
+from app.repositories.borrow import LoanLimitError
+from app.repositories.locks import LockContendedError, LockTable, no_wait
+from app.repositories.reservation import ReservationWaiters
+from app.repositories.user import DuplicateEmailError
+
+THREADS = 32
+
+
+@pytest.fixture(autouse=True)
+def run_before_tests():
+    """
+    Fixture to run before each test.
+    It resets the data_store and forces frequent thread switches so that races
+    surface quickly.
+    """
+    data_store.reset()
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    yield
+    sys.setswitchinterval(interval)
+
+
+def create_users(count):
+    return [
+        user_repository.create_user(
+            UserCreate(name=f"User {i}", email=f"user{i}@example.com")
+        )
+        for i in range(count)
+    ]
+
+
+def try_hold(locks, key):
+    try:
+        with no_wait(), locks.hold(key):
+            return True
+    except LockContendedError:
+        return False
+
+
+def test_concurrent_borrow_of_one_book_lends_it_once():
+    # Arrange
+    users = create_users(THREADS)
+    book = book_repository.create_book(BookCreate(title="Dune", author="Herbert"))
+    barrier = threading.Barrier(THREADS)
+
+    def borrow(user):
+        barrier.wait()
+        return borrow_repository.borrow_book(user.id, book.id)
+
+    # Act
+    with ThreadPoolExecutor(THREADS) as executor:
+        results = list(executor.map(borrow, users))
+
+    # Assert
+    successes = [record for record in results if record is not None]
+    assert len(successes) == 1
+    assert len(data_store.borrow_records) == 1
+    assert data_store.books[book.id].is_available is False
+
+
+def test_concurrent_borrows_by_one_user_respect_the_loan_limit():
+    # Arrange
+    (user,) = create_users(1)
+    books = [
+        book_repository.create_book(BookCreate(title=f"Book {i}", author="Anon"))
+        for i in range(THREADS)
+    ]
+    barrier = threading.Barrier(THREADS)
+
+    def borrow(book):
+        barrier.wait()
+        try:
+            return borrow_repository.borrow_book(user.id, book.id)
+        except LoanLimitError:
+            return None
+
+    # Act
+    with ThreadPoolExecutor(THREADS) as executor:
+        results = list(executor.map(borrow, books))
+
+    # Assert
+    limit = borrow_repository.max_active_loans
+    assert sum(record is not None for record in results) == limit
+    assert data_store.count_active_loans(user.id) == limit
+    assert len(borrow_repository.get_active_borrow_records_by_user(user.id)) == limit
+
+
+def test_concurrent_borrow_and_return_keeps_one_active_loan():
+    # Arrange
+    users = create_users(THREADS)
+    book = book_repository.create_book(BookCreate(title="Emma", author="Austen"))
+    rounds = 50
+
+    def hammer(user):
+        borrowed = 0
+        for _ in range(rounds):
+            record = borrow_repository.borrow_book(user.id, book.id)
+            if record:
+                assert borrow_repository.return_book(record.id) is not None
+                borrowed += 1
+        return borrowed
+
+    # Act
+    with ThreadPoolExecutor(THREADS) as executor:
+        total = sum(executor.map(hammer, users))
+
+    # Assert
+    ids = list(data_store.borrow_records)
+    assert len(ids) == total == len(set(ids))
+    assert ids == list(range(1, total + 1))
+    assert data_store.active_borrow_records == {}
+    assert data_store.books[book.id].is_available is True
+
+
+def test_concurrent_creates_get_unique_ids():
+    # Act
+    with ThreadPoolExecutor(THREADS) as executor:
+        books = list(
+            executor.map(
+                lambda i: book_repository.create_book(
+                    BookCreate(title=f"Book {i}", author="Anon")
+                ),
+                range(THREADS * 20),
+            )
+        )
+
+    # Assert
+    assert sorted(book.id for book in books) == list(range(1, THREADS * 20 + 1))
+    assert len(data_store.books) == THREADS * 20
+
+
+def test_concurrent_creates_with_one_email_register_it_once():
+    # Arrange
+    barrier = threading.Barrier(THREADS)
+
+    def create(i):
+        user_create = UserCreate(name=f"User {i}", email="same@example.com")
+        barrier.wait()
+        try:
+            user_repository.create_user(user_create)
+        except DuplicateEmailError:
+            return False
+        return True
+
+    # Act
+    with ThreadPoolExecutor(max_workers=THREADS) as executor:
+        outcomes = list(executor.map(create, range(THREADS)))
+
+    # Assert
+    assert outcomes.count(True) == 1
+    assert len(data_store.users) == 1
+
+
+def test_concurrent_overlapping_batches_do_not_deadlock():
+    # Arrange
+    users = create_users(THREADS)
+    books = book_repository.create_books(
+        [BookCreate(title=f"Book {i}", author="Anon") for i in range(10)]
+    )
+    book_ids = [book.id for book in books]
+    barrier = threading.Barrier(THREADS)
+
+    def borrow_batch(user):
+        # Each thread asks for the same books in a different order
+        shift = user.id % len(book_ids)
+        pairs = [(user.id, book_id) for book_id in book_ids[shift:] + book_ids[:shift]]
+        barrier.wait()
+        return borrow_repository.borrow_books(pairs)
+
+    # Act
+    with ThreadPoolExecutor(THREADS) as executor:
+        results = list(executor.map(borrow_batch, users))
+
+    # Assert
+    lent = [
+        outcome.book_id
+        for outcomes in results
+        for outcome in outcomes
+        if not isinstance(outcome, str)
+    ]
+    assert sorted(lent) == book_ids
+    assert len(data_store.active_borrow_records) == len(book_ids)
+
+
+def test_lock_table_without_waiting_releases_the_locks_it_took():
+    # Arrange
+    locks = LockTable()
+    held = threading.Event()
+    release = threading.Event()
+
+    def hold():
+        with locks.hold(2):
+            held.set()
+            release.wait()
+
+    holder = threading.Thread(target=hold)
+    holder.start()
+    held.wait()
+
+    # Act
+    with no_wait(), pytest.raises(LockContendedError) as contended:
+        with locks.hold(1, 2):
+            pass
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        # Another thread can take the lock only if it was released
+        first_free = executor.submit(try_hold, locks, 1).result()
+    release.set()
+    holder.join()
+
+    # Assert
+    assert contended.value.key == 2
+    assert first_free is True
+    assert len(locks) == 0
+
+
+def test_lock_table_keeps_a_lock_while_it_is_waited_for():
+    # Arrange
+    locks = LockTable()
+    held = threading.Event()
+    release = threading.Event()
+    order = []
+
+    def hold(name):
+        with locks.hold(1):
+            order.append(name)
+            if name == "first":
+                held.set()
+                release.wait()
+
+    first = threading.Thread(target=hold, args=("first",))
+    first.start()
+    held.wait()
+    waiter = threading.Thread(target=hold, args=("waiter",))
+    waiter.start()
+    while len(locks) and locks._locks[1][1] < 2:
+        time.sleep(0.001)
+
+    # Act
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        taken_while_held = executor.submit(try_hold, locks, 1).result()
+    release.set()
+    first.join()
+    waiter.join()
+
+    # Assert
+    assert taken_while_held is False
+    assert order == ["first", "waiter"]
+    assert len(locks) == 0
+
+
+def test_request_metrics_merge_all_threads():
+    # Arrange
+    metrics = RequestMetrics(buckets=(0.5,))
+
+    def observe(i):
+        metrics.observe("GET", "/books/{book_id}", 200, i % 2)
+
+    # Act
+    with ThreadPoolExecutor(max_workers=THREADS) as executor:
+        list(executor.map(observe, range(1000)))
+
+    # Assert
+    assert metrics.collect() == {("GET", "/books/{book_id}", 200): [500, 500, 500]}
+
+
+def test_reservation_waiters_poll_for_changes_made_elsewhere():
+    # Arrange
+    waiters = ReservationWaiters(poll_interval=0.01)
+    checks = []
+
+    async def settled():
+        # Settled by another process, which cannot notify this one
+        checks.append(True)
+        return len(checks) >= 3
+
+    async def never_settled():
+        return False
+
+    # Act
+    start = time.perf_counter()
+    notified = asyncio.run(waiters.wait(1, timeout=10, settled=settled))
+    elapsed = time.perf_counter() - start
+    timed_out = asyncio.run(waiters.wait(2, timeout=0.05, settled=never_settled))
+
+    # Assert
+    assert notified is True
+    assert elapsed < 1
+    assert timed_out is False
@@ -0,0 +1,169 @@
+import asyncio
+import json
+import threading
+
+import pytest
+
+from app.events import SUBSCRIBER_BUFFER, EventHub
+from app.models.book import Book, BookCreate
+from app.models.user import UserCreate
+from app.repositories import (
+    book_repository,
+    borrow_repository,
+    data_store,
+    user_repository,
+)
+from app.repositories.book import BookRepository
+from app.repositories.mutations import Mutation
+from app.repositories.sqlite import SqliteStore
+from app.routes.events import event_stream
+
+
+@pytest.fixture(autouse=True)
+def run_before_tests():
+    """
+    Fixture to run before each test.
+    It resets the data_store to ensure test isolation.
+    """
+    data_store.reset()
+    yield
+    data_store.reset()
+
+
+@pytest.fixture
+def hub():
+    """
+    An EventHub publishing the changes made to the data_store, as the app's.
+    """
+    hub = EventHub()
+    data_store.listeners.append(hub.publish)
+    yield hub
+    data_store.listeners.remove(hub.publish)
+
+
+def book_mutation(book_id: int) -> Mutation:
+    book = Book(id=book_id, title=f"Book {book_id}", author="Anon")
+    return Mutation("create_book", puts=(("books", book),))
+
+
+def test_repository_mutations_reach_subscribers(hub):
+    async def scenario():
+        subscription = await hub.subscribe()
+        user = user_repository.create_user(
+            UserCreate(name="Ann", email="ann@example.com")
+        )
+        book = book_repository.create_book(BookCreate(title="Dune", author="Anon"))
+        await asyncio.to_thread(borrow_repository.borrow_book, user.id, book.id)
+        events = [await asyncio.wait_for(subscription.queue.get(), 5) for _ in range(2)]
+        hub.unsubscribe(subscription)
+        return events
+
+    # Act
+    created, borrowed = asyncio.run(scenario())
+
+    # Assert
+    assert (created.op, borrowed.op) == ("create_book", "borrow_book")
+    assert borrowed.seq == created.seq + 1
+    data = json.loads(borrowed.data)
+    assert [put["collection"] for put in data["puts"]] == ["borrow_records", "books"]
+    assert data["puts"][1]["entity"]["is_available"] is False
+
+
+def test_subscribe_resumes_from_history_or_resets():
+    # Arrange
+    hub = EventHub(history_size=3)
+    for book_id in range(1, 6):
+        hub.publish(book_mutation(book_id))
+
+    async def subscribe(last_seq):
+        subscription = await hub.subscribe(last_seq)
+        hub.unsubscribe(subscription)
+        return subscription.backlog
+
+    # Act
+    resumed = asyncio.run(subscribe(3))
+    too_old = asyncio.run(subscribe(1))
+    current = asyncio.run(subscribe(5))
+
+    # Assert
+    assert [event.seq for event in resumed] == [4, 5]
+    assert [(event.op, event.seq) for event in too_old] == [("reset", 5)]
+    assert current == []
+
+
+def test_slow_subscriber_is_dropped():
+    # Arrange
+    hub = EventHub()
+
+    async def scenario():
+        subscription = await hub.subscribe()
+        for book_id in range(SUBSCRIBER_BUFFER + 1):
+            hub.publish(book_mutation(book_id))
+        await asyncio.sleep(0.05)
+        return subscription, [chunk async for chunk in event_stream(hub, subscription)]
+
+    # Act
+    subscription, chunks = asyncio.run(scenario())
+
+    # Assert
+    assert subscription.dropped is True
+    assert chunks == ["event: overflow\ndata: {}\n\n"]
+    assert hub.subscribers == 0
+
+
+def test_hubs_sharing_a_database_see_every_change(tmp_path):
+    # Arrange
+    first_store = SqliteStore(tmp_path / "e-lib.db")
+    second_store = SqliteStore(tmp_path / "e-lib.db")
+    first, second = EventHub(), EventHub()
+    for store, hub in ((first_store, first), (second_store, second)):
+        hub.share(store)
+        store.listeners.append(hub.publish)
+
+    # Act
+    BookRepository(first_store).create_book(BookCreate(title="Dune", author="Anon"))
+    BookRepository(second_store).create_book(BookCreate(title="Emma", author="Anon"))
+    first.catch_up()
+    second.catch_up()
+
+    # Assert
+    for hub in (first, second):
+        assert [(event.seq, event.op) for event in hub.history] == [
+            (1, "create_book"),
+            (2, "create_book"),
+        ]
+    assert json.loads(second.history[0].data)["puts"][0]["entity"]["title"] == "Dune"
+    first_store.close()
+    second_store.close()
+
+
+def test_subscribing_reads_a_shared_log_off_the_event_loop(tmp_path):
+    # Arrange
+    store = SqliteStore(tmp_path / "e-lib.db")
+    hub = EventHub()
+    hub.share(store)
+    store.listeners.append(hub.publish)
+    BookRepository(store).create_book(BookCreate(title="Dune", author="Anon"))
+    reads = []
+    changes_since = store.changes_since
+
+    def recording_changes_since(*args):
+        reads.append(threading.get_ident())
+        return changes_since(*args)
+
+    store.changes_since = recording_changes_since
+
+    async def scenario():
+        subscription = await hub.subscribe(0)
+        hub.unsubscribe(subscription)
+        return threading.get_ident(), subscription.backlog
+
+    # Act
+    loop_thread, backlog = asyncio.run(scenario())
+
+    # Assert
+    assert [event.op for event in backlog] == ["create_book"]
+    assert reads
+    assert loop_thread not in reads
+    del store.changes_since
+    store.close()
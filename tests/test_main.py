@@ -1,7 +1,15 @@
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
 import pytest
 from fastapi.testclient import TestClient
 
 from app.main import app
+from app.metrics import request_metrics
+from app.repositories import borrow_repository
+from app.routes.pagination import encode_cursor
 
 client = TestClient(app)
 
@@ -14,12 +22,7 @@ def run_before_tests():
     """
     from app.repositories import data_store
 
-    data_store.users.clear()
-    data_store.books.clear()
-    data_store.borrow_records.clear()
-    data_store.user_id_seq = 1
-    data_store.book_id_seq = 1
-    data_store.borrow_id_seq = 1
+    data_store.reset()
     yield
 
 
@@ -185,6 +188,19 @@ def test_update_book():
     assert data["author"] == "Ray Bradbury"
 
 
+def test_update_book_rejects_null_fields():
+    # Arrange
+    client.post("/books/", json={"title": "Emma", "author": "Jane Austen"})
+
+    # Act
+    response = client.put("/books/1", json={"title": None})
+
+    # Assert
+    assert response.status_code == 422
+    assert client.get("/books/1").json()["title"] == "Emma"
+    assert [book["id"] for book in client.get("/books/search?q=emma").json()] == [1]
+
+
 def test_mark_book_unavailable():
     # Arrange
     book_data = {"title": "The Catcher in the Rye", "author": "J.D. Salinger"}
@@ -339,6 +355,31 @@ def test_return_book():
     )
 
 
+def test_borrow_book_again_after_return():
+    # Arrange
+    user_data = {"name": "Isla", "email": "isla@example.com"}
+    book_data = {"title": "Dune", "author": "Frank Herbert"}
+    client.post("/users/", json=user_data)
+    client.post("/books/", json=book_data)
+    client.post("/borrow/", json={"user_id": 1, "book_id": 1})
+    client.post("/borrow/return/1")
+
+    # Act
+    response = client.post("/borrow/", json={"user_id": 1, "book_id": 1})
+
+    # Assert
+    assert response.status_code == 201
+    assert response.json()["id"] == 2
+
+    # Act (Records for the user include both loans in order)
+    response_records = client.get("/borrow/records/user/1")
+
+    # Assert
+    assert [record["id"] for record in response_records.json()] == [1, 2]
+    assert response_records.json()[0]["return_date"] is not None
+    assert response_records.json()[1]["return_date"] is None
+
+
 def test_get_all_borrow_records():
     # Arrange
     user1 = {"name": "Jack", "email": "jack@example.com"}
@@ -423,6 +464,38 @@ def test_borrow_nonexistent_book():
     assert response.json()["detail"] == "Book not found"
 
 
+def test_borrow_beyond_loan_limit():
+    # Arrange
+    client.post("/users/", json={"name": "Olga", "email": "olga@example.com"})
+    for title in ("Dune", "Emma", "Ulysses", "Walden"):
+        client.post("/books/", json={"title": title, "author": "Anon"})
+    limit = borrow_repository.max_active_loans
+    borrow_repository.max_active_loans = 2
+    try:
+        client.post("/borrow/", json={"user_id": 1, "book_id": 1})
+        client.post("/borrow/", json={"user_id": 1, "book_id": 2})
+
+        # Act
+        rejected = client.post("/borrow/", json={"user_id": 1, "book_id": 3})
+        batch = client.post(
+            "/borrow/batch", json={"items": [{"user_id": 1, "book_id": 4}]}
+        )
+        active = client.get("/users/1/loans/active")
+        client.post("/borrow/return/1")
+        accepted = client.post("/borrow/", json={"user_id": 1, "book_id": 3})
+    finally:
+        borrow_repository.max_active_loans = limit
+
+    # Assert
+    assert rejected.status_code == 409
+    assert rejected.json()["detail"] == "User has reached the maximum number of loans"
+    assert batch.json()["items"][0]["status_code"] == 409
+    assert [record["book_id"] for record in active.json()] == [1, 2]
+    assert accepted.status_code == 201
+    assert client.get("/users/1/loans/active").json()[-1]["book_id"] == 3
+    assert client.get("/users/999/loans/active").status_code == 404
+
+
 def test_return_nonexistent_borrow_record():
     # Arrange
     # No setup required as the borrow record does not exist
@@ -436,3 +509,615 @@ def test_return_nonexistent_borrow_record():
         response.json()["detail"]
         == "Cannot return book. Check if borrow record exists and book is not already returned."
     )
+
+
+def test_list_books_paginated():
+    # Arrange
+    for i in range(5):
+        client.post("/books/", json={"title": f"Book {i}", "author": "Anon"})
+    client.delete("/books/2")
+    client.patch("/books/4/mark_unavailable")
+
+    # Act
+    first_page = client.get("/books/", params={"limit": 2})
+    second_page = client.get(
+        "/books/", params={"limit": 2, "after": first_page.headers["X-Next-Cursor"]}
+    )
+
+    # Assert
+    assert first_page.status_code == 200
+    assert [book["id"] for book in first_page.json()] == [1, 3]
+    assert [book["id"] for book in second_page.json()] == [4, 5]
+
+    # Act (Filter by availability)
+    response = client.get("/books/", params={"is_available": False})
+
+    # Assert
+    assert [book["id"] for book in response.json()] == [4]
+    assert "X-Next-Cursor" not in response.headers
+
+
+def test_list_users_paginated():
+    # Arrange
+    for name in ["Olga", "Paul", "Quinn"]:
+        client.post("/users/", json={"name": name, "email": f"{name}@example.com"})
+    client.patch("/users/2/deactivate")
+
+    # Act
+    response = client.get("/users/", params={"is_active": True})
+
+    # Assert
+    assert response.status_code == 200
+    assert [user["name"] for user in response.json()] == ["Olga", "Quinn"]
+
+
+def test_list_with_invalid_cursor():
+    # Act
+    response = client.get("/users/", params={"after": "not-a-cursor"})
+    rejected = [
+        client.get("/books/", params={"after": encode_cursor(value)}).status_code
+        for value in ("1_0", " 1", "-1", "+1", str(2**63))
+    ]
+    largest = client.get("/books/", params={"after": encode_cursor(2**63 - 1)})
+
+    # Assert
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Invalid cursor"
+    assert rejected == [400] * 5
+    assert largest.json() == []
+
+
+def test_get_borrow_records_filtered_by_return_status():
+    # Arrange
+    client.post("/users/", json={"name": "Rita", "email": "rita@example.com"})
+    for book_id, title in enumerate(["Ulysses", "Beloved", "Middlemarch"], start=1):
+        client.post("/books/", json={"title": title, "author": "Anon"})
+        client.post("/borrow/", json={"user_id": 1, "book_id": book_id})
+    client.post("/borrow/return/2")
+
+    # Act
+    open_loans = client.get("/borrow/records", params={"is_returned": False})
+    returned = client.get("/borrow/records", params={"is_returned": True})
+    paged = client.get(
+        "/borrow/records",
+        params={"is_returned": False, "limit": 1},
+    )
+
+    # Assert
+    assert [record["id"] for record in open_loans.json()] == [1, 3]
+    assert [record["id"] for record in returned.json()] == [2]
+    assert [record["id"] for record in paged.json()] == [1]
+    next_page = client.get(
+        "/borrow/records",
+        params={
+            "is_returned": False,
+            "limit": 1,
+            "after": paged.headers["X-Next-Cursor"],
+        },
+    )
+    assert [record["id"] for record in next_page.json()] == [3]
+
+
+def test_export_borrow_records_as_ndjson():
+    # Arrange
+    client.post("/users/", json={"name": "Olga", "email": "olga@example.com"})
+    for book_id, title in enumerate(("Emma", "Persuasion"), start=1):
+        client.post("/books/", json={"title": title, "author": "Jane Austen"})
+        client.post("/borrow/", json={"user_id": 1, "book_id": book_id})
+    client.post("/borrow/return/1")
+
+    # Act
+    response = client.get("/borrow/records/export")
+
+    # Assert
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    records = [json.loads(line) for line in response.text.splitlines()]
+    assert [record["id"] for record in records] == [1, 2]
+    assert records[0]["return_date"] == date.today().isoformat()
+    assert records[1]["return_date"] is None
+
+
+def test_export_borrow_records_as_csv_filtered_by_date():
+    # Arrange
+    client.post("/users/", json={"name": "Pavel", "email": "pavel@example.com"})
+    client.post("/books/", json={"title": "Oblomov", "author": "Ivan Goncharov"})
+    client.post("/borrow/", json={"user_id": 1, "book_id": 1})
+    today = date.today()
+
+    # Act
+    response = client.get("/borrow/records/export", params={"format": "csv"})
+    past = client.get(
+        "/borrow/records/export",
+        params={"format": "csv", "borrowed_to": today - timedelta(days=1)},
+    )
+
+    # Assert
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+    due = today + timedelta(days=14)
+    assert response.text.splitlines() == [
+        "id,user_id,book_id,borrow_date,return_date,due_date,is_overdue,version",
+        f"1,1,1,{today.isoformat()},,{due.isoformat()},False,1",
+    ]
+    assert past.text.splitlines() == [
+        "id,user_id,book_id,borrow_date,return_date,due_date,is_overdue,version"
+    ]
+
+
+def test_metrics():
+    # Arrange
+    request_metrics.reset()
+    client.post("/users/", json={"name": "Quinn", "email": "quinn@example.com"})
+    client.post("/books/", json={"title": "Ulysses", "author": "James Joyce"})
+    client.post("/books/", json={"title": "Dubliners", "author": "James Joyce"})
+    client.post("/borrow/", json={"user_id": 1, "book_id": 2})
+    client.get("/books/1")
+    client.get("/books/99")
+
+    # Act
+    response = client.get("/metrics")
+
+    # Assert
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    lines = response.text.splitlines()
+    assert (
+        'elib_http_requests_total{method="GET",route="/books/{book_id}",status="200"} 1'
+        in lines
+    )
+    assert (
+        'elib_http_requests_total{method="GET",route="/books/{book_id}",status="404"} 1'
+        in lines
+    )
+    assert (
+        "elib_http_request_duration_seconds_count"
+        '{method="POST",route="/books/"} 2' in lines
+    )
+    assert 'elib_store_entities{collection="books"} 2' in lines
+    assert 'elib_store_entities{collection="borrow_records"} 1' in lines
+    assert "elib_active_loans 1" in lines
+
+
+def test_search_books():
+    # Arrange
+    client.post("/books/", json={"title": "The Hobbit", "author": "J.R.R. Tolkien"})
+    client.post(
+        "/books/", json={"title": "Tolkien: A Biography", "author": "Carpenter"}
+    )
+    client.post(
+        "/books/", json={"title": "The Silmarillion", "author": "J.R.R. Tolkien"}
+    )
+    client.post("/books/", json={"title": "Dune", "author": "Frank Herbert"})
+
+    # Act
+    response = client.get("/books/search", params={"q": "tolk"})
+
+    # Assert
+    assert response.status_code == 200
+    assert [book["id"] for book in response.json()] == [2, 1, 3]
+
+    # Act (Every word must match; the last one as a prefix)
+    response = client.get("/books/search", params={"q": "tolkien silm"})
+
+    # Assert
+    assert [book["title"] for book in response.json()] == ["The Silmarillion"]
+
+
+def test_search_books_follows_updates_and_deletes():
+    # Arrange
+    client.post("/books/", json={"title": "Fahrenheit 451", "author": "Ray Bradbury"})
+    client.post("/books/", json={"title": "Émile", "author": "Rousseau"})
+
+    # Act
+    client.put("/books/1", json={"title": "The Martian Chronicles"})
+    client.delete("/books/2")
+
+    # Assert
+    assert client.get("/books/search", params={"q": "fahrenheit"}).json() == []
+    assert client.get("/books/search", params={"q": "emile"}).json() == []
+    response = client.get("/books/search", params={"q": "martian bradbury"})
+    assert [book["id"] for book in response.json()] == [1]
+
+
+def test_bulk_create_books():
+    # Arrange
+    client.post("/books/", json={"title": "Existing", "author": "Anon"})
+    books = [
+        {"title": "Dune", "author": "Frank Herbert"},
+        {"title": "Missing author"},
+        {"title": "Emma", "author": "Jane Austen"},
+    ]
+
+    # Act
+    response = client.post("/books/bulk", json=books)
+
+    # Assert
+    assert response.status_code == 200
+    data = response.json()
+    assert data["created"] == 2
+    assert data["failed"] == 1
+    assert [item["id"] for item in data["items"]] == [2, None, 3]
+    assert data["items"][1]["errors"][0]["loc"] == ["author"]
+    assert client.get("/books/3").json()["title"] == "Emma"
+    assert client.post("/books/", json=books[0]).json()["id"] == 4
+
+
+def test_bulk_create_users_from_ndjson():
+    # Arrange
+    body = "\n".join(
+        [
+            '{"name": "Uma", "email": "uma@example.com"}',
+            "{not json",
+            '{"name": "Victor", "email": "not-an-email"}',
+            '{"name": "Wendy", "email": "wendy@example.com"}',
+            "",
+        ]
+    )
+
+    # Act
+    response = client.post(
+        "/users/bulk",
+        content=body,
+        headers={"Content-Type": "application/x-ndjson"},
+    )
+
+    # Assert
+    assert response.status_code == 200
+    data = response.json()
+    assert (data["created"], data["failed"]) == (2, 2)
+    assert [item["index"] for item in data["items"]] == [0, 1, 2, 3]
+    assert data["items"][1]["errors"][0]["type"] == "json_invalid"
+    assert data["items"][2]["errors"][0]["loc"] == ["email"]
+    assert client.get("/users/2").json()["name"] == "Wendy"
+
+
+def test_create_user_with_duplicate_email():
+    # Arrange
+    client.post("/users/", json={"name": "Xena", "email": "xena@example.com"})
+
+    # Act
+    response = client.post(
+        "/users/", json={"name": "Other Xena", "email": "XENA@example.com"}
+    )
+
+    # Assert
+    assert response.status_code == 409
+    assert response.json()["detail"] == "Email already registered"
+
+
+def test_update_user_to_taken_email():
+    # Arrange
+    client.post("/users/", json={"name": "Yara", "email": "yara@example.com"})
+    client.post("/users/", json={"name": "Zane", "email": "zane@example.com"})
+
+    # Act
+    conflict = client.put("/users/2", json={"email": "Yara@example.com"})
+    own_email = client.put("/users/1", json={"email": "YARA@example.com"})
+
+    # Assert
+    assert conflict.status_code == 409
+    assert own_email.status_code == 200
+
+
+def test_update_user_rejects_a_null_email():
+    # Arrange
+    client.post("/users/", json={"name": "Yara", "email": "yara@example.com"})
+
+    # Act
+    response = client.put("/users/1", json={"email": None})
+
+    # Assert
+    assert response.status_code == 422
+    assert client.get("/users/1").json()["email"] == "yara@example.com"
+    assert client.get("/users/by-email/yara@example.com").json()["id"] == 1
+
+
+def test_get_user_by_email():
+    # Arrange
+    client.post("/users/", json={"name": "Abel", "email": "abel@example.com"})
+    client.post("/users/", json={"name": "Bea", "email": "bea@example.com"})
+    client.put("/users/1", json={"email": "abel@example.org"})
+    client.delete("/users/2")
+
+    # Act
+    found = client.get("/users/by-email/ABEL@example.org")
+    old_email = client.get("/users/by-email/abel@example.com")
+    deleted = client.get("/users/by-email/bea@example.com")
+
+    # Assert
+    assert found.status_code == 200
+    assert found.json()["id"] == 1
+    assert old_email.status_code == 404
+    assert deleted.status_code == 404
+    assert (
+        client.post(
+            "/users/", json={"name": "Bea", "email": "bea@example.com"}
+        ).status_code
+        == 201
+    )
+
+
+def test_bulk_create_users_with_duplicate_emails():
+    # Arrange
+    client.post("/users/", json={"name": "Cleo", "email": "cleo@example.com"})
+    users = [
+        {"name": "Cleo again", "email": "Cleo@example.com"},
+        {"name": "Dora", "email": "dora@example.com"},
+        {"name": "Dora again", "email": "DORA@example.com"},
+    ]
+
+    # Act
+    response = client.post("/users/bulk", json=users)
+
+    # Assert
+    data = response.json()
+    assert (data["created"], data["failed"]) == (1, 2)
+    assert [item["id"] for item in data["items"]] == [None, 2, None]
+    assert data["items"][0]["errors"][0]["msg"] == "Email already registered"
+
+
+def test_bulk_create_rejects_non_array():
+    # Act
+    response = client.post("/books/bulk", json={"title": "Dune"})
+
+    # Assert
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Expected a JSON array or an NDJSON stream"
+
+
+def test_borrow_books_batch():
+    # Arrange
+    client.post("/users/", json={"name": "Xena", "email": "xena@example.com"})
+    for title in ["Dune", "Emma", "Ulysses"]:
+        client.post("/books/", json={"title": title, "author": "Anon"})
+    client.patch("/books/3/mark_unavailable")
+    items = [
+        {"user_id": 1, "book_id": 1},
+        {"user_id": 1, "book_id": 2},
+        {"user_id": 1, "book_id": 3},
+        {"user_id": 1, "book_id": 999},
+        {"user_id": 2, "book_id": 1},
+    ]
+
+    # Act
+    response = client.post("/borrow/batch", json={"items": items})
+
+    # Assert
+    assert response.status_code == 200
+    data = response.json()
+    assert (data["succeeded"], data["failed"]) == (2, 3)
+    assert [item["status_code"] for item in data["items"]] == [201, 201, 400, 404, 404]
+    assert data["items"][0]["record"]["id"] == 1
+    assert data["items"][3]["detail"] == "Book not found"
+    assert client.get("/books/2").json()["is_available"] is False
+
+
+def test_borrow_books_batch_atomic():
+    # Arrange
+    client.post("/users/", json={"name": "Yuri", "email": "yuri@example.com"})
+    client.post("/books/", json={"title": "Dune", "author": "Frank Herbert"})
+    items = [{"user_id": 1, "book_id": 1}, {"user_id": 1, "book_id": 1}]
+
+    # Act
+    response = client.post("/borrow/batch", json={"items": items, "atomic": True})
+
+    # Assert
+    assert response.status_code == 409
+    assert [item["status_code"] for item in response.json()["items"]] == [424, 409]
+    assert client.get("/borrow/records").json() == []
+    assert client.get("/books/1").json()["is_available"] is True
+
+
+def test_return_books_batch():
+    # Arrange
+    client.post("/users/", json={"name": "Zoe", "email": "zoe@example.com"})
+    for title in ["Dune", "Emma"]:
+        client.post("/books/", json={"title": title, "author": "Anon"})
+    client.post(
+        "/borrow/batch",
+        json={"items": [{"user_id": 1, "book_id": 1}, {"user_id": 1, "book_id": 2}]},
+    )
+
+    # Act
+    response = client.post("/borrow/return/batch", json={"borrow_ids": [1, 2, 2, 7]})
+
+    # Assert
+    assert response.status_code == 200
+    data = response.json()
+    assert [item["status_code"] for item in data["items"]] == [200, 200, 409, 400]
+    assert data["items"][1]["record"]["return_date"] is not None
+    assert client.get("/books/1").json()["is_available"] is True
+    assert client.get("/books/2").json()["is_available"] is True
+
+
+def test_reservation_is_fulfilled_when_book_is_returned():
+    # Arrange
+    for name in ("Ann", "Ben", "Cid"):
+        client.post("/users/", json={"name": name, "email": f"{name}@example.com"})
+    client.post("/books/", json={"title": "Dune", "author": "Frank Herbert"})
+    client.post("/borrow/", json={"user_id": 1, "book_id": 1})
+    early = client.post("/reservations/", json={"user_id": 2, "book_id": 1})
+    late = client.post("/reservations/", json={"user_id": 3, "book_id": 1})
+
+    # Act
+    client.post("/borrow/return/1")
+
+    # Assert
+    assert early.status_code == 201
+    assert early.json()["status"] == "waiting"
+    fulfilled = client.get(f"/reservations/{early.json()['id']}").json()
+    assert fulfilled["status"] == "fulfilled"
+    loan = client.get("/borrow/records/user/2").json()
+    assert [record["id"] for record in loan] == [fulfilled["borrow_id"]]
+    assert client.get("/books/1").json()["is_available"] is False
+    waitlist = client.get("/reservations/book/1").json()
+    assert [reservation["id"] for reservation in waitlist] == [late.json()["id"]]
+
+
+def test_marking_a_reserved_book_available_fulfills_the_reservation():
+    # Arrange
+    client.post("/users/", json={"name": "Ann", "email": "ann@example.com"})
+    client.post("/books/", json={"title": "Dune", "author": "Frank Herbert"})
+    client.patch("/books/1/mark_unavailable")
+    client.post("/reservations/", json={"user_id": 1, "book_id": 1})
+
+    # Act
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        waiting = executor.submit(
+            client.get, "/reservations/1/wait", params={"timeout": 10}
+        )
+        time.sleep(0.2)
+        response = client.patch("/books/1/mark_available")
+        settled = waiting.result()
+
+    # Assert
+    assert response.status_code == 200
+    assert response.json()["is_available"] is False
+    assert settled.json()["status"] == "fulfilled"
+    loan = client.get("/borrow/records/user/1").json()
+    assert [record["id"] for record in loan] == [settled.json()["borrow_id"]]
+
+
+def test_deleting_a_reserved_book_cancels_the_reservations():
+    # Arrange
+    client.post("/users/", json={"name": "Ann", "email": "ann@example.com"})
+    client.post("/users/", json={"name": "Ben", "email": "ben@example.com"})
+    client.post("/books/", json={"title": "Dune", "author": "Frank Herbert"})
+    client.post("/borrow/", json={"user_id": 1, "book_id": 1})
+    client.post("/reservations/", json={"user_id": 2, "book_id": 1})
+
+    # Act
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        waiting = executor.submit(
+            client.get, "/reservations/1/wait", params={"timeout": 10}
+        )
+        time.sleep(0.2)
+        start = time.perf_counter()
+        response = client.delete("/books/1")
+        settled = waiting.result()
+        elapsed = time.perf_counter() - start
+
+    # Assert
+    assert response.status_code == 204
+    assert settled.json()["status"] == "cancelled"
+    assert elapsed < 5
+    assert client.get("/reservations/book/1").json() == []
+
+
+def test_waitlist_settles_from_the_head_and_after_cancellations():
+    # Arrange
+    from app.repositories import data_store
+
+    for name in ("Ann", "Ben", "Cid", "Dan", "Eve"):
+        client.post("/users/", json={"name": name, "email": f"{name}@example.com"})
+    client.post("/books/", json={"title": "Dune", "author": "Frank Herbert"})
+    client.post("/borrow/", json={"user_id": 1, "book_id": 1})
+    for user_id in (2, 3, 4, 5):
+        client.post("/reservations/", json={"user_id": user_id, "book_id": 1})
+    client.delete("/reservations/2")
+
+    # Act
+    twice = client.post("/reservations/", json={"user_id": 4, "book_id": 1})
+    client.post("/borrow/return/1")
+    rejoined = client.post("/reservations/", json={"user_id": 3, "book_id": 1})
+
+    # Assert
+    assert twice.json()["detail"] == "Book already reserved by the user"
+    assert client.get("/reservations/1").json()["status"] == "fulfilled"
+    assert rejoined.status_code == 201
+    waitlist = client.get("/reservations/book/1").json()
+    assert [reservation["user_id"] for reservation in waitlist] == [4, 5, 3]
+    assert set(data_store.waiting_reservations) == {(1, 4), (1, 5), (1, 3)}
+
+
+def test_reserve_book_conflicts():
+    # Arrange
+    client.post("/users/", json={"name": "Ann", "email": "ann@example.com"})
+    client.post("/users/", json={"name": "Ben", "email": "ben@example.com"})
+    client.post("/books/", json={"title": "Dune", "author": "Frank Herbert"})
+    client.post("/books/", json={"title": "Emma", "author": "Jane Austen"})
+    client.post("/borrow/", json={"user_id": 1, "book_id": 1})
+    client.post("/reservations/", json={"user_id": 2, "book_id": 1})
+
+    # Act
+    available = client.post("/reservations/", json={"user_id": 2, "book_id": 2})
+    borrowed = client.post("/reservations/", json={"user_id": 1, "book_id": 1})
+    twice = client.post("/reservations/", json={"user_id": 2, "book_id": 1})
+    cancelled = client.delete("/reservations/1")
+    again = client.delete("/reservations/1")
+
+    # Assert
+    assert available.status_code == 409
+    assert borrowed.json()["detail"] == "Book already borrowed by the user"
+    assert twice.json()["detail"] == "Book already reserved by the user"
+    assert cancelled.json()["status"] == "cancelled"
+    assert again.status_code == 409
+    assert client.get("/reservations/book/1").json() == []
+
+
+def test_wait_for_reservation_returns_once_fulfilled():
+    # Arrange
+    client.post("/users/", json={"name": "Ann", "email": "ann@example.com"})
+    client.post("/users/", json={"name": "Ben", "email": "ben@example.com"})
+    client.post("/books/", json={"title": "Dune", "author": "Frank Herbert"})
+    client.post("/borrow/", json={"user_id": 1, "book_id": 1})
+    client.post("/reservations/", json={"user_id": 2, "book_id": 1})
+
+    # Act
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        waiting = executor.submit(
+            client.get, "/reservations/1/wait", params={"timeout": 10}
+        )
+        time.sleep(0.2)
+        start = time.perf_counter()
+        client.post("/borrow/return/1")
+        response = waiting.result()
+        elapsed = time.perf_counter() - start
+    timed_out = client.get("/reservations/1/wait", params={"timeout": 0})
+
+    # Assert
+    assert response.json()["status"] == "fulfilled"
+    assert elapsed < 5
+    assert timed_out.json()["status"] == "fulfilled"
+    assert client.get("/reservations/7/wait").status_code == 404
+
+
+def test_conditional_get_book():
+    # Arrange
+    client.post("/books/", json={"title": "Emma", "author": "Jane Austen"})
+    first = client.get("/books/1")
+
+    # Act
+    unchanged = client.get("/books/1", headers={"If-None-Match": first.headers["ETag"]})
+    client.patch("/books/1/mark_unavailable")
+    changed = client.get("/books/1", headers={"If-None-Match": first.headers["ETag"]})
+
+    # Assert
+    assert first.headers["ETag"] == '"1"'
+    assert unchanged.status_code == 304
+    assert unchanged.content == b""
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] == '"2"'
+    assert changed.json()["version"] == 2
+
+
+def test_update_user_with_if_match():
+    # Arrange
+    client.post("/users/", json={"name": "Ann", "email": "ann@example.com"})
+    etag = client.get("/users/1").headers["ETag"]
+    client.patch("/users/1/deactivate")
+
+    # Act
+    stale = client.put("/users/1", json={"name": "Anna"}, headers={"If-Match": etag})
+    current = client.get("/users/1").headers["ETag"]
+    updated = client.put(
+        "/users/1", json={"name": "Anna"}, headers={"If-Match": current}
+    )
+
+    # Assert
+    assert stale.status_code == 412
+    assert stale.headers["ETag"] == current
+    assert updated.status_code == 200
+    assert updated.json()["name"] == "Anna"
+    assert updated.headers["ETag"] == '"3"'
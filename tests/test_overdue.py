@@ -0,0 +1,125 @@
+from datetime import date, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.models.book import BookCreate
+from app.models.user import UserCreate
+from app.repositories import (
+    BookRepository,
+    BorrowRepository,
+    UserRepository,
+    borrow_repository,
+    data_store,
+)
+from app.repositories.overdue import DueDateIndex, OverdueSweeper
+from app.repositories.sqlite import SqliteStore
+
+client = TestClient(app)
+
+
+@pytest.fixture(autouse=True)
+def run_before_tests():
+    """
+    Fixture to run before each test.
+    It resets the data_store to ensure test isolation.
+    """
+    data_store.reset()
+    yield
+    data_store.reset()
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    """
+    Fixture yielding an empty store of each backend.
+    """
+    if request.param == "memory":
+        yield data_store
+        return
+    sqlite_store = SqliteStore(tmp_path / "e-lib.db")
+    yield sqlite_store
+    sqlite_store.close()
+
+
+def test_due_date_index_lists_loans_due_in_range():
+    # Arrange
+    index = DueDateIndex()
+    today = date(2024, 5, 10)
+    index.add(3, today - timedelta(days=1))
+    index.add(1, today - timedelta(days=1))
+    index.add(2, today - timedelta(days=5))
+    index.add(4, today)
+    index.add(5, today - timedelta(days=3))
+    index.remove(5, today - timedelta(days=3))
+
+    # Act
+    overdue = index.due(today)
+    limited = index.due(today, limit=2)
+    recent = index.due(today, since=today - timedelta(days=2))
+
+    # Assert
+    assert overdue == [2, 1, 3]
+    assert limited == [2, 1]
+    assert recent == [1, 3]
+    assert len(index.days) == 3
+
+
+def test_sweeper_flags_each_overdue_loan_once(store):
+    # Arrange
+    users = UserRepository(store)
+    books = BookRepository(store)
+    borrows = BorrowRepository(store)
+    user = users.create_user(UserCreate(name="Alice", email="alice@example.com"))
+    first, second, third = (
+        books.create_book(BookCreate(title=title, author="Anon"))
+        for title in ("Dune", "Emma", "Ulysses")
+    )
+    borrows.loan_period = timedelta(days=1)
+    kept = borrows.borrow_book(user.id, first.id)
+    returned = borrows.borrow_book(user.id, second.id)
+    borrows.return_book(returned.id)
+    borrows.loan_period = timedelta(days=7)
+    recent = borrows.borrow_book(user.id, third.id)
+    sweeper = OverdueSweeper(borrows)
+    today = date.today()
+
+    # Act
+    flagged_first = sweeper.sweep(today + timedelta(days=2))
+    flagged_again = sweeper.sweep(today + timedelta(days=3))
+    flagged_later = sweeper.sweep(today + timedelta(days=10))
+
+    # Assert
+    assert kept.due_date == today + timedelta(days=1)
+    assert (flagged_first, flagged_again, flagged_later) == (1, 0, 1)
+    record = store.get("borrow_records", kept.id)
+    assert record.is_overdue is True
+    assert record.version == 2
+    assert store.get("borrow_records", returned.id).is_overdue is False
+    assert store.get("borrow_records", recent.id).is_overdue is True
+
+
+def test_get_overdue_borrow_records():
+    # Arrange
+    client.post("/users/", json={"name": "Alice", "email": "alice@example.com"})
+    for title in ("Dune", "Emma", "Ulysses"):
+        client.post("/books/", json={"title": title, "author": "Anon"})
+    loan_period = borrow_repository.loan_period
+    borrow_repository.loan_period = timedelta(days=-1)
+    try:
+        client.post("/borrow/", json={"user_id": 1, "book_id": 1})
+        client.post("/borrow/", json={"user_id": 1, "book_id": 2})
+    finally:
+        borrow_repository.loan_period = loan_period
+    client.post("/borrow/", json={"user_id": 1, "book_id": 3})
+    client.post("/borrow/return/2")
+
+    # Act
+    response = client.get("/borrow/overdue")
+
+    # Assert
+    assert response.status_code == 200
+    overdue = response.json()
+    assert [record["id"] for record in overdue] == [1]
+    assert overdue[0]["due_date"] == (date.today() - timedelta(days=1)).isoformat()
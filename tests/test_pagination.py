@@ -0,0 +1,99 @@
+from datetime import date
+
+from app.models.book import Book
+from app.models.borrow import BorrowRecord
+from app.repositories.memory import DataStore
+from app.repositories.pagination import IdIndex
+
+
+def test_id_index_pages_from_a_cursor():
+    # Arrange
+    index = IdIndex()
+    for entity_id in (5, 1, 3, 9, 3, 7):
+        index.add(entity_id)
+    index.discard(9)
+    index.discard(4)
+
+    # Act
+    first = index.after(0, 2)
+    second = index.after(first[-1], 2)
+    rest = list(index.iter_after(3))
+
+    # Assert
+    assert list(first) == [1, 3]
+    assert list(second) == [5, 7]
+    assert rest == [5, 7]
+    assert len(index) == 4
+
+
+def test_filtered_pages_only_visit_matching_entities():
+    # Arrange
+    store = DataStore()
+    for book_id in range(1, 1001):
+        store.put("books", Book(id=book_id, title=f"Book {book_id}", author="Anon"))
+        store.advance_sequence("books", book_id)
+        store.put(
+            "borrow_records",
+            BorrowRecord(
+                id=book_id,
+                user_id=1,
+                book_id=book_id,
+                borrow_date=date(2024, 5, 1),
+                return_date=None if book_id in (500, 900) else date(2024, 5, 2),
+            ),
+        )
+        store.advance_sequence("borrow_records", book_id)
+    for book_id in (10, 600):
+        book = store.get("books", book_id)
+        book.is_available = False
+        store.put("books", book)
+    lookups = []
+    get = store.books.get
+    store.books.get = lambda book_id: lookups.append(book_id) or get(book_id)
+
+    # Act
+    lent_out = store.page("books", 0, 10, is_available=False)
+    next_page = store.page("books", 10, 10, is_available=False)
+    open_loans = store.page("borrow_records", 500, 10, is_returned=False)
+
+    # Assert
+    assert [book.id for book in lent_out] == [10, 600]
+    assert [book.id for book in next_page] == [600]
+    assert lookups == [10, 600, 600]
+    assert [record.id for record in open_loans] == [900]
+    assert store.count("books", is_available=True) == 998
+    assert store.count("borrow_records", is_returned=True) == 998
+
+
+def test_active_loans_of_a_user_skip_the_returned_ones():
+    # Arrange
+    store = DataStore()
+    for record_id in range(1, 1001):
+        store.add_borrow_record(
+            BorrowRecord(
+                id=record_id,
+                user_id=1,
+                book_id=record_id,
+                borrow_date=date(2024, 5, 1),
+            )
+        )
+    for record_id in range(1, 1001):
+        if record_id not in (3, 700):
+            record = store.borrow_records[record_id]
+            record.return_date = date(2024, 5, 2)
+            store.borrow_records[record_id] = record
+            store.close_borrow_record(record)
+    lookups = []
+    get = store.borrow_records.get
+    store.borrow_records.get = lambda record_id: lookups.append(record_id) or get(
+        record_id
+    )
+
+    # Act
+    active = store.find_active_borrow_records_by_user(1)
+
+    # Assert
+    assert [record.id for record in active] == [3, 700]
+    assert lookups == [3, 700]
+    assert store.count_active_loans(1) == 2
+    assert store.find_active_borrow_records_by_user(2) == []
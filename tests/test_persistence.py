@@ -0,0 +1,189 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app.models.book import BookCreate, BookUpdate
+from app.models.user import UserCreate
+from app.repositories import (
+    BookRepository,
+    BorrowRepository,
+    DataStore,
+    UserRepository,
+)
+from app.repositories.wal import SNAPSHOT_FILE, WriteAheadLog
+
+
+def open_store(directory, **options):
+    """
+    Opens a fresh data store recovered from `directory`, with repositories.
+    """
+    store = DataStore()
+    wal = WriteAheadLog(store, directory, **options)
+    wal.open()
+    return (
+        store,
+        wal,
+        UserRepository(store),
+        BookRepository(store),
+        BorrowRepository(store),
+    )
+
+
+def populate(users, books, borrows):
+    alice = users.create_user(UserCreate(name="Alice", email="alice@example.com"))
+    bob = users.create_user(UserCreate(name="Bob", email="bob@example.com"))
+    dune = books.create_book(BookCreate(title="Dune", author="Frank Herbert"))
+    emma = books.create_book(BookCreate(title="Emma", author="Jane Austen"))
+    doomed = books.create_book(BookCreate(title="Doomed", author="Nobody"))
+    first = borrows.borrow_book(alice.id, dune.id)
+    borrows.return_book(first.id)
+    borrows.borrow_book(bob.id, dune.id)
+    books.update_book(emma.id, BookUpdate(title="Emma (Annotated)"))
+    books.delete_book(doomed.id)
+    users.deactivate_user(alice.id)
+
+
+def state(store):
+    return (
+        store.users,
+        store.books,
+        store.borrow_records,
+        store.active_borrow_records,
+        store.borrow_records_by_user,
+        {
+            collection: {value: index.ids.tolist() for value, index in indexes.items()}
+            for collection, indexes in store.flag_indexes.items()
+        },
+        (store.user_id_seq, store.book_id_seq, store.borrow_id_seq),
+    )
+
+
+def test_recovers_store_from_log(tmp_path):
+    # Arrange
+    store, wal, users, books, borrows = open_store(tmp_path)
+    populate(users, books, borrows)
+    expected = state(store)
+    wal.close()
+
+    # Act
+    recovered, wal, _, books, _ = open_store(tmp_path)
+
+    # Assert
+    assert state(recovered) == expected
+    assert recovered.book_id_seq == 4
+    assert [book.id for book in books.search_books("annotated")] == [2]
+    assert recovered.blocking is True
+    wal.close()
+    assert recovered.blocking is False
+
+
+def test_recovers_from_snapshot_and_log_tail(tmp_path):
+    # Arrange
+    store, wal, users, books, borrows = open_store(tmp_path)
+    populate(users, books, borrows)
+    snapshot_lsn = wal.snapshot()
+    books.create_book(BookCreate(title="Beloved", author="Toni Morrison"))
+    borrows.return_book(2)
+    expected = state(store)
+    wal.close()
+
+    # Act
+    recovered, wal, _, _, _ = open_store(tmp_path)
+
+    # Assert
+    assert (tmp_path / SNAPSHOT_FILE).exists()
+    segments = sorted(path.name for path in tmp_path.glob("wal-*.log"))
+    assert all(int(name[4:-4]) > snapshot_lsn for name in segments)
+    assert state(recovered) == expected
+    assert recovered.active_borrow_records == {}
+    wal.close()
+
+
+def test_automatic_snapshots_with_synchronous_commits(tmp_path):
+    # Arrange
+    store, wal, users, books, borrows = open_store(
+        tmp_path, fsync_interval=0, snapshot_every=3
+    )
+
+    # Act
+    populate(users, books, borrows)
+    deadline = time.monotonic() + 5
+    while not (tmp_path / SNAPSHOT_FILE).exists() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    expected = state(store)
+    wal.close()
+    recovered, wal, _, _, _ = open_store(tmp_path)
+
+    # Assert
+    assert (tmp_path / SNAPSHOT_FILE).exists()
+    assert state(recovered) == expected
+    wal.close()
+
+
+def test_writes_are_durable_when_acknowledged_and_share_fsyncs(tmp_path, monkeypatch):
+    # Arrange
+    store, wal, users, _, _ = open_store(tmp_path, fsync_interval=0.05)
+    fsyncs = []
+    fsync = os.fsync
+    monkeypatch.setattr(
+        "app.repositories.wal.os.fsync", lambda fd: fsyncs.append(fd) or fsync(fd)
+    )
+
+    # Act
+    users.create_user(UserCreate(name="Alice", email="alice@example.com"))
+    durable_after_one = wal._synced_lsn
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(
+            pool.map(
+                lambda n: users.create_user(
+                    UserCreate(name=f"User {n}", email=f"user{n}@example.com")
+                ),
+                range(8),
+            )
+        )
+
+    # Assert
+    assert durable_after_one == 1
+    assert wal._synced_lsn == wal.lsn == 9
+    assert 2 <= len(fsyncs) < 9
+    wal.close()
+
+
+def test_ignores_torn_write_at_end_of_log(tmp_path):
+    # Arrange
+    store, wal, users, _, _ = open_store(tmp_path)
+    users.create_user(UserCreate(name="Carol", email="carol@example.com"))
+    wal.close()
+    segment = next(tmp_path.glob("wal-*.log"))
+    with segment.open("a") as log:
+        log.write('2\t{"op":"create_user","puts":[["users",{"id"')
+
+    # Act
+    recovered, wal, users, _, _ = open_store(tmp_path)
+    users.create_user(UserCreate(name="Dave", email="dave@example.com"))
+    wal.close()
+    recovered_again, wal, _, _, _ = open_store(tmp_path)
+
+    # Assert
+    assert [user.name for user in recovered_again.users.values()] == [
+        "Carol",
+        "Dave",
+    ]
+    wal.close()
+
+
+def test_refuses_a_directory_used_by_another_log(tmp_path):
+    # Arrange
+    _, wal, *_ = open_store(tmp_path)
+
+    # Act
+    with pytest.raises(RuntimeError, match="in use by another process"):
+        open_store(tmp_path)
+    wal.close()
+    _, reopened, *_ = open_store(tmp_path)
+
+    # Assert
+    assert reopened.lsn == 0
+    reopened.close()
@@ -0,0 +1,117 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.config import Settings
+from app.profiling import ProfilingMiddleware, profiler
+from app.repositories import BookRepository, data_store
+from app.routes import books, debug
+
+ADMIN_TOKEN = "s3cret"
+
+profiled_app = FastAPI()
+profiled_app.add_middleware(ProfilingMiddleware, profiler=profiler)
+profiled_app.include_router(books.router)
+profiled_app.include_router(debug.router)
+
+client = TestClient(profiled_app, headers={"X-Admin-Token": ADMIN_TOKEN})
+
+
+@pytest.fixture(autouse=True)
+def run_before_tests(monkeypatch):
+    """
+    Fixture to run before each test.
+    It resets the data_store, configures the admin token and installs the
+    profiler with no data.
+    """
+    monkeypatch.setattr(debug, "settings", Settings(admin_token=ADMIN_TOKEN))
+    data_store.reset()
+    profiler.install()
+    yield
+    profiler.uninstall()
+    profiler.sample_rate = 0.0
+    profiler.dump(reset=True)
+
+
+def test_profile_requests_with_header():
+    # Arrange
+    client.post("/books/", json={"title": "Dune", "author": "Frank Herbert"})
+    client.get("/books/1", headers={"X-Profile": "1"})
+    client.get("/books/1", headers={"X-Profile": "1"})
+
+    # Act
+    response = client.get("/debug/profile")
+
+    # Assert
+    assert response.status_code == 200
+    routes = response.json()["routes"]
+    assert list(routes) == ["GET /books/{book_id}"]
+    route = routes["GET /books/{book_id}"]
+    assert route["requests"] == 2
+    assert route["calls"]["BookRepository.get_book"]["calls"] == 2
+
+
+def test_profile_sample_rate_and_reset():
+    # Arrange
+    client.put("/debug/profile", json={"sample_rate": 1})
+    client.post("/books/", json={"title": "Emma", "author": "Jane Austen"})
+    client.get("/books/1", headers={"X-Profile": "0"})
+
+    # Act
+    first = client.get("/debug/profile", params={"reset": True}).json()
+    second = client.get("/debug/profile").json()
+
+    # Assert
+    assert first["sample_rate"] == 1
+    assert list(first["routes"]) == ["POST /books/"]
+    assert first["routes"]["POST /books/"]["calls"]["BookRepository.create_book"]
+    assert list(second["routes"]) == ["GET /debug/profile"]
+
+
+def test_uninstall_restores_repository_methods():
+    # Arrange
+    hooked = BookRepository.get_book
+
+    # Act
+    profiler.uninstall()
+
+    # Assert
+    assert BookRepository.get_book is not hooked
+    assert BookRepository.get_book is hooked.__wrapped__
+
+
+def test_toggle_profiling_at_runtime():
+    # Arrange
+    client.post("/books/", json={"title": "Dune", "author": "Frank Herbert"})
+
+    # Act
+    disabled = client.put("/debug/profile", json={"enabled": False})
+    client.get("/books/1", headers={"X-Profile": "1"})
+    while_disabled = client.get("/debug/profile").json()
+    enabled = client.put("/debug/profile", json={"enabled": True, "sample_rate": 0})
+    client.get("/books/1", headers={"X-Profile": "1"})
+    while_enabled = client.get("/debug/profile").json()
+
+    # Assert
+    assert disabled.json() == {"enabled": False, "sample_rate": 0.0}
+    assert while_disabled["enabled"] is False
+    assert while_disabled["routes"] == {}
+    assert enabled.json() == {"enabled": True, "sample_rate": 0.0}
+    assert while_enabled["enabled"] is True
+    assert while_enabled["routes"]["GET /books/{book_id}"]["requests"] == 1
+
+
+def test_debug_endpoints_require_the_admin_token(monkeypatch):
+    # Act
+    missing = client.get("/debug/profile", headers={"X-Admin-Token": ""})
+    wrong = client.put(
+        "/debug/profile", json={"enabled": False}, headers={"X-Admin-Token": "nope"}
+    )
+    monkeypatch.setattr(debug, "settings", Settings())
+    unconfigured = client.get("/debug/profile")
+
+    # Assert
+    assert missing.status_code == 403
+    assert wrong.status_code == 403
+    assert unconfigured.status_code == 403
+    assert profiler.enabled is True
@@ -0,0 +1,66 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.repositories import data_store
+from app.routes import books, borrow, users
+from app.routes.responses import FastJSONResponse
+
+fast_app = FastAPI(default_response_class=FastJSONResponse)
+fast_app.include_router(users.router)
+fast_app.include_router(books.router)
+fast_app.include_router(borrow.router)
+
+client = TestClient(app)
+fast_client = TestClient(fast_app)
+
+
+@pytest.fixture(autouse=True)
+def run_before_tests():
+    """
+    Fixture to run before each test.
+    It resets the data_store to ensure test isolation.
+    """
+    data_store.reset()
+    yield
+
+
+def test_fast_responses_match_validated_ones():
+    # Arrange
+    created = fast_client.post(
+        "/users/", json={"name": "Alice", "email": "alice@example.com"}
+    )
+    fast_client.post("/books/bulk", json=[{"title": "Dune", "author": "Herbert"}] * 3)
+    for book_id in (1, 2, 3):
+        fast_client.post("/borrow/", json={"user_id": 1, "book_id": book_id})
+    fast_client.post("/borrow/return/2")
+
+    # Act
+    paths = ["/users/1", "/books/2", "/borrow/records?limit=2", "/books/4"]
+    expected = [client.get(path) for path in paths]
+    actual = [fast_client.get(path) for path in paths]
+
+    # Assert
+    assert created.status_code == 201
+    assert created.headers["content-type"] == "application/json"
+    for expected_response, actual_response in zip(expected, actual, strict=True):
+        assert actual_response.status_code == expected_response.status_code
+        assert actual_response.json() == expected_response.json()
+    assert actual[2].headers["X-Next-Cursor"] == expected[2].headers["X-Next-Cursor"]
+
+
+def test_fast_route_passes_through_explicit_responses():
+    # Arrange
+    fast_client.post("/users/", json={"name": "Bob", "email": "bob@example.com"})
+    fast_client.post("/books/", json={"title": "Emma", "author": "Jane Austen"})
+
+    # Act
+    response = fast_client.post(
+        "/borrow/batch",
+        json={"items": [{"user_id": 1, "book_id": 1}] * 2, "atomic": True},
+    )
+
+    # Assert
+    assert response.status_code == 409
+    assert response.json()["succeeded"] == 0
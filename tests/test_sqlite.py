@@ -0,0 +1,249 @@
+import json
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.models.book import BookCreate
+from app.models.user import UserCreate
+from app.repositories import (
+    BookRepository,
+    BorrowRepository,
+    UserRepository,
+    data_store,
+    use_store,
+)
+from app.repositories.sqlite import SqliteStore
+
+client = TestClient(app)
+
+
+@pytest.fixture
+def store(tmp_path):
+    """
+    Fixture pointing the application at a fresh SQLite database.
+    """
+    sqlite_store = SqliteStore(tmp_path / "e-lib.db")
+    use_store(sqlite_store)
+    yield sqlite_store
+    use_store(data_store)
+    sqlite_store.close()
+
+
+@pytest.mark.usefixtures("store")
+def test_borrow_and_return():
+    # Arrange
+    client.post("/users/", json={"name": "Alice", "email": "alice@example.com"})
+    client.post("/books/", json={"title": "Dune", "author": "Frank Herbert"})
+
+    # Act
+    borrowed = client.post("/borrow/", json={"user_id": 1, "book_id": 1})
+    duplicate = client.post("/borrow/", json={"user_id": 1, "book_id": 1})
+    active = client.get("/users/1/loans/active")
+    returned = client.post("/borrow/return/1")
+
+    # Assert
+    assert borrowed.status_code == 201
+    assert borrowed.json()["return_date"] is None
+    assert duplicate.status_code == 409
+    assert [record["id"] for record in active.json()] == [1]
+    assert returned.status_code == 200
+    assert returned.json()["return_date"] is not None
+    assert client.get("/books/1").json()["is_available"] is True
+    assert client.post("/borrow/return/1").status_code == 400
+    assert len(client.get("/borrow/records/user/1").json()) == 1
+    assert client.get("/users/1/loans/active").json() == []
+
+
+@pytest.mark.usefixtures("store")
+def test_paginate_and_filter():
+    # Arrange
+    for i in range(5):
+        client.post("/books/", json={"title": f"Book {i}", "author": "Anon"})
+    client.delete("/books/2")
+    client.patch("/books/4/mark_unavailable")
+
+    # Act
+    first_page = client.get("/books/", params={"limit": 2})
+    second_page = client.get(
+        "/books/", params={"limit": 2, "after": first_page.headers["X-Next-Cursor"]}
+    )
+    unavailable = client.get("/books/", params={"is_available": False})
+
+    # Assert
+    assert [book["id"] for book in first_page.json()] == [1, 3]
+    assert [book["id"] for book in second_page.json()] == [4, 5]
+    assert [book["id"] for book in unavailable.json()] == [4]
+
+
+@pytest.mark.usefixtures("store")
+def test_search_books():
+    # Arrange
+    client.post("/books/", json={"title": "The Hobbit", "author": "J.R.R. Tolkien"})
+    client.post("/books/", json={"title": "Émile", "author": "Rousseau"})
+    client.put("/books/2", json={"title": "Émile, or On Education"})
+
+    # Act
+    by_prefix = client.get("/books/search", params={"q": "tolk"})
+    by_accentless = client.get("/books/search", params={"q": "emile educ"})
+
+    # Assert
+    assert [book["id"] for book in by_prefix.json()] == [1]
+    assert [book["id"] for book in by_accentless.json()] == [2]
+
+
+def test_data_survives_reopen(store, tmp_path):
+    # Arrange
+    UserRepository(store).create_user(UserCreate(name="Bob", email="bob@example.com"))
+    BookRepository(store).create_book(BookCreate(title="Emma", author="Austen"))
+    BorrowRepository(store).borrow_book(1, 1)
+    store.close()
+
+    # Act
+    reopened = SqliteStore(tmp_path / "e-lib.db")
+
+    # Assert
+    assert reopened.get("users", 1).name == "Bob"
+    assert reopened.get("books", 1).is_available is False
+    assert reopened.find_active_borrow_record(1, 1).id == 1
+    assert reopened.next_id("book") == 2
+    reopened.close()
+
+
+def test_concurrent_borrow_of_one_book_lends_it_once(store):
+    # Arrange
+    users = UserRepository(store)
+    for i in range(8):
+        users.create_user(UserCreate(name=f"User {i}", email=f"u{i}@example.com"))
+    BookRepository(store).create_book(BookCreate(title="Emma", author="Austen"))
+    borrows = BorrowRepository(store)
+    barrier = threading.Barrier(8)
+
+    def borrow(user_id):
+        barrier.wait()
+        return borrows.borrow_book(user_id, 1)
+
+    # Act
+    with ThreadPoolExecutor(8) as executor:
+        results = list(executor.map(borrow, range(1, 9)))
+
+    # Assert
+    assert sum(record is not None for record in results) == 1
+    assert len(list(store.scan("borrow_records"))) == 1
+
+
+@pytest.mark.usefixtures("store")
+def test_bulk_create_books():
+    # Arrange
+    client.post("/books/", json={"title": "Existing", "author": "Anon"})
+    books = [{"title": f"Book {i}", "author": "Anon"} for i in range(3)]
+
+    # Act
+    response = client.post("/books/bulk", json=books)
+
+    # Assert
+    assert [item["id"] for item in response.json()["items"]] == [2, 3, 4]
+    assert client.get("/books/4").json()["title"] == "Book 2"
+    assert len(client.get("/books/search", params={"q": "book"}).json()) == 3
+
+
+@pytest.mark.usefixtures("store")
+def test_export_borrow_records_filtered_by_date():
+    # Arrange
+    client.post("/users/", json={"name": "Alice", "email": "alice@example.com"})
+    client.post("/books/", json={"title": "Dune", "author": "Frank Herbert"})
+    client.post("/borrow/", json={"user_id": 1, "book_id": 1})
+    today = date.today()
+
+    # Act
+    current = client.get("/borrow/records/export", params={"borrowed_from": today})
+    future = client.get(
+        "/borrow/records/export",
+        params={"borrowed_from": today + timedelta(days=1)},
+    )
+
+    # Assert
+    assert [json.loads(line)["id"] for line in current.text.splitlines()] == [1]
+    assert future.text == ""
+
+
+def test_count(store):
+    # Arrange
+    for i in range(3):
+        client.post("/books/", json={"title": f"Book {i}", "author": "Anon"})
+    client.post("/users/", json={"name": "Alice", "email": "alice@example.com"})
+    client.post("/borrow/", json={"user_id": 1, "book_id": 1})
+    client.post("/borrow/", json={"user_id": 1, "book_id": 2})
+    client.post("/borrow/return/1")
+
+    # Act
+    books = store.count("books")
+    active_loans = store.count("borrow_records", is_returned=False)
+
+    # Assert
+    assert books == 3
+    assert active_loans == 1
+
+
+@pytest.mark.usefixtures("store")
+def test_unique_email_and_lookup():
+    # Arrange
+    client.post("/users/", json={"name": "Alice", "email": "alice@example.com"})
+
+    # Act
+    duplicate = client.post(
+        "/users/", json={"name": "Alice", "email": "ALICE@example.com"}
+    )
+    found = client.get("/users/by-email/Alice@Example.com")
+
+    # Assert
+    assert duplicate.status_code == 409
+    assert found.json()["id"] == 1
+
+
+@pytest.mark.usefixtures("store")
+def test_returned_book_goes_to_first_reservation():
+    # Arrange
+    for name in ("Ann", "Ben", "Cid"):
+        client.post("/users/", json={"name": name, "email": f"{name}@example.com"})
+    client.post("/books/", json={"title": "Dune", "author": "Frank Herbert"})
+    client.post("/borrow/", json={"user_id": 1, "book_id": 1})
+    client.post("/reservations/", json={"user_id": 2, "book_id": 1})
+    client.post("/reservations/", json={"user_id": 3, "book_id": 1})
+    client.patch("/users/2/deactivate")
+
+    # Act
+    client.post("/borrow/return/1")
+
+    # Assert
+    assert client.get("/reservations/1").json()["status"] == "cancelled"
+    fulfilled = client.get("/reservations/2").json()
+    assert fulfilled["status"] == "fulfilled"
+    assert (
+        client.get("/borrow/records/user/3").json()[0]["id"] == fulfilled["borrow_id"]
+    )
+    assert client.get("/reservations/book/1").json() == []
+
+
+def test_adds_missing_columns_to_older_databases(tmp_path):
+    # Arrange
+    path = tmp_path / "e-lib.db"
+    connection = sqlite3.connect(path)
+    connection.execute(
+        "CREATE TABLE books (id INTEGER PRIMARY KEY, title TEXT, author TEXT, "
+        "is_available INTEGER)"
+    )
+    connection.execute("INSERT INTO books VALUES (1, 'Emma', 'Austen', 1)")
+    connection.commit()
+    connection.close()
+
+    # Act
+    upgraded = SqliteStore(path)
+
+    # Assert
+    assert upgraded.get("books", 1).version == 1
+    upgraded.close()
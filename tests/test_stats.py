@@ -0,0 +1,198 @@
+from datetime import date, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.models.borrow import BorrowRecord
+from app.repositories import data_store, use_store
+from app.repositories.circulation import RankedCounter
+from app.repositories.popularity import PopularityTracker
+from app.repositories.sqlite import SqliteStore
+
+client = TestClient(app)
+
+# (user ID, book ID, borrow date, return date) of the sample history
+LOANS = [
+    (1, 1, date(2024, 3, 1), date(2024, 3, 11)),
+    (2, 1, date(2024, 3, 12), date(2024, 3, 14)),
+    (2, 2, date(2024, 3, 12), None),
+    (1, 3, date(2024, 3, 15), None),
+    (2, 1, date(2024, 3, 15), None),
+]
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    """
+    Fixture holding the sample history in each storage backend.
+    """
+    data_store.reset()
+    store = data_store
+    if request.param == "sqlite":
+        store = SqliteStore(tmp_path / "e-lib.db")
+        use_store(store)
+    for record_id, (user_id, book_id, borrowed, returned) in enumerate(LOANS, 1):
+        store.put(
+            "borrow_records",
+            BorrowRecord(
+                id=record_id,
+                user_id=user_id,
+                book_id=book_id,
+                borrow_date=borrowed,
+                return_date=returned,
+            ),
+        )
+    yield store
+    if store is not data_store:
+        use_store(data_store)
+        store.close()
+    data_store.reset()
+
+
+@pytest.mark.usefixtures("store")
+def test_loans_per_day():
+    # Act
+    response = client.get("/stats/loans/daily")
+    filtered = client.get(
+        "/stats/loans/daily",
+        params={"borrowed_from": "2024-03-02", "borrowed_to": "2024-03-12"},
+    )
+
+    # Assert
+    assert response.status_code == 200
+    assert response.json() == [
+        {"date": "2024-03-01", "loans": 1},
+        {"date": "2024-03-12", "loans": 2},
+        {"date": "2024-03-15", "loans": 2},
+    ]
+    assert filtered.json() == [{"date": "2024-03-12", "loans": 2}]
+
+
+@pytest.mark.usefixtures("store")
+def test_most_borrowed_books_and_top_borrowers():
+    # Act
+    books = client.get("/stats/books/most-borrowed", params={"limit": 2})
+    users = client.get("/stats/users/top-borrowers")
+
+    # Assert
+    assert books.json() == [{"book_id": 1, "loans": 3}, {"book_id": 2, "loans": 1}]
+    assert users.json() == [{"user_id": 2, "loans": 3}, {"user_id": 1, "loans": 2}]
+
+
+def test_loan_duration_counts_later_returns(store):
+    # Arrange
+    before = client.get("/stats/loans/duration").json()
+    record = store.get("borrow_records", 3)
+    record.return_date = date(2024, 3, 18)
+    store.put("borrow_records", record)
+
+    # Act
+    after = client.get("/stats/loans/duration").json()
+
+    # Assert
+    assert before == {"returned_loans": 2, "mean_days": 6.0}
+    assert after == {"returned_loans": 3, "mean_days": 6.0}
+
+
+def test_ranked_counter_breaks_ties_by_key():
+    # Arrange
+    counter = RankedCounter()
+    for key in (5, 3, 5, 9, 3, 7):
+        counter.increment(key)
+
+    # Act
+    top = counter.top(3)
+
+    # Assert
+    assert top == [(3, 2), (5, 2), (7, 1)]
+    assert counter.top(10)[-1] == (9, 1)
+
+
+def test_ranked_counter_only_keeps_counts_that_have_keys():
+    # Arrange
+    counter = RankedCounter(capacity=2)
+    for _ in range(1000):
+        counter.increment(1)
+    counter.increment(2)
+    counter.increment(2)
+
+    # Act
+    counter.increment(3)
+    top = counter.top(5)
+
+    # Assert
+    assert top == [(1, 1000), (3, 3)]
+    assert counter.levels == [3, 1000]
+    assert sorted(counter.buckets) == counter.levels
+
+
+def test_popular_books_within_window(store):
+    # Arrange
+    today = date.today()
+    for title in ("Dune", "Emma", "Ulysses"):
+        client.post("/books/", json={"title": title, "author": "Anon"})
+    for record_id, (book_id, days_ago) in enumerate(
+        [(2, 0), (3, 1), (2, 6), (3, 7), (3, 8)], start=len(LOANS) + 1
+    ):
+        store.put(
+            "borrow_records",
+            BorrowRecord(
+                id=record_id,
+                user_id=1,
+                book_id=book_id,
+                borrow_date=today - timedelta(days=days_ago),
+            ),
+        )
+
+    # Act
+    week = client.get("/books/popular", params={"window": "7d", "k": 5})
+    longer = client.get("/books/popular", params={"window": "9d", "k": 1})
+    invalid = client.get("/books/popular", params={"window": "31d"})
+
+    # Assert
+    assert [(item["book"]["title"], item["loans"]) for item in week.json()] == [
+        ("Emma", 2),
+        ("Ulysses", 1),
+    ]
+    assert [(item["book"]["id"], item["loans"]) for item in longer.json()] == [(3, 3)]
+    assert invalid.status_code == 422
+
+
+def test_popularity_tracker_stays_bounded():
+    # Arrange
+    tracker = PopularityTracker(max_window_days=2, daily_capacity=2)
+    today = date(2024, 3, 15)
+
+    # Act
+    for book_id in (1, 1, 1, 2, 3, 4):
+        tracker.add_loan(book_id, today - timedelta(days=1))
+    tracker.add_loan(9, today - timedelta(days=5))
+    tracker.add_loan(5, today)
+
+    # Assert
+    assert len(tracker.days) == 2
+    assert all(len(counter.counts) <= 2 for counter in tracker.days.values())
+    assert tracker.top(2, 1, today) == [(1, 3)]
+    assert tracker.top(1, 5, today) == [(5, 1)]
+
+
+def test_popularity_ranking_refreshes_on_an_interval():
+    # Arrange
+    now = [0.0]
+    tracker = PopularityTracker(refresh_interval=1.0, clock=lambda: now[0])
+    today = date(2024, 3, 15)
+    tracker.add_loan(1, today)
+    first = tracker.top(7, 5, today)
+
+    # Act
+    tracker.add_loan(2, today)
+    tracker.add_loan(2, today)
+    cached = tracker.top(7, 5, today)
+    now[0] = 1.0
+    refreshed = tracker.top(7, 5, today)
+
+    # Assert
+    assert first == [(1, 1)]
+    assert cached == first
+    assert refreshed == [(2, 2), (1, 1)]